@@ -1,25 +1,155 @@
-from typing import Dict, List, Optional
+"""
+Per-chat cache of the admins allowed to control the stream
+(creator + admins with "manage voice chats").
 
-# Cache of admin IDs by chat_id
-admins: Dict[int, List[int]] = {}
+Entries expire after ADMIN_CACHE_TTL seconds. When a refresh fails, the
+chat's last good list is served again for ADMIN_NEGATIVE_TTL seconds so
+a burst of taps doesn't turn into a burst of API calls; a chat that was
+never fetched successfully is not cached and is looked up again on the
+next tap. Users missing from a cached list are non-admins without
+another lookup.
+
+With a persistent state store (STATE_URL), entries are also written there
+with their ttl, so workers and restarts share the lists. Reads here only
+see the local cache; on a miss, `load` (awaited by Process/admins.py
+before it falls back to the API) reads the store in a thread.
+"""
+
+import asyncio
+import os
+import time
+from typing import List, Optional, Tuple
+
+from Process.Cache.ttl import TTLCache
+from Process.state import store
+
+ADMIN_CACHE_TTL = int(os.environ.get("ADMIN_CACHE_TTL") or 300)
+ADMIN_NEGATIVE_TTL = int(os.environ.get("ADMIN_NEGATIVE_TTL") or 30)
+# how long a list stays usable as a fallback after it expired
+ADMIN_STALE_TTL = int(os.environ.get("ADMIN_STALE_TTL") or 24 * 3600)
+
+# chat_id -> sorted admin ids
+admins = TTLCache(maxsize=10000, ttl=ADMIN_CACHE_TTL)
+# chat_id -> last successfully fetched ids, served while the API is failing
+last_good = TTLCache(maxsize=10000, ttl=ADMIN_STALE_TTL)
+
+NAMESPACE = "admins"
+
+
+def _store(chat_id: int, ids: List[int], ttl: float) -> None:
+    admins.set(chat_id, ids, ttl=ttl)
+    if store.persistent:
+        # the wall-clock expiry travels along so a reader keeps the same deadline
+        store.set(NAMESPACE, chat_id, (time.time() + ttl, ids), ttl=ttl)
+
+
+def _lookup(chat_id: int) -> Optional[List[int]]:
+    return admins.get(chat_id)
+
+
+def _read_store(chat_id: int) -> Optional[Tuple[float, List[int]]]:
+    return store.get(NAMESPACE, chat_id)
+
+
+async def load(chat_id: int) -> Optional[List[int]]:
+    """
+    `get`, falling back to the state store on a local miss. The store
+    read is blocking (a query, or a wait for the writer's connection),
+    so it runs in a thread.
+    """
+    cached = _lookup(chat_id)
+    if cached is not None or not store.persistent:
+        return cached
+    entry = await asyncio.to_thread(_read_store, chat_id)
+    if entry is None:
+        return None
+    expires, ids = entry
+    remaining = expires - time.time()
+    if remaining <= 0:
+        return None
+    admins.set(chat_id, ids, ttl=remaining)
+    last_good.set(chat_id, ids)
+    return ids
+
+
+def set(chat_id: int, admin_list: List[int], ttl: Optional[float] = None) -> None:
+    """Store admin IDs for a chat."""
+    ids = sorted({*admin_list})
+    last_good.set(chat_id, ids)
+    _store(chat_id, ids, ADMIN_CACHE_TTL if ttl is None else ttl)
+
+
+def get(chat_id: int) -> Optional[List[int]]:
+    """Return cached admin IDs for a chat, or None if unknown / expired."""
+    return _lookup(chat_id)
+
+
+def set_failed(chat_id: int) -> Optional[List[int]]:
+    """
+    The admin list couldn't be fetched: serve the last good list for
+    ADMIN_NEGATIVE_TTL seconds and return it, or None (nothing cached)
+    if there is none.
+    """
+    ids = last_good.get(chat_id)
+    if ids is not None:
+        _store(chat_id, ids, ADMIN_NEGATIVE_TTL)
+    return ids
+
+
+def is_admin(chat_id: int, user_id: int) -> Optional[bool]:
+    """True / False from the cache, None if the chat isn't cached."""
+    cached = _lookup(chat_id)
+    if cached is None:
+        return None
+    return user_id in cached
+
+
+def update_member(chat_id: int, user_id: int, allowed: bool) -> None:
+    """Apply one member change (promotion / demotion / leave) to a cached list."""
+    cached = _lookup(chat_id)
+    if cached is None:
+        # keep the fallback list honest too
+        stale = last_good.get(chat_id)
+        if stale is not None:
+            if allowed and user_id not in stale:
+                last_good.set(chat_id, sorted(stale + [user_id]))
+            elif not allowed and user_id in stale:
+                last_good.set(chat_id, [a for a in stale if a != user_id])
+        return
+    if allowed and user_id not in cached:
+        set(chat_id, cached + [user_id])
+    elif not allowed and user_id in cached:
+        set(chat_id, [a for a in cached if a != user_id])
+
+
+# ---------- backwards compatible helpers ----------
 
 
 def set_admins(chat_id: int, admin_list: List[int]) -> None:
     """Store admin IDs for a chat."""
-    admins[chat_id] = admin_list
+    set(chat_id, admin_list)
 
 
 def get_admins(chat_id: int) -> List[int]:
     """Return admin IDs for a chat; empty list if not found."""
-    return admins.get(chat_id, [])
+    return _lookup(chat_id) or []
 
 
 def clear_admins(chat_id: int) -> None:
     """Clear admin list for a specific chat."""
-    if chat_id in admins:
-        del admins[chat_id]
+    admins.pop(chat_id)
+    last_good.pop(chat_id)
+    if store.persistent:
+        store.delete(NAMESPACE, chat_id)
 
 
 def reset_all() -> None:
     """Completely clear all admin cache."""
     admins.clear()
+    last_good.clear()
+    if store.persistent:
+        store.clear(NAMESPACE)
+
+
+def stats() -> dict:
+    return admins.stats()
@@ -0,0 +1,91 @@
+"""
+Persistent video id -> public URL cache for generated inline song cards.
+
+Uploaded telegraph links never expire, so a card generated once is good
+forever. Lookups are served from memory; every new URL is also written
+to a small SQLite file (CARD_URL_DB) that is loaded back on startup.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CARD_URL_DB = os.environ.get("CARD_URL_DB") or os.path.join("cache", "card_urls.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS card_urls (
+    video_id TEXT PRIMARY KEY,
+    url      TEXT NOT NULL,
+    created  REAL NOT NULL
+)
+"""
+
+
+class CardUrlCache:
+    """video id -> card URL, in memory and in SQLite."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._urls: Optional[Dict[str, str]] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, str]:
+        if self._urls is None:
+            with self._lock:
+                if self._urls is None:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                    db.execute("PRAGMA journal_mode=WAL")
+                    db.execute(_SCHEMA)
+                    self._db = db
+                    self._urls = dict(db.execute("SELECT video_id, url FROM card_urls"))
+        return self._urls
+
+    def get(self, video_id: str) -> Optional[str]:
+        url = self._load().get(video_id)
+        if url is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return url
+
+    def set(self, video_id: str, url: str) -> None:
+        self._load()[video_id] = url
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO card_urls VALUES (?, ?, ?)",
+                    (video_id, url, time.time()),
+                )
+        except sqlite3.Error as e:
+            # still served from memory for this run
+            logger.warning("card url cache: could not persist %s: %s", video_id, e)
+
+    def __contains__(self, video_id: str) -> bool:
+        return video_id in self._load()
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def stats(self) -> dict:
+        return {"size": len(self), "hits": self.hits, "misses": self.misses}
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            self._urls = None
+
+
+card_urls = CardUrlCache(CARD_URL_DB)
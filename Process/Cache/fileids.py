@@ -0,0 +1,107 @@
+"""
+Persistent index of Telegram file ids for media we already uploaded.
+
+Keyed by (video id, format, kind) -> (file_id, file_unique_id). A hit
+lets the bot re-send a song by file_id: no download, no upload, and
+Telegram keeps the thumbnail that was attached to the first upload.
+Backed by a local SQLite file so the index survives restarts.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FILE_ID_DB = os.environ.get("FILE_ID_DB") or os.path.join("cache", "file_ids.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_ids (
+    video_id       TEXT NOT NULL,
+    format         TEXT NOT NULL,
+    kind           TEXT NOT NULL,
+    file_id        TEXT NOT NULL,
+    file_unique_id TEXT,
+    created        REAL NOT NULL,
+    PRIMARY KEY (video_id, format, kind)
+)
+"""
+
+
+class FileIdIndex:
+    """(video id, format, kind) -> (file_id, file_unique_id), stored in SQLite."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(_SCHEMA)
+            self._db = db
+        return self._db
+
+    def get(self, video_id: str, fmt: str, kind: str) -> Optional[Tuple[str, Optional[str]]]:
+        """Return (file_id, file_unique_id) or None."""
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT file_id, file_unique_id FROM file_ids WHERE video_id=? AND format=? AND kind=?",
+                (video_id, fmt, kind),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0], row[1]
+
+    def set(self, video_id: str, fmt: str, kind: str, file_id: str, file_unique_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO file_ids VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, fmt, kind, file_id, file_unique_id, time.time()),
+            )
+
+    def remember(self, video_id: str, fmt: str, kind: str, media) -> None:
+        """Store the ids of an uploaded pyrogram Audio / Video / Document (None is ignored)."""
+        if media is None or not getattr(media, "file_id", None):
+            return
+        try:
+            self.set(video_id, fmt, kind, media.file_id, getattr(media, "file_unique_id", None))
+        except sqlite3.Error as e:
+            logger.warning("file id index: could not store %s/%s: %s", video_id, kind, e)
+
+    def drop(self, video_id: str, fmt: str, kind: str) -> None:
+        """Forget an entry, e.g. after Telegram rejected its file_id."""
+        with self._lock:
+            self._conn().execute(
+                "DELETE FROM file_ids WHERE video_id=? AND format=? AND kind=?",
+                (video_id, fmt, kind),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn().execute("SELECT COUNT(*) FROM file_ids").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses}
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+file_index = FileIdIndex(FILE_ID_DB)
@@ -0,0 +1,221 @@
+"""
+Crash-safe journal of the playback queues.
+
+QUEUE lives in memory, so a dyno restart used to drop every chat's
+queue. Each mutation in Process/queues.py is now also appended to a
+SQLite journal (QUEUE_JOURNAL_DB). On startup, main.py replays the
+journal to rebuild the queues and rejoin the calls.
+
+Recording a mutation only puts a tuple on an in-memory queue; a writer
+thread batches those into SQLite, so add_to_queue & co. never wait on
+disk. The writer keeps its own copy of the queues. After every
+QUEUE_JOURNAL_COMPACT operations it writes that copy as a snapshot and
+truncates the journal, so replay cost stays bounded.
+
+Point QUEUE_JOURNAL_DB at a persistent disk on hosts whose filesystem
+is reset on restart.
+"""
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from Process import queues
+
+logger = logging.getLogger(__name__)
+
+QUEUE_JOURNAL_DB = os.environ.get("QUEUE_JOURNAL_DB") or os.path.join("cache", "queues.sqlite3")
+QUEUE_JOURNAL_COMPACT = int(os.environ.get("QUEUE_JOURNAL_COMPACT") or 1000)
+# most operations written in one transaction
+BATCH_SIZE = 512
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue_ops (
+    seq     INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    op      TEXT NOT NULL,
+    payload TEXT
+);
+CREATE TABLE IF NOT EXISTS queue_snapshot (
+    chat_id INTEGER PRIMARY KEY,
+    tracks  TEXT NOT NULL
+);
+"""
+
+_STOP = object()
+
+State = Dict[int, Deque[dict]]
+
+
+def _apply(state: State, op: str, chat_id: int, payload) -> None:
+    """Replay one operation onto `state` (mirrors Process/queues.py)."""
+    if op == "add":
+        state.setdefault(chat_id, deque()).append(payload)
+    elif op == "extend":
+        state.setdefault(chat_id, deque()).extend(payload)
+    elif op == "pop":
+        q = state.get(chat_id)
+        if q:
+            q.popleft()
+    elif op == "remove":
+        q = state.get(chat_id)
+        if q and 0 <= payload < len(q):
+            del q[payload]
+    elif op == "clear":
+        state.pop(chat_id, None)
+
+
+class QueueJournal:
+    def __init__(self, path: str, compact_every: int = QUEUE_JOURNAL_COMPACT):
+        self.path = path
+        self.compact_every = max(1, compact_every)
+        self._ops: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._db: Optional[sqlite3.Connection] = None
+        self._state: State = {}
+        self._thread: Optional[threading.Thread] = None
+        self._since_compact = 0
+        self.written = 0
+        self.compactions = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    # ---------- startup ----------
+
+    def load(self) -> Dict[int, List[dict]]:
+        """
+        Rebuild the queues from the last snapshot plus the journal after it.
+        Returns {chat_id: [track dict, ...]} for chats with something queued.
+        """
+        db = self._conn()
+        state: State = {}
+        for chat_id, tracks in db.execute("SELECT chat_id, tracks FROM queue_snapshot"):
+            state[chat_id] = deque(json.loads(tracks))
+        replayed = 0
+        for chat_id, op, payload in db.execute("SELECT chat_id, op, payload FROM queue_ops ORDER BY seq"):
+            _apply(state, op, chat_id, json.loads(payload) if payload is not None else None)
+            replayed += 1
+        self._state = {c: q for c, q in state.items() if q}
+        if replayed:
+            logger.info("queue journal: replayed %d ops over %d chats", replayed, len(self._state))
+        return {c: list(q) for c, q in self._state.items()}
+
+    def start(self) -> None:
+        """Start recording queue mutations (after the loaded queues are back in QUEUE)."""
+        if self._thread is None:
+            self._conn()
+            self._thread = threading.Thread(target=self._run, name="queue-journal", daemon=True)
+            self._thread.start()
+            queues.add_listener(self.record)
+
+    # ---------- event loop side ----------
+
+    def record(self, op: str, chat_id: int, *args) -> None:
+        """queues.py listener: O(1), never touches disk."""
+        if op == "add":
+            payload = args[0].as_dict()
+        elif op == "extend":
+            payload = [t.as_dict() for t in args[0]]
+        elif op == "remove":
+            payload = args[0]
+        else:
+            payload = None
+        self._ops.put((op, chat_id, payload))
+
+    # ---------- writer thread ----------
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self._ops.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._ops.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [b for b in batch if b is not _STOP]
+            try:
+                if batch:
+                    self._write(batch)
+                if stopping or self._since_compact >= self.compact_every:
+                    self._compact()
+            except sqlite3.Error:
+                logger.exception("queue journal: write failed, %d ops lost", len(batch))
+
+    def _write(self, batch: list) -> None:
+        rows = []
+        for op, chat_id, payload in batch:
+            _apply(self._state, op, chat_id, payload)
+            rows.append((chat_id, op, json.dumps(payload, default=str) if payload is not None else None))
+        db = self._db
+        db.execute("BEGIN")
+        try:
+            db.executemany("INSERT INTO queue_ops (chat_id, op, payload) VALUES (?, ?, ?)", rows)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.written += len(rows)
+        self._since_compact += len(rows)
+
+    def _compact(self) -> None:
+        """Replace snapshot + journal with a snapshot of the current queues."""
+        db = self._db
+        db.execute("BEGIN")
+        try:
+            db.execute("DELETE FROM queue_snapshot")
+            db.executemany(
+                "INSERT INTO queue_snapshot (chat_id, tracks) VALUES (?, ?)",
+                [(c, json.dumps(list(q), default=str)) for c, q in self._state.items() if q],
+            )
+            db.execute("DELETE FROM queue_ops")
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._since_compact = 0
+        self.compactions += 1
+
+    # ---------- shutdown ----------
+
+    def stop(self) -> None:
+        """
+        Stop listening, flush what is pending and compact. Call before
+        leaving the calls on shutdown, or the leave handlers would journal
+        every queue as cleared.
+        """
+        queues.remove_listener(self.record)
+        if self._thread is not None:
+            self._ops.put(_STOP)
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        return {
+            "chats": len(self._state),
+            "pending": self._ops.qsize(),
+            "written": self.written,
+            "compactions": self.compactions,
+        }
+
+
+queue_journal = QueueJournal(QUEUE_JOURNAL_DB)
@@ -0,0 +1,159 @@
+"""
+Persistent on-disk cache for downloaded media.
+
+Entries are content-addressed: the file name is a hash of the cache key
+(video id + format + kind), so the same track always lands on the same
+file. Writes go to a temp file inside the cache directory and are moved
+into place with os.replace, so a concurrent reader never sees a partial
+file. Least recently used entries are evicted once the directory grows
+past its byte budget.
+"""
+
+import hashlib
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CACHE_DIR = os.environ.get("MEDIA_CACHE_DIR") or os.path.join("cache", "media")
+MEDIA_CACHE_BYTES = int(os.environ.get("MEDIA_CACHE_BYTES") or 2 * 1024 ** 3)
+# temp files untouched for this long are leftovers of a crashed write
+TMP_MAX_AGE = 6 * 3600
+
+
+class DiskCache:
+    """Size-bounded LRU of files in one directory."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.tmp_dir = os.path.join(directory, ".tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        # digest -> (path, size), oldest first
+        self._index: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    @staticmethod
+    def key(*parts) -> str:
+        return hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()
+
+    def _load(self) -> None:
+        """Rebuild the index from the directory, least recently used first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isfile(path):
+                continue
+            st = os.stat(path)
+            entries.append((max(st.st_atime, st.st_mtime), name.split(".", 1)[0], path, st.st_size))
+        for _, digest, path, size in sorted(entries):
+            self._index[digest] = (path, size)
+            self.total += size
+        # leftovers from writes interrupted by a crash; recent ones may be
+        # writes in progress in another process (pool children import this too)
+        cutoff = time.time() - TMP_MAX_AGE
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, digest: str) -> Optional[str]:
+        entry = self._index.get(digest)
+        if entry is None or not os.path.exists(entry[0]):
+            if entry is not None:
+                self._drop(digest)
+            self.misses += 1
+            return None
+        self._index.move_to_end(digest)
+        try:
+            now = time.time()
+            os.utime(entry[0], (now, now))
+        except OSError:
+            pass
+        self.hits += 1
+        return entry[0]
+
+    def tmp_path(self, ext: str = "") -> str:
+        """A unique path for an in-progress write; hand it to commit() when done."""
+        return os.path.join(self.tmp_dir, uuid.uuid4().hex + ext)
+
+    def discard(self, tmp_path: str) -> None:
+        """Remove a failed write and anything the writer left next to it (.part files)."""
+        stem = os.path.splitext(os.path.basename(tmp_path))[0]
+        for name in os.listdir(self.tmp_dir):
+            if name.startswith(stem):
+                self._remove_file(os.path.join(self.tmp_dir, name))
+
+    def commit(self, digest: str, tmp_path: str) -> str:
+        """Atomically move a finished temp file into the cache and return its path."""
+        ext = os.path.splitext(tmp_path)[1]
+        final = os.path.join(self.directory, digest + ext)
+        os.replace(tmp_path, final)
+        old = self._index.pop(digest, None)
+        if old:
+            self.total -= old[1]
+            if old[0] != final:
+                self._remove_file(old[0])
+        size = os.path.getsize(final)
+        self._index[digest] = (final, size)
+        self.total += size
+        # the caller is about to use it, even if everything else is pinned
+        self._evict(keep=digest)
+        return final
+
+    @contextmanager
+    def pinned(self, digest: str) -> Iterator[None]:
+        """Keep an entry from being evicted while it is being read (e.g. uploaded)."""
+        self._pins[digest] = self._pins.get(digest, 0) + 1
+        try:
+            yield
+        finally:
+            self._pins[digest] -= 1
+            if not self._pins[digest]:
+                del self._pins[digest]
+            self._evict()
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        for digest in list(self._index):
+            if self.total <= self.max_bytes:
+                break
+            if digest in self._pins or digest == keep:
+                continue
+            path, _ = self._index[digest]
+            self._drop(digest)
+            self._remove_file(path)
+
+    def _drop(self, digest: str) -> None:
+        _, size = self._index.pop(digest)
+        self.total -= size
+
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._index),
+            "bytes": self.total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+media_cache = DiskCache(MEDIA_CACHE_DIR, MEDIA_CACHE_BYTES)
@@ -1,6 +1,8 @@
 import os
-from typing import Optional
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from typing import BinaryIO, Optional, Union
+from PIL import Image, ImageDraw
+
+from Process.design import assets, gradient, text
 
 ROOT = os.path.dirname(os.path.dirname(__file__))
 FONT_PATH = os.path.join(ROOT, "ImageFont", "font.ttf")
@@ -10,25 +12,11 @@ CANVAS_H = 720
 ALBUM_SIZE = 480  # square album art
 
 def _load_font(size: int):
-    return ImageFont.truetype(FONT_PATH, size)
-
-def _rounded_rectangle(im, radius):
-    """Return mask for rounded corners."""
-    mask = Image.new("L", im.size, 0)
-    draw = ImageDraw.Draw(mask)
-    w, h = im.size
-    draw.rounded_rectangle([(0, 0), (w, h)], radius=radius, fill=255)
-    return mask
+    return assets.font(FONT_PATH, size)
 
 def _make_gradient(w, h, top_color, bottom_color):
-    base = Image.new("RGB", (w, h), top_color)
-    top = Image.new("RGB", (w, h), bottom_color)
-    mask = Image.new("L", (w, h))
-    for y in range(h):
-        mask.putpixel((0, y), int(255 * (y / h)))
-    mask = mask.resize((w, h))
-    grad = Image.composite(base, top, mask)
-    return grad
+    """Shared, memoized vertical gradient (read-only)."""
+    return gradient.vertical((w, h), top_color, bottom_color)
 
 def _draw_text_with_stroke(draw, xy, text, font, fill, stroke_fill, stroke_width):
     # Pillow supports stroke_width and stroke_fill in text() (Pillow >= 8.0)
@@ -38,16 +26,19 @@ def generate_song_card(
     title: str,
     artist: str = "",
     duration: str = "",
-    album_art: Optional[str] = None,
-    output_path: str = "thumbnail.jpg"
-) -> str:
+    album_art: Optional[Union[str, bytes]] = None,
+    output_path: Union[str, BinaryIO] = "thumbnail.jpg",
+    format: Optional[str] = None,
+) -> Union[str, BinaryIO]:
     """
     Generate a 1280x720 song thumbnail.
     - title: song title (big)
     - artist: artist / album (small)
     - duration: e.g. 03:45 (small)
-    - album_art: optional local path or URL for album image
-    - output_path: where to save final jpg
+    - album_art: optional image bytes or local path for album image
+      (fetch URLs with Process.http.client first)
+    - output_path: where to save final jpg, or a binary file object
+      (e.g. io.BytesIO; then pass `format`, e.g. "JPEG")
     Returns output_path.
     """
     # canvas + gradient background
@@ -72,17 +63,11 @@ def generate_song_card(
         album = Image.new("RGBA", (ALBUM_SIZE, ALBUM_SIZE), (30, 30, 30))
 
     # add subtle border and shadow for album
-    shadow = Image.new("RGBA", (ALBUM_SIZE + 40, ALBUM_SIZE + 40), (0, 0, 0, 0))
-    sh_draw = ImageDraw.Draw(shadow)
-    sh_draw.ellipse((0, 0, ALBUM_SIZE + 40, ALBUM_SIZE + 40), fill=(0, 0, 0, 180))
-    shadow = shadow.filter(ImageFilter.GaussianBlur(18))
+    shadow = assets.ellipse_shadow(ALBUM_SIZE + 40, 180, 18)
     canvas.paste(shadow, (album_x - 20, album_y - 20), shadow)
 
     # rounded album
-    mask = Image.new("L", (ALBUM_SIZE, ALBUM_SIZE), 0)
-    mdraw = ImageDraw.Draw(mask)
-    mdraw.rounded_rectangle([(0, 0), (ALBUM_SIZE, ALBUM_SIZE)], radius=30, fill=255)
-    canvas.paste(album, (album_x, album_y), mask)
+    canvas.paste(album, (album_x, album_y), assets.rounded_mask((ALBUM_SIZE, ALBUM_SIZE), 30))
 
     # right side texts
     right_x = album_x + ALBUM_SIZE + 60
@@ -90,31 +75,14 @@ def generate_song_card(
 
     # Title
     title_font = _load_font(72)
-    # measure and wrap if needed
-    def _wrapped_text(text, font, max_width):
-        words = text.split()
-        lines = []
-        cur = ""
-        for w in words:
-            test = f"{cur} {w}".strip()
-            if ImageDraw.Draw(Image.new("RGB", (1,1))).textsize(test, font=font)[0] <= max_width:
-                cur = test
-            else:
-                lines.append(cur)
-                cur = w
-        if cur:
-            lines.append(cur)
-        return lines
-
-    title_lines = _wrapped_text(title, title_font, max_w)
-    # draw shadow first (slightly offset)
-    y_text = (CANVAS_H // 2) - 40 - (len(title_lines)-1)*40
-    for line in title_lines:
-        # shadow
-        draw.text((right_x+3, y_text+3), line, font=title_font, fill=(0,0,0,180))
-        # stroke + fill
-        draw.text((right_x, y_text), line, font=title_font, fill=(255,255,255), stroke_width=2, stroke_fill=(0,0,0))
-        y_text += 78
+    # measure and wrap if needed (at most 3 lines, the last one ellipsized)
+    runs = text.layout(title, title_font, max_w, origin=(right_x, 0), line_step=78, max_lines=3)
+    y_text = (CANVAS_H // 2) - 40 - (len(runs)-1)*40
+    for run in runs:
+        run.y += y_text
+    # shadow first (slightly offset), then stroke + fill
+    text.draw_runs(draw, runs, title_font, shadow=(3, 3, (0,0,0,180)), fill=(255,255,255), stroke_width=2, stroke_fill=(0,0,0))
+    y_text += 78 * len(runs)
 
     # artist
     if artist:
@@ -125,7 +93,7 @@ def generate_song_card(
     # duration bottom-right
     if duration:
         dur_font = _load_font(28)
-        w_dur, h_dur = draw.textsize(duration, font=dur_font)
+        w_dur, h_dur = text.size(dur_font, duration)
         draw.rectangle([(CANVAS_W - 80 - w_dur - 20, CANVAS_H - 80 - h_dur - 10),
                         (CANVAS_W - 80, CANVAS_H - 80 + 10)], fill=(0,0,0,120))
         draw.text((CANVAS_W - 80 - w_dur - 10, CANVAS_H - 80 - h_dur), duration, font=dur_font, fill=(255,255,255))
@@ -135,13 +103,8 @@ def generate_song_card(
     footer_text = f"Powered by {os.getenv('BOT_NAME', 'JOKER_MUSIC')}"
     draw.text((right_x, CANVAS_H - 60), footer_text, font=footer_font, fill=(180,180,180))
 
-    # finalize: rounded corners for whole image
-    final = Image.new("RGBA", canvas.size)
-    final.paste(canvas, (0, 0))
-    mask = _rounded_rectangle(final, radius=28)
-    final.putalpha(mask)
-
-    # convert to RGB and save as JPEG
-    out = final.convert("RGB")
-    out.save(output_path, quality=88, optimize=True)
+    # convert to RGB and save as JPEG (the RGB conversion drops alpha, so a
+    # rounded-corner mask here would never reach the output)
+    out = canvas.convert("RGB")
+    out.save(output_path, format=format, quality=88, optimize=True)
     return output_path
@@ -1,20 +1,22 @@
 import os
-import requests
 from PIL import Image
 from io import BytesIO
+from typing import Union
 
 ROOT = os.path.dirname(os.path.dirname(__file__))
 FONT_PATH = os.path.join(ROOT, "ImageFont", "font.ttf")
 
-def load_image(path_or_url: str, size=(512, 512)) -> Image.Image:
+def load_image(path_or_bytes: Union[str, bytes], size=(512, 512)) -> Image.Image:
     """
-    Load image from local path or URL and return a PIL Image resized to `size`.
+    Load image from raw bytes or a local path and return a PIL Image
+    resized to `size`. URLs are not fetched here: download them with the
+    shared client (Process.http.client.get_bytes) and pass the bytes.
     """
-    if path_or_url.startswith("http://") or path_or_url.startswith("https://"):
-        resp = requests.get(path_or_url, timeout=10)
-        resp.raise_for_status()
-        img = Image.open(BytesIO(resp.content)).convert("RGBA")
+    if isinstance(path_or_bytes, (bytes, bytearray)):
+        img = Image.open(BytesIO(path_or_bytes)).convert("RGBA")
+    elif path_or_bytes.startswith("http://") or path_or_bytes.startswith("https://"):
+        raise ValueError("load_image takes bytes for remote images, fetch the URL first")
     else:
-        img = Image.open(path_or_url).convert("RGBA")
+        img = Image.open(path_or_bytes).convert("RGBA")
     img = img.resize(size, Image.LANCZOS)
     return img
@@ -1,11 +1,11 @@
-import os
+import io
 import uuid
-import aiofiles
-import aiohttp
-from PIL import Image, ImageDraw, ImageFont, ImageOps
+from PIL import Image, ImageDraw, ImageOps
 
-from Process.design.thumbnail import changeImageSize   # safe reuse
+from Process.design import assets
+from Process.design.assets import change_image_size
 from Process.design.chatname import CHAT_TITLE
+from Process.http import client
 
 # fallback font paths
 FONT_MAIN = "Process/ImageFont/finalfont.ttf"
@@ -14,10 +14,7 @@ OVERLAY_IMAGE = "Process/ImageFont/Red.png"
 
 
 def safe_font(path: str, size: int):
-    try:
-        return ImageFont.truetype(path, size)
-    except Exception:
-        return ImageFont.load_default()
+    return assets.font(path, size)
 
 
 async def thumb(title: str, thumbnail: str, userid: int, ctitle: str):
@@ -31,34 +28,26 @@ async def thumb(title: str, thumbnail: str, userid: int, ctitle: str):
     short_title = (title[:27] + "...") if len(title) > 27 else title
     short_chat = (clean_ctitle[:14] + "...") if len(clean_ctitle) > 14 else clean_ctitle
 
-    # unique temp name to avoid conflicts
+    # unique name to avoid conflicts
     uid = uuid.uuid4().hex
-    bg_temp = f"bg_{uid}.png"
     final_out = f"final_{uid}.png"
 
-    # download thumbnail
+    # download thumbnail (kept in memory)
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(thumbnail) as resp:
-                if resp.status == 200:
-                    async with aiofiles.open(bg_temp, "wb") as f:
-                        await f.write(await resp.read())
-                else:
-                    return None
+        bg_bytes = await client.get_bytes(thumbnail)
     except Exception:
         return None
 
     try:
         # load and resize background image
-        bg_img = Image.open(bg_temp).convert("RGBA")
-        bg_img = changeImageSize(1280, 720, bg_img)
+        bg_img = Image.open(io.BytesIO(bg_bytes)).convert("RGBA")
+        bg_img = change_image_size(1280, 720, bg_img)
 
-        # overlay image (PNG with transparent design)
-        overlay = Image.open(OVERLAY_IMAGE).convert("RGBA")
-        overlay = changeImageSize(1280, 720, overlay)
+        # overlay image (PNG with transparent design), loaded once per size
+        overlay = assets.overlay(OVERLAY_IMAGE, bg_img.size)
 
         # composite both layers
-        composed = Image.alpha_composite(bg_img, overlay)
+        composed = Image.alpha_composite(bg_img, overlay) if overlay else bg_img
 
         # draw text
         draw = ImageDraw.Draw(composed)
@@ -89,9 +78,4 @@ async def thumb(title: str, thumbnail: str, userid: int, ctitle: str):
     except Exception:
         return None
 
-    finally:
-        # cleanup temp file
-        if os.path.exists(bg_temp):
-            os.remove(bg_temp)
-
     return final_out
@@ -1,6 +1,72 @@
-from typing import List
-from pyrogram.types import Chat
-from Process.Cache.admins import get as cache_get, set as cache_set
+import asyncio
+import logging
+from typing import Dict, List
+
+from pyrogram import Client
+from pyrogram.types import Chat, ChatMember
+
+from Process.Cache import admins as admin_cache
+
+log = logging.getLogger(__name__)
+
+# chat_id -> running admin list fetch, so simultaneous taps share one API call
+_fetches: Dict[int, asyncio.Task] = {}
+
+
+def can_control(member: ChatMember) -> bool:
+    """Creator, or an admin with the manage voice chats right."""
+    user = member.user
+    # ignore deleted accounts
+    if not user or user.is_deleted:
+        return False
+    if member.status == "creator":
+        return True
+    perms = member.privileges if hasattr(member, "privileges") else member
+    return bool(getattr(perms, "can_manage_voice_chats", False))
+
+
+async def _fetch(client: Client, chat_id: int) -> List[int]:
+    try:
+        # fetch admin members from Telegram
+        members = client.get_chat_members(chat_id, filter="administrators")
+        if hasattr(members, "__aiter__"):
+            members = [m async for m in members]
+        else:
+            members = await members
+    except Exception as e:
+        log.warning("admin list of %s unavailable: %s", chat_id, e)
+        stale = admin_cache.set_failed(chat_id)
+        if stale is None:
+            # never fetched: let the caller report it, the next tap asks again
+            raise
+        return stale
+
+    valid_admins = [m.user.id for m in members if can_control(m)]
+    # store in cache
+    admin_cache.set(chat_id, valid_admins)
+    return admin_cache.get(chat_id) or []
+
+
+async def voice_admins(client: Client, chat_id: int, refresh: bool = False) -> List[int]:
+    """
+    Return the cached list of user IDs who can manage voice chats in `chat_id`.
+    If not cached (or `refresh`), fetch it from Telegram, store, and return.
+    Raises if the fetch fails and there is no earlier list to fall back on.
+    """
+    if not refresh:
+        cached = await admin_cache.load(chat_id)
+        if cached is not None:
+            return cached
+    return await asyncio.shield(_start_fetch(client, chat_id))
+
+
+def _start_fetch(client: Client, chat_id: int) -> asyncio.Task:
+    task = _fetches.get(chat_id)
+    if task is None:
+        task = asyncio.ensure_future(_fetch(client, chat_id))
+        _fetches[chat_id] = task
+        task.add_done_callback(lambda _: _fetches.pop(chat_id, None))
+    return task
 
 
 async def get_administrators(chat: Chat) -> List[int]:
@@ -8,35 +74,32 @@ async def get_administrators(chat: Chat) -> List[int]:
     Return cached list of admin IDs who can manage voice chats.
     If not cached, fetch from Telegram, store, and return.
     """
+    return await voice_admins(chat._client, chat.id)
 
-    # try cached admins first
-    cached = cache_get(chat.id)
-    if cached:
-        return cached
-
-    try:
-        # fetch admin members from Telegram
-        admins = await chat.get_members(filter="administrators")
-    except Exception:
-        return []
 
-    valid_admins = []
+async def is_voice_admin(client: Client, chat_id: int, user_id: int) -> bool:
+    """Permission check for control buttons; one admin-list fetch per chat per TTL."""
+    allowed = admin_cache.is_admin(chat_id, user_id)
+    if allowed is None:
+        allowed = user_id in await voice_admins(client, chat_id)
+    return allowed
 
-    for member in admins:
-        user = member.user
 
-        # ignore deleted accounts
-        if not user or user.is_deleted:
-            continue
+def warm(client: Client, chat_id: int) -> None:
+    """Fetch a chat's admin list in the background (e.g. when it starts streaming)."""
+    if admin_cache.get(chat_id) is None:
+        # through voice_admins, so a list already in the state store is used
+        asyncio.ensure_future(_warm(client, chat_id))
 
-        perms = member.privileges if hasattr(member, "privileges") else member
-        if hasattr(perms, "can_manage_voice_chats") and perms.can_manage_voice_chats:
-            valid_admins.append(user.id)
 
-    # ensure list unique and sorted
-    valid_admins = sorted(list(set(valid_admins)))
+async def _warm(client: Client, chat_id: int) -> None:
+    try:
+        await voice_admins(client, chat_id)
+    except Exception:
+        pass  # logged by _fetch; the next tap tries again
 
-    # store in cache
-    cache_set(chat.id, valid_admins)
 
-    return valid_admins
+def on_member_updated(chat_id: int, member: ChatMember) -> None:
+    """Keep a cached admin list in step with a ChatMemberUpdated event."""
+    if member and member.user:
+        admin_cache.update_member(chat_id, member.user.id, can_control(member) and member.status in ("creator", "administrator"))
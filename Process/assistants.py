@@ -0,0 +1,241 @@
+"""
+Pool of assistant (userbot) accounts.
+
+One user account and one PyTgCalls instance can only carry so many
+voice chats. With several session strings configured, each chat is
+served by one assistant of the pool:
+
+- Chats map onto a consistent-hash ring (VNODES points per assistant),
+  so a group keeps landing on the same assistant — the one that is
+  already a member — and adding an account only moves ~1/n of the chats.
+- Bounded load: walking the ring, an assistant already carrying more than
+  ASSISTANT_LOAD_FACTOR × the average number of calls is skipped.
+- A chat with a running call sticks to its assistant until it leaves.
+
+`CallRouter` stands in for the single PyTgCalls object: calls taking a
+chat id go to that chat's instance, and event handlers are registered
+on every instance.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import math
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+VNODES = 64
+ASSISTANT_LOAD_FACTOR = float(os.environ.get("ASSISTANT_LOAD_FACTOR") or 1.25)
+# how long `pick` keeps a chat on the chosen assistant before the call starts
+RESERVATION_TTL = 120.0
+
+# pytgcalls decorators whose events mean the assistant is no longer in the call
+_LEAVE_EVENTS = ("on_kicked", "on_closed_voice_chat", "on_left")
+
+
+def _hash(key: str) -> int:
+    return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+
+class Assistant:
+    __slots__ = ("index", "client", "calls", "healthy")
+
+    def __init__(self, index: int, client, calls):
+        self.index = index
+        self.client = client
+        self.calls = calls
+        self.healthy = True
+
+    def __repr__(self) -> str:
+        return f"Assistant(#{self.index})"
+
+
+class AssistantPool:
+    def __init__(self, assistants: List[Assistant], load_factor: float = ASSISTANT_LOAD_FACTOR):
+        if not assistants:
+            raise ValueError("assistant pool needs at least one assistant")
+        self.assistants = assistants
+        self.load_factor = max(1.0, load_factor)
+        ring = [(_hash(f"{a.index}:{v}"), a.index) for a in assistants for v in range(VNODES)]
+        ring.sort()
+        self._ring_keys = [h for h, _ in ring]
+        self._ring = [i for _, i in ring]
+        self._active: Dict[int, int] = {}  # chat_id -> assistant index, call running
+        self._reserved: Dict[int, Tuple[int, float]] = {}  # chat_id -> (index, expiry)
+
+    def _loads(self) -> List[int]:
+        now = time.monotonic()
+        self._reserved = {c: r for c, r in self._reserved.items() if r[1] > now}
+        loads = [0] * len(self.assistants)
+        for idx in self._active.values():
+            loads[idx] += 1
+        for chat_id, (idx, _) in self._reserved.items():
+            if chat_id not in self._active:
+                loads[idx] += 1
+        return loads
+
+    def pick(self, chat_id: int, reserve: bool = True) -> Assistant:
+        """
+        Assistant that serves (or is about to serve) `chat_id`. With
+        `reserve=False` (e.g. the assistant is about to leave the chat)
+        nothing is held for the chat.
+        """
+        idx = self._active.get(chat_id)
+        if idx is not None:
+            return self.assistants[idx]
+        reserved = self._reserved.get(chat_id)
+        if reserved and reserved[1] > time.monotonic():
+            return self.assistants[reserved[0]]
+
+        loads = self._loads()
+        healthy = [a for a in self.assistants if a.healthy] or self.assistants
+        capacity = math.ceil((sum(loads) + 1) / len(healthy) * self.load_factor)
+        start = bisect.bisect(self._ring_keys, _hash(str(chat_id))) % len(self._ring)
+        chosen = None
+        for step in range(len(self._ring)):
+            a = self.assistants[self._ring[(start + step) % len(self._ring)]]
+            if a.healthy and loads[a.index] < capacity:
+                chosen = a
+                break
+        if chosen is None:
+            chosen = min(healthy, key=lambda a: loads[a.index])
+        if reserve:
+            self._reserved[chat_id] = (chosen.index, time.monotonic() + RESERVATION_TTL)
+        return chosen
+
+    def joined(self, chat_id: int, assistant: Assistant) -> None:
+        self._active[chat_id] = assistant.index
+        self._reserved.pop(chat_id, None)
+
+    def left(self, chat_id: int) -> None:
+        self._active.pop(chat_id, None)
+        self._reserved.pop(chat_id, None)
+
+    def serving(self, chat_id: int) -> Optional[Assistant]:
+        idx = self._active.get(chat_id)
+        return self.assistants[idx] if idx is not None else None
+
+    def stats(self) -> dict:
+        loads = self._loads()
+        return {
+            "assistants": len(self.assistants),
+            "healthy": sum(1 for a in self.assistants if a.healthy),
+            "loads": loads,
+        }
+
+
+class CallRouter:
+    """Drop-in for one PyTgCalls: routes per chat to the pool's instances."""
+
+    def __init__(self, pool: AssistantPool):
+        self.pool = pool
+
+    @property
+    def instances(self) -> list:
+        return [a.calls for a in self.pool.assistants]
+
+    async def start(self) -> None:
+        async def _start(a: Assistant) -> None:
+            if not a.healthy:
+                # its client already failed to start
+                return
+            try:
+                if not getattr(a.client, "is_connected", False):
+                    await a.client.start()
+                await a.calls.start()
+            except Exception:
+                a.healthy = False
+                log.exception("assistant #%d failed to start; taking it out of the pool", a.index)
+
+        await asyncio.gather(*(_start(a) for a in self.pool.assistants))
+        if not any(a.healthy for a in self.pool.assistants):
+            raise RuntimeError("no assistant could be started")
+
+    async def stop(self) -> None:
+        async def _stop(a: Assistant) -> None:
+            try:
+                stop = getattr(a.calls, "stop", None)
+                if stop:
+                    await stop()
+                if getattr(a.client, "is_connected", True):
+                    await a.client.stop()
+            except Exception:
+                log.debug("assistant #%d did not stop cleanly", a.index, exc_info=True)
+
+        await asyncio.gather(*(_stop(a) for a in self.pool.assistants))
+
+    def assistant_for(self, chat_id: int) -> Assistant:
+        return self.pool.pick(chat_id)
+
+    def client_for(self, chat_id: int, reserve: bool = True):
+        """
+        The userbot Client that is (or will be) in the call of `chat_id`.
+        Pass `reserve=False` when it is only going to leave the chat.
+        """
+        return self.pool.pick(chat_id, reserve).client
+
+    async def join_group_call(self, chat_id: int, *args, **kwargs):
+        assistant = self.pool.pick(chat_id)
+        result = await assistant.calls.join_group_call(chat_id, *args, **kwargs)
+        self.pool.joined(chat_id, assistant)
+        return result
+
+    async def leave_group_call(self, chat_id: int, *args, **kwargs):
+        try:
+            return await self._calls(chat_id).leave_group_call(chat_id, *args, **kwargs)
+        finally:
+            self.pool.left(chat_id)
+
+    def _calls(self, chat_id: int):
+        assistant = self.pool.serving(chat_id) or self.pool.pick(chat_id)
+        return assistant.calls
+
+    def _register(self, name: str, *dargs, **dkwargs) -> Callable:
+        """`@call_py.on_x()` -> the same decorator on every instance."""
+
+        def decorator(func: Callable) -> Callable:
+            if name in _LEAVE_EVENTS:
+                async def handler(client, chat_id, *args, **kwargs):
+                    self.pool.left(chat_id)
+                    return await func(client, chat_id, *args, **kwargs)
+            else:
+                handler = func
+
+            for calls in self.instances:
+                getattr(calls, name)(*dargs, **dkwargs)(handler)
+            return func
+
+        return decorator
+
+    def _gather(self, name: str, first):
+        """A plain attribute (active_calls, calls, ...) across every instance."""
+        if len(self.instances) == 1:
+            return first
+        values = [first] + [getattr(calls, name) for calls in self.instances[1:]]
+        if isinstance(first, dict):
+            merged = {}
+            for value in values:
+                merged.update(value)
+            return merged
+        if isinstance(first, (list, tuple, set, frozenset)):
+            return [item for value in values for item in value]
+        # scalars (ping, ...) don't add up; the first instance stands for all
+        return first
+
+    def __getattr__(self, name: str):
+        first = self.pool.assistants[0].calls
+        attr = getattr(first, name)  # AttributeError for names PyTgCalls lacks
+        if name.startswith("on_"):
+            return lambda *a, **k: self._register(name, *a, **k)
+        if not callable(attr):
+            return self._gather(name, attr)
+
+        def routed(chat_id, *args, **kwargs):
+            return getattr(self._calls(chat_id), name)(chat_id, *args, **kwargs)
+
+        routed.__name__ = name
+        return routed
@@ -0,0 +1,362 @@
+"""
+Broadcast engine for /gcast.
+
+Telegram lets a bot send roughly 30 messages per second overall, one
+per second into a private chat and about 20 per minute into a group.
+Instead of one send every 0.7s, a broadcast runs BROADCAST_CONCURRENCY
+senders that share one token bucket (BROADCAST_RATE messages/second)
+and wait out a per-chat interval.
+
+A FloodWait pauses every sender for the requested time, halves the
+rate, and the chat is tried again (MAX_ATTEMPTS in all). The rate then
+creeps back up after a few seconds of clean sends.
+
+Chats that were sent to are checkpointed in the state store under the
+broadcast's key (source chat + message). Running the same broadcast
+again after an interruption only sends to the remaining chats, failed
+ones included. Checkpoints only outlive the process with a persistent
+STATE_URL (sqlite / redis); on memory:// a restart forgets them.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterable, Awaitable, Callable, Dict, Iterable, Optional, Set, Union
+
+from pyrogram.errors import FloodWait
+
+from Process.errors import BroadcastRunning
+from Process.state import store
+
+log = logging.getLogger(__name__)
+
+BROADCAST_RATE = float(os.environ.get("BROADCAST_RATE") or 25)
+BROADCAST_CONCURRENCY = int(os.environ.get("BROADCAST_CONCURRENCY") or 8)
+# seconds between two messages into the same chat
+PRIVATE_INTERVAL = 1.0
+GROUP_INTERVAL = 3.0
+# the rate never drops below this, however many FloodWaits come in
+MIN_RATE = 1.0
+# attempts per chat (FloodWaits included) before it counts as failed
+MAX_ATTEMPTS = 3
+CHECKPOINT_EVERY = 50
+CHECKPOINT_TTL = 3 * 24 * 3600
+PROGRESS_INTERVAL = 5.0
+
+NAMESPACE = "broadcast"
+
+SendFunc = Callable[[int], Awaitable[object]]
+ProgressCallback = Callable[["Broadcast"], Awaitable[None]]
+
+
+def flood_wait_seconds(e: FloodWait) -> float:
+    # pyrogram 1.x: e.x, 2.x: e.value
+    return float(getattr(e, "value", None) or getattr(e, "x", None) or 10)
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second, bursts of up to `burst`. Waiters are served
+    in order. `penalize` / `reward` adapt the rate to FloodWaits.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.base_rate = max(MIN_RATE, rate)
+        self.rate = self.base_rate
+        self.capacity = burst or max(1.0, self.base_rate)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._clean = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    async def acquire(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def penalize(self, wait: float) -> None:
+        """Stop for `wait` seconds and continue at half the rate."""
+        now = time.monotonic()
+        self._refill(now)
+        # sends that were in flight report the same flood; halve once per pause
+        if now >= self._paused_until:
+            self.rate = max(MIN_RATE, self.rate / 2)
+        self._paused_until = max(self._paused_until, now + wait)
+        self._tokens = 0.0
+        self._clean = 0
+
+    def reward(self) -> None:
+        """One clean send; after ~5s worth of them the rate goes up by a quarter."""
+        if self.rate >= self.base_rate:
+            return
+        self._clean += 1
+        if self._clean >= self.rate * 5:
+            self._refill(time.monotonic())
+            self.rate = min(self.base_rate, self.rate * 1.25)
+            self._clean = 0
+
+    @property
+    def paused_for(self) -> float:
+        return max(0.0, self._paused_until - time.monotonic())
+
+
+class Broadcast:
+    """One broadcast run: `await Broadcast(key, send).run(chat_ids)`."""
+
+    def __init__(
+        self,
+        key: str,
+        send: SendFunc,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        rate: float = BROADCAST_RATE,
+    ):
+        self.key = key
+        self.send = send
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate)
+        self.done: Set[int] = set()  # sent to, here or in an earlier run
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0  # already done in an earlier, interrupted run
+        self.scanned = 0
+        self.flood_waits = 0
+        self.started = 0.0
+        self.finished = False
+        self._resumed = False
+        self._next_send: Dict[int, float] = {}
+        self._since_checkpoint = 0
+        self._cancelled = False
+        self._loaded = False
+        self._sent_at_start = 0
+
+    # ---------- checkpoint ----------
+
+    async def load(self) -> "Broadcast":
+        """Pick up the checkpoint of an earlier run (read off the event loop); `run` calls it too."""
+        if not self._loaded:
+            saved = await asyncio.to_thread(store.get, NAMESPACE, self.key)
+            self._loaded = True
+            if saved:
+                self.done = set(saved["done"])
+                self.sent = saved["sent"]
+                self._resumed = True
+            self._sent_at_start = self.sent
+        return self
+
+    def checkpoint(self) -> None:
+        self._since_checkpoint = 0
+        # a fresh dict: the store's writer pickles it off the event loop
+        store.set_later(
+            NAMESPACE,
+            self.key,
+            {"done": list(self.done), "sent": self.sent},
+            ttl=CHECKPOINT_TTL,
+        )
+
+    @property
+    def persistent(self) -> bool:
+        """False when checkpoints live in memory only and a restart loses them."""
+        return store.persistent
+
+    @property
+    def resumed(self) -> bool:
+        """True when this run continues an interrupted one."""
+        return self._resumed
+
+    # ---------- sending ----------
+
+    async def _wait_for_chat(self, chat_id: int) -> None:
+        now = time.monotonic()
+        ready = self._next_send.get(chat_id, 0.0)
+        self._next_send[chat_id] = max(now, ready) + (PRIVATE_INTERVAL if chat_id > 0 else GROUP_INTERVAL)
+        if ready > now:
+            await asyncio.sleep(ready - now)
+
+    async def _deliver(self, chat_id: int) -> Optional[bool]:
+        """True if sent, False if it failed, None if cancelled before sending."""
+        for attempt in range(MAX_ATTEMPTS):
+            await self._wait_for_chat(chat_id)
+            await self.bucket.acquire()
+            if self._cancelled:
+                return None
+            try:
+                await self.send(chat_id)
+            except FloodWait as e:
+                wait = flood_wait_seconds(e)
+                self.flood_waits += 1
+                self.bucket.penalize(wait + 1)
+                log.warning("broadcast %s: FloodWait %.0fs, now at %.1f msg/s", self.key, wait, self.bucket.rate)
+                continue
+            except Exception as e:
+                log.debug("broadcast %s: sending to %s failed: %s", self.key, chat_id, e)
+                return False
+            self.bucket.reward()
+            return True
+        return False
+
+    async def _sender(self, todo: asyncio.Queue) -> None:
+        while True:
+            chat_id = await todo.get()
+            try:
+                if chat_id is None:
+                    return
+                # once cancelled, keep draining so the producer never blocks
+                if self._cancelled:
+                    continue
+                ok = await self._deliver(chat_id)
+                if ok is None:
+                    continue
+                if not ok:
+                    # not checkpointed: a resumed run tries it again
+                    self.failed += 1
+                    continue
+                self.sent += 1
+                self.done.add(chat_id)
+                self._since_checkpoint += 1
+                if self._since_checkpoint >= CHECKPOINT_EVERY:
+                    self.checkpoint()
+            finally:
+                todo.task_done()
+
+    @staticmethod
+    async def _put(todo: asyncio.Queue, item, senders) -> None:
+        """
+        `todo.put`, unless a sender died (e.g. the checkpoint write
+        raised): then its error is raised here instead of waiting forever
+        for a free slot.
+        """
+        put = asyncio.ensure_future(todo.put(item))
+        try:
+            while not put.done():
+                for task in senders:
+                    if task.done() and not task.cancelled() and task.exception() is not None:
+                        raise task.exception()
+                live = [task for task in senders if not task.done()]
+                if not live:
+                    raise RuntimeError("every broadcast sender has stopped")
+                await asyncio.wait([put, *live], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not put.done():
+                put.cancel()
+
+    async def _report(self, on_progress: ProgressCallback) -> None:
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            try:
+                await on_progress(self)
+            except Exception as e:
+                # progress edits are best effort (message deleted, not modified, ...)
+                log.debug("broadcast progress callback failed: %s", e)
+
+    async def run(
+        self,
+        targets: Union[Iterable[int], AsyncIterable[int]],
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> "Broadcast":
+        """
+        Send to every chat in `targets` (an iterable or async iterable of
+        chat ids, consumed while sending). Returns self with the totals.
+        """
+        if self.key in running:
+            raise BroadcastRunning(self.key)
+        running[self.key] = self
+        try:
+            await self.load()
+        except BaseException:
+            running.pop(self.key, None)
+            raise
+        self.started = time.monotonic()
+        todo: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 4)
+        senders = [asyncio.ensure_future(self._sender(todo)) for _ in range(self.concurrency)]
+        reporter = asyncio.ensure_future(self._report(on_progress)) if on_progress else None
+        seen: Set[int] = set()
+        try:
+            async for chat_id in _aiter(targets):
+                if self._cancelled:
+                    break
+                if chat_id in seen:
+                    continue
+                seen.add(chat_id)
+                self.scanned += 1
+                if chat_id in self.done:
+                    self.skipped += 1
+                    continue
+                await self._put(todo, chat_id, senders)
+            for _ in senders:
+                await self._put(todo, None, senders)
+            await asyncio.gather(*senders)
+            self.finished = not self._cancelled
+        finally:
+            for task in senders:
+                task.cancel()
+            if reporter:
+                reporter.cancel()
+            running.pop(self.key, None)
+            try:
+                if self.finished and not self.failed:
+                    store.delete(NAMESPACE, self.key)
+                else:
+                    # cancelled, crashed or some chats failed: keep what
+                    # was sent, so running it again only does the rest
+                    self.checkpoint()
+            except Exception:
+                # don't hide the error that ended the run
+                log.exception("broadcast %s: saving the checkpoint failed", self.key)
+        return self
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    # ---------- reporting ----------
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started if self.started else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Messages per second sent in this run (earlier runs not counted)."""
+        elapsed = self.elapsed
+        return (self.sent - self._sent_at_start) / elapsed if elapsed > 0 else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "scanned": self.scanned,
+            "flood_waits": self.flood_waits,
+            "rate": round(self.bucket.rate, 1),
+            "paused": round(self.bucket.paused_for),
+            "msgs_per_sec": round(self.throughput, 1),
+            "elapsed": round(self.elapsed),
+        }
+
+
+# key -> broadcast in progress
+running: Dict[str, Broadcast] = {}
+
+
+async def _aiter(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
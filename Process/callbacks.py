@@ -0,0 +1,163 @@
+"""
+Callback-query routing.
+
+Button data is `action|arg|arg...` (see `encode`). One dispatcher
+decodes it and looks the action up in a dict, instead of every handler
+running its own regex against every tap (where `cls` also matched inside
+other actions' data). Shared middleware runs once per tap, before the
+handler:
+
+- per-user debounce for state-changing actions (`debounce=True`
+  routes): repeated taps of the same action within CALLBACK_DEBOUNCE
+  seconds are dropped; menu navigation is never debounced
+- admin check for stream controls (`admin=True` routes)
+
+Data from buttons posted before this format, `action` or
+`action arg|arg`, still decodes to the same (action, args).
+"""
+
+import inspect
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Tuple
+
+from Process.admins import is_voice_admin
+
+log = logging.getLogger(__name__)
+
+CALLBACK_DEBOUNCE = float(os.environ.get("CALLBACK_DEBOUNCE") or 0.8)
+# Telegram's limit for InlineKeyboardButton.callback_data
+MAX_DATA_BYTES = 64
+
+SEP = "|"
+_ESC = "\\"
+
+Handler = Callable[..., Awaitable[None]]
+
+
+# ---------- codec ----------
+
+
+def _escape(arg) -> str:
+    return str(arg).replace(_ESC, _ESC + _ESC).replace(SEP, _ESC + SEP)
+
+
+def _split(data: str) -> List[str]:
+    parts, cur, i = [], [], 0
+    while i < len(data):
+        ch = data[i]
+        if ch == _ESC and i + 1 < len(data):
+            cur.append(data[i + 1])
+            i += 2
+            continue
+        if ch == SEP:
+            parts.append("".join(cur))
+            cur = []
+        else:
+            cur.append(ch)
+        i += 1
+    parts.append("".join(cur))
+    return parts
+
+
+def encode(action: str, *args) -> str:
+    """`encode("song_download", "audio", 140, vid)` -> "song_download|audio|140|<vid>"."""
+    data = SEP.join([action, *(_escape(a) for a in args)])
+    if len(data.encode()) > MAX_DATA_BYTES:
+        raise ValueError(f"callback data too long ({len(data.encode())} > {MAX_DATA_BYTES} bytes): {data!r}")
+    return data
+
+
+def decode(data: str) -> Tuple[str, List[str]]:
+    """Inverse of `encode`; also reads the legacy "action arg|arg" form."""
+    data = data or ""
+    space, sep = data.find(" "), data.find(SEP)
+    if space != -1 and (sep == -1 or space < sep):
+        action, rest = data[:space], data[space + 1:]
+        return action, rest.split(SEP) if rest else []
+    parts = _split(data)
+    return parts[0], parts[1:]
+
+
+# ---------- router ----------
+
+
+class Route(NamedTuple):
+    handler: Handler
+    admin: bool
+    debounce: bool
+    takes_args: bool
+
+
+class CallbackRouter:
+    def __init__(self, debounce: float = CALLBACK_DEBOUNCE):
+        self.debounce = debounce
+        self._routes: Dict[str, Route] = {}
+        self._last_tap: Dict[Tuple[int, str], float] = {}
+
+    def action(self, name: str, admin: bool = False, debounce: bool = False) -> Callable[[Handler], Handler]:
+        """
+        Register `handler(client, query, *args)` for callback data `name|...`.
+        `admin`: only the chat's voice-chat admins may tap it.
+        `debounce`: drop repeated taps (stream controls, downloads).
+        """
+
+        def decorator(handler: Handler) -> Handler:
+            if name in self._routes:
+                raise ValueError(f"callback action {name!r} registered twice")
+            params = inspect.signature(handler).parameters.values()
+            takes_args = len(params) > 2 or any(p.kind is p.VAR_POSITIONAL for p in params)
+            self._routes[name] = Route(handler, admin, debounce, takes_args)
+            return handler
+
+        return decorator
+
+    def _bounced(self, user_id: int, action: str) -> bool:
+        # per action: "pause" then "skip" right after are two intents, not a double tap
+        key = (user_id, action)
+        now = time.monotonic()
+        last = self._last_tap.get(key, 0.0)
+        self._last_tap[key] = now
+        if len(self._last_tap) > 10000:
+            cutoff = now - self.debounce
+            self._last_tap = {k: t for k, t in self._last_tap.items() if t > cutoff}
+        return now - last < self.debounce
+
+    async def dispatch(self, client, query) -> None:
+        action, args = decode(query.data)
+        route = self._routes.get(action)
+        if route is None:
+            log.debug("unrouted callback data %r", query.data)
+            return await _answer(query)
+
+        user_id = query.from_user.id if query.from_user else 0
+        if route.debounce and self._bounced(user_id, action):
+            return await _answer(query, "⏳ Slow down…")
+
+        if route.admin:
+            try:
+                allowed = await is_voice_admin(client, query.message.chat.id, user_id)
+            except Exception:
+                log.exception("permission check failed for %r", query.data)
+                return await _answer(query, "Could not verify permissions.", show_alert=True)
+            if not allowed:
+                return await _answer(query, "Only admins with manage voice chats permission can use this.", show_alert=True)
+
+        if route.takes_args:
+            await route.handler(client, query, *args)
+        else:
+            await route.handler(client, query)
+
+    def actions(self) -> List[str]:
+        return sorted(self._routes)
+
+
+async def _answer(query, text: str = None, show_alert: bool = False) -> None:
+    try:
+        await query.answer(text, show_alert=show_alert)
+    except Exception:
+        pass
+
+
+router = CallbackRouter()
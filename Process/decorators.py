@@ -40,7 +40,16 @@ def authorized_users_only(func: Callable) -> Callable:
             return await func(client, message)
 
         # Cache-based admin list
-        admin_ids = await get_administrators(message.chat)
+        try:
+            admin_ids = await get_administrators(message.chat)
+        except Exception as e:
+            # admin list unavailable and nothing cached: say so instead of going quiet
+            print("ERROR checking admins for", func.__name__, "in", message.chat.id, "-", e)
+            try:
+                await message.reply("⚠️ Couldn't check your admin rights right now. Try again in a moment.")
+            except Exception:
+                pass
+            return
         if uid in admin_ids:
             return await func(client, message)
 
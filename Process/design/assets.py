@@ -0,0 +1,74 @@
+"""
+Render assets shared by every card generator.
+
+Fonts, masks, blurred shadows and overlay layers only depend on their
+parameters, so each one is built once per process and reused by every
+render. Returned images are shared: treat them as read-only (paste them,
+use them as masks, composite them into a new image; never draw on them).
+
+`python -m bench.card_assets` runs a per-card microbenchmark.
+"""
+
+import os
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+FONT_DIR = os.path.join(ROOT, "ImageFont")
+FONT_PRIMARY = os.path.join(FONT_DIR, "font.ttf")
+
+Size = Tuple[int, int]
+
+
+def change_image_size(max_width: int, max_height: int, image: Image.Image) -> Image.Image:
+    """Resize image preserving aspect ratio to fit within max_width x max_height."""
+    w, h = image.size
+    ratio = min(max_width / w, max_height / h)
+    new_size = (int(w * ratio), int(h * ratio))
+    return image.resize(new_size, Image.LANCZOS)
+
+
+@lru_cache(maxsize=None)
+def font(path: str, size: int):
+    """FreeTypeFont for (path, size); falls back to font.ttf, then Pillow's default."""
+    for candidate in (path, FONT_PRIMARY):
+        try:
+            return ImageFont.truetype(candidate, size)
+        except Exception:
+            continue
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=64)
+def rounded_mask(size: Size, radius: int) -> Image.Image:
+    """'L' mask of a rounded rectangle covering `size`."""
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).rounded_rectangle([(0, 0), size], radius=radius, fill=255)
+    return mask
+
+
+@lru_cache(maxsize=32)
+def ellipse_shadow(side: int, alpha: int, blur: int) -> Image.Image:
+    """Soft round drop shadow, `side` x `side`, for pasting behind album art."""
+    shadow = Image.new("RGBA", (side, side), (0, 0, 0, 0))
+    ImageDraw.Draw(shadow).ellipse((0, 0, side, side), fill=(0, 0, 0, alpha))
+    return shadow.filter(ImageFilter.GaussianBlur(blur))
+
+
+@lru_cache(maxsize=8)
+def overlay(path: str, size: Size) -> Optional[Image.Image]:
+    """RGBA overlay layer scaled to exactly `size`, or None if the file is missing."""
+    try:
+        layer = Image.open(path).convert("RGBA")
+    except (OSError, ValueError):
+        return None
+    return layer.resize(size, Image.LANCZOS)
+
+
+def clear() -> None:
+    """Drop every cached asset (e.g. after replacing font files)."""
+    for fn in (font, rounded_mask, ellipse_shadow, overlay):
+        fn.cache_clear()
+
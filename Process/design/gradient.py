@@ -0,0 +1,99 @@
+"""
+Gradient backgrounds for card templates.
+
+A gradient is one affine transform of Pillow's built-in 256-step ramp
+(`Image.linear_gradient`) followed by a per-channel lookup table built
+from the color stops, so the cost no longer depends on the canvas height
+and nothing loops over pixels in Python. Results are memoized by
+(size, stops, angle); like the other shared assets they are read-only.
+"""
+
+import math
+from functools import lru_cache
+from typing import Sequence, Tuple, Union
+
+from PIL import Image
+
+Color = Tuple[int, ...]
+# a stop is either a bare color (stops spread evenly) or (offset 0..1, color)
+Stop = Union[Color, Tuple[float, Color]]
+
+
+def _normalize_stops(stops: Sequence[Stop]) -> Tuple[Tuple[float, Color], ...]:
+    if len(stops) < 2:
+        raise ValueError("a gradient needs at least two color stops")
+    out = []
+    last = len(stops) - 1
+    for i, stop in enumerate(stops):
+        if len(stop) == 2 and isinstance(stop[1], (tuple, list)):
+            offset, color = stop
+        else:
+            offset, color = i / last, stop
+        out.append((min(max(float(offset), 0.0), 1.0), tuple(int(c) for c in color)))
+    out.sort(key=lambda s: s[0])
+    return tuple(out)
+
+
+def _channel_luts(stops: Tuple[Tuple[float, Color], ...], bands: int):
+    """One 256-entry table per band: ramp value -> interpolated channel value."""
+    colors = [c if len(c) >= bands else c + (255,) * (bands - len(c)) for _, c in stops]
+    offsets = [o for o, _ in stops]
+    luts = [[0] * 256 for _ in range(bands)]
+    seg = 0
+    for i in range(256):
+        t = i / 255
+        while seg < len(offsets) - 2 and t > offsets[seg + 1]:
+            seg += 1
+        lo, hi = offsets[seg], offsets[seg + 1]
+        f = 0.0 if hi <= lo else min(max((t - lo) / (hi - lo), 0.0), 1.0)
+        a, b = colors[seg], colors[seg + 1]
+        for band in range(bands):
+            luts[band][i] = round(a[band] + (b[band] - a[band]) * f)
+    return luts
+
+
+def _ramp(size: Tuple[int, int], angle: float) -> Image.Image:
+    """'L' image whose value runs 0 -> 255 along `angle` across the whole canvas."""
+    w, h = size
+    # angle 0: top -> bottom, 90: left -> right, 45: top-left -> bottom-right
+    dx, dy = math.sin(math.radians(angle)), math.cos(math.radians(angle))
+    if abs(dx) < 1e-9:
+        dx = 0.0
+    if abs(dy) < 1e-9:
+        dy = 0.0
+    span = abs(dx) * w + abs(dy) * h
+    start = min(0.0, dx * w) + min(0.0, dy * h)
+    scale = 255.0 / span
+    # output (x, y) samples the source ramp at row (x*dx + y*dy - start) * scale
+    data = (0, 0, 128, dx * scale, dy * scale, -start * scale)
+    return Image.linear_gradient("L").transform(size, Image.AFFINE, data, Image.BILINEAR)
+
+
+@lru_cache(maxsize=32)
+def _linear(size: Tuple[int, int], stops: Tuple[Tuple[float, Color], ...], angle: float) -> Image.Image:
+    bands = 4 if any(len(c) == 4 for _, c in stops) else 3
+    ramp = _ramp(size, angle)
+    channels = [ramp.point(lut) for lut in _channel_luts(stops, bands)]
+    return Image.merge("RGBA" if bands == 4 else "RGB", channels)
+
+
+def linear(size: Tuple[int, int], stops: Sequence[Stop], angle: float = 0.0) -> Image.Image:
+    """
+    Linear gradient of `size` through `stops`.
+    `angle` in degrees: 0 top -> bottom, 90 left -> right, 45 diagonal.
+    RGBA if any stop has an alpha component, else RGB.
+    """
+    return _linear(tuple(size), _normalize_stops(stops), float(angle) % 360)
+
+
+def vertical(size: Tuple[int, int], top: Color, bottom: Color) -> Image.Image:
+    return linear(size, (top, bottom), 0.0)
+
+
+def diagonal(size: Tuple[int, int], stops: Sequence[Stop]) -> Image.Image:
+    """Top-left -> bottom-right."""
+    return linear(size, stops, math.degrees(math.atan2(size[0], size[1])))
+
+
+def clear() -> None:
+    _linear.cache_clear()
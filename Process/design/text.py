@@ -0,0 +1,135 @@
+"""
+Text measurement and line layout for card renderers.
+
+Widths come from `font.getlength` (heights from `getbbox`) and are cached
+per (font, text), so re-wrapping the same title or drawing the same label
+on every card costs a dict lookup. Fonts should come from
+`assets.font()` so the same size is the same object and hits the cache.
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+ELLIPSIS = "…"
+
+
+@lru_cache(maxsize=8192)
+def measure(font, text: str) -> float:
+    """Advance width of `text` in pixels."""
+    return font.getlength(text)
+
+
+@lru_cache(maxsize=1024)
+def size(font, text: str) -> Tuple[int, int]:
+    """(width, height) of `text`; a drop-in for the removed ImageDraw.textsize."""
+    left, top, right, bottom = font.getbbox(text)
+    return int(round(measure(font, text))), bottom
+
+
+@lru_cache(maxsize=64)
+def line_height(font) -> int:
+    ascent, descent = font.getmetrics()
+    return ascent + descent
+
+
+def _fit(text: str, font, max_width: float, suffix: str = "") -> str:
+    """Longest prefix of `text` that fits in `max_width` together with `suffix`."""
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if measure(font, text[:mid].rstrip() + suffix) <= max_width:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo].rstrip() + suffix
+
+
+def wrap(
+    text: str,
+    font,
+    max_width: float,
+    max_lines: Optional[int] = None,
+    ellipsis: str = ELLIPSIS,
+) -> List[str]:
+    """
+    Greedy word wrap. Words wider than a line are broken by characters.
+    With `max_lines`, overflow is cut and the last line ends in `ellipsis`.
+    """
+    lines: List[str] = []
+    current = ""
+    for word in (text or "").split():
+        candidate = f"{current} {word}" if current else word
+        if measure(font, candidate) <= max_width:
+            current = candidate
+            continue
+        if current:
+            lines.append(current)
+        # break an over-long word over as many lines as it needs
+        while measure(font, word) > max_width:
+            head = _fit(word, font, max_width) or word[:1]
+            lines.append(head)
+            word = word[len(head):]
+        current = word
+        if max_lines and len(lines) >= max_lines:
+            # `current` is still pending, so this already overflows
+            break
+    if current:
+        lines.append(current)
+    if max_lines and len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = _fit(lines[-1], font, max_width, ellipsis)
+    return lines
+
+
+class Run:
+    """One positioned line of text, ready for ImageDraw.text."""
+
+    __slots__ = ("text", "x", "y", "width")
+
+    def __init__(self, text: str, x: float, y: float, width: float):
+        self.text = text
+        self.x = x
+        self.y = y
+        self.width = width
+
+    @property
+    def xy(self) -> Tuple[float, float]:
+        return self.x, self.y
+
+    def __repr__(self) -> str:
+        return f"Run({self.text!r}, x={self.x}, y={self.y}, width={self.width})"
+
+
+def layout(
+    text: str,
+    font,
+    max_width: float,
+    origin: Tuple[float, float] = (0, 0),
+    line_step: Optional[float] = None,
+    max_lines: Optional[int] = None,
+    align: str = "left",
+) -> List[Run]:
+    """Wrap `text` and position each line from `origin`, `line_step` px apart."""
+    x0, y = origin
+    step = line_step if line_step is not None else line_height(font)
+    runs = []
+    for line in wrap(text, font, max_width, max_lines=max_lines):
+        width = measure(font, line)
+        if align == "center":
+            x = x0 + (max_width - width) / 2
+        elif align == "right":
+            x = x0 + max_width - width
+        else:
+            x = x0
+        runs.append(Run(line, x, y, width))
+        y += step
+    return runs
+
+
+def draw_runs(draw, runs: List[Run], font, shadow: Optional[Tuple[int, int, tuple]] = None, **kwargs) -> None:
+    """Draw laid-out runs; `shadow=(dx, dy, fill)` draws an offset copy first."""
+    for run in runs:
+        if shadow:
+            dx, dy, fill = shadow
+            draw.text((run.x + dx, run.y + dy), run.text, font=font, fill=fill)
+        draw.text(run.xy, run.text, font=font, **kwargs)
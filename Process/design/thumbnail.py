@@ -1,82 +1,77 @@
+"""
+Now-playing / in-queue cards for YouTube videos.
+
+Fetching (YouTube info + thumbnail bytes) is async; the Pillow work is a
+pure function run on a small process pool so blurs and resizes never
+block the event loop. Finished cards are kept in a size-bounded disk
+cache keyed by (video id, template, prefix): a hit skips both the
+network fetch and the rendering.
+"""
+
+import asyncio
+import logging
+import multiprocessing
 import os
 import re
-import textwrap
 import io
 import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Optional
 
-import aiohttp
-from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageFont, ImageOps
-from youtubesearchpython.__future__ import VideosSearch
-
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageOps
+from Process.Cache.media import DiskCache
+from Process.design import assets, text
+from Process.http import client
+from Process.Cache.ttl import SingleFlight
+from Process.search import search_one
 from RaiChu.config import BOT_NAME, YOUTUBE_IMG_URL
 
+log = logging.getLogger(__name__)
+
 # Constants
 CANVAS_W = 1280
 CANVAS_H = 720
 ALBUM_SIZE = 520
 FONT_PATH_PRIMARY = os.path.join("Process", "ImageFont", "font.ttf")
 FONT_PATH_SECOND = os.path.join("Process", "ImageFont", "font2.ttf")
+# bump when the card layout changes so stale cached cards are not served
+TEMPLATE = "card-v2"
+
+THUMB_WORKERS = int(os.environ.get("THUMB_WORKERS") or 2)
+THUMB_CACHE_DIR = os.environ.get("THUMB_CACHE_DIR") or os.path.join("cache", "cards")
+THUMB_CACHE_BYTES = int(os.environ.get("THUMB_CACHE_BYTES") or 256 * 1024 ** 2)
+
+# header drawn above the title, per card kind (file prefix)
+HEADERS = {
+    "pfinal_": "NOW PLAYING",
+    "qfinal_": "IN QUEUE",
+}
 
 
-def _change_image_size(max_width: int, max_height: int, image: Image.Image) -> Image.Image:
-    """Resize image preserving aspect ratio to fit within max_width x max_height."""
-    w, h = image.size
-    ratio = min(max_width / w, max_height / h)
-    new_size = (int(w * ratio), int(h * ratio))
-    return image.resize(new_size, Image.LANCZOS)
+_change_image_size = assets.change_image_size
 
 
-async def _download_image_bytes(url: str, session: aiohttp.ClientSession, timeout: int = 15) -> bytes:
-    async with session.get(url, timeout=timeout) as resp:
-        resp.raise_for_status()
-        return await resp.read()
+async def _download_image_bytes(url: str, timeout: int = 15) -> bytes:
+    return await client.get_bytes(url, timeout=timeout)
 
 
 def _load_font(path: str, size: int):
-    try:
-        return ImageFont.truetype(path, size)
-    except Exception:
-        try:
-            return ImageFont.truetype(FONT_PATH_PRIMARY, size)
-        except Exception:
-            return ImageFont.load_default()
-
-
-def _wrap_text(text: str, font: ImageFont.ImageFont, max_width: int):
-    lines = []
-    for paragraph in textwrap.wrap(text, width=40):
-        # further ensure lines fit
-        current = ""
-        for word in paragraph.split():
-            test = (current + " " + word).strip()
-            w, _ = ImageDraw.Draw(Image.new("RGB", (1, 1))).textsize(test, font=font)
-            if w <= max_width:
-                current = test
-            else:
-                if current:
-                    lines.append(current)
-                current = word
-        if current:
-            lines.append(current)
-    return lines
+    return assets.font(path, size)
 
 
 async def _fetch_youtube_info(videoid: str) -> Optional[dict]:
     try:
         url = f"https://www.youtube.com/watch?v={videoid}"
-        results = VideosSearch(url, limit=1)
-        res = await results.next()
-        if not res or "result" not in res or not res["result"]:
+        info = await search_one(url)
+        if not info:
             return None
-        info = res["result"][0]
         title = info.get("title", "Unsupported Title")
         title = re.sub(r"\s+", " ", re.sub(r"\W+", " ", title)).strip().title()
         duration = info.get("duration", "Unknown Mins")
-        thumbnails = info.get("thumbnails", [])
-        thumb_url = thumbnails[0]["url"].split("?")[0] if thumbnails else None
-        views = info.get("viewCount", {}).get("short", "Unknown Views")
-        channel = info.get("channel", {}).get("name", "Unknown Channel")
+        thumb_url = info.get("thumb_src") or None
+        views = info.get("views", "Unknown Views")
+        channel = info.get("channel", "Unknown Channel")
         return {
             "title": title,
             "duration": duration,
@@ -88,7 +83,7 @@ async def _fetch_youtube_info(videoid: str) -> Optional[dict]:
         return None
 
 
-async def _create_base(canvas_w: int = CANVAS_W, canvas_h: int = CANVAS_H, thumb_img: Optional[Image.Image] = None):
+def _create_base(canvas_w: int = CANVAS_W, canvas_h: int = CANVAS_H, thumb_img: Optional[Image.Image] = None):
     # Create gradient-like background from the thumbnail (blur + darken)
     if thumb_img:
         bg = thumb_img.copy().convert("RGBA")
@@ -116,146 +111,181 @@ def _paste_album(canvas: Image.Image, album: Image.Image, x: int = 50, y: int =
     album_crop.thumbnail((ALBUM_SIZE, ALBUM_SIZE), Image.LANCZOS)
 
     # shadow
-    shadow = Image.new("RGBA", (ALBUM_SIZE + 40, ALBUM_SIZE + 40), (0, 0, 0, 0))
-    sh_draw = ImageDraw.Draw(shadow)
-    sh_draw.ellipse((0, 0, ALBUM_SIZE + 40, ALBUM_SIZE + 40), fill=(0, 0, 0, 160))
-    shadow = shadow.filter(ImageFilter.GaussianBlur(18))
+    shadow = assets.ellipse_shadow(ALBUM_SIZE + 40, 160, 18)
     canvas.paste(shadow, (x - 20, y - 20), shadow)
 
-    # rounded mask
-    mask = Image.new("L", (ALBUM_SIZE, ALBUM_SIZE), 0)
-    mdraw = ImageDraw.Draw(mask)
-    mdraw.rounded_rectangle([(0, 0), (ALBUM_SIZE, ALBUM_SIZE)], radius=30, fill=255)
     # border
     bordered = ImageOps.expand(album_crop, border=12, fill="white")
-    # paste centered on mask area
-    canvas.paste(bordered, (x, y), mask)
+    # rounded mask; must match the bordered size or paste() raises
+    canvas.paste(bordered, (x, y), assets.rounded_mask(bordered.size, 30))
 
 
-async def _make_thumbnail_from_info(info: dict, prefix: str, videoid: str) -> Optional[str]:
+def _render_card(info: dict, thumb_bytes: Optional[bytes], out_name: str, header: str = "") -> str:
+    """Pure Pillow rendering; runs in a worker process. Writes `out_name` and returns it."""
     title = info.get("title", "Unsupported Title")
     duration = info.get("duration", "Unknown Mins")
-    thumb_url = info.get("thumbnail")
     views = info.get("views", "Unknown Views")
     channel = info.get("channel", "Unknown Channel")
 
-    out_name = f"{prefix}{videoid}.png"
+    thumb_img = None
+    if thumb_bytes:
+        try:
+            thumb_img = Image.open(io.BytesIO(thumb_bytes)).convert("RGBA")
+        except Exception:
+            thumb_img = None
+
+    canvas = _create_base(thumb_img=thumb_img)
 
+    # album area
+    album_x = 50
+    album_y = (CANVAS_H - ALBUM_SIZE) // 2
+    if thumb_img:
+        _paste_album(canvas, thumb_img, x=album_x, y=album_y)
+    else:
+        # placeholder square
+        placeholder = Image.new("RGBA", (ALBUM_SIZE, ALBUM_SIZE), (30, 30, 30))
+        _paste_album(canvas, placeholder, x=album_x, y=album_y)
+
+    draw = ImageDraw.Draw(canvas)
+    # fonts with fallback
+    title_font = _load_font(FONT_PATH_SECOND if os.path.exists(FONT_PATH_SECOND) else FONT_PATH_PRIMARY, 72)
+    main_font = _load_font(FONT_PATH_SECOND if os.path.exists(FONT_PATH_SECOND) else FONT_PATH_PRIMARY, 40)
+    small_font = _load_font(FONT_PATH_PRIMARY, 30)
+    footer_font = _load_font(FONT_PATH_PRIMARY, 22)
+
+    right_x = album_x + ALBUM_SIZE + 60
+    max_w = CANVAS_W - right_x - 80
+
+    # BOT name (top-left)
     try:
-        # download thumbnail bytes (if available)
-        thumb_img = None
-        if thumb_url:
-            async with aiohttp.ClientSession() as session:
-                try:
-                    img_bytes = await _download_image_bytes(thumb_url, session)
-                    thumb_img = Image.open(io.BytesIO(img_bytes)).convert("RGBA")
-                except Exception:
-                    thumb_img = None
-
-        canvas = await _create_base(thumb_img=thumb_img)
-
-        # album area
-        album_x = 50
-        album_y = (CANVAS_H - ALBUM_SIZE) // 2
-        if thumb_img:
-            _paste_album(canvas, thumb_img, x=album_x, y=album_y)
-        else:
-            # placeholder square
-            placeholder = Image.new("RGBA", (ALBUM_SIZE, ALBUM_SIZE), (30, 30, 30))
-            _paste_album(canvas, placeholder, x=album_x, y=album_y)
-
-        draw = ImageDraw.Draw(canvas)
-        # fonts with fallback
-        title_font = _load_font(FONT_PATH_SECOND if os.path.exists(FONT_PATH_SECOND) else FONT_PATH_PRIMARY, 72)
-        main_font = _load_font(FONT_PATH_SECOND if os.path.exists(FONT_PATH_SECOND) else FONT_PATH_PRIMARY, 40)
-        small_font = _load_font(FONT_PATH_PRIMARY, 30)
-        footer_font = _load_font(FONT_PATH_PRIMARY, 22)
-
-        right_x = album_x + ALBUM_SIZE + 60
-        max_w = CANVAS_W - right_x - 80
-
-        # BOT name (top-left)
+        bot_font = _load_font(FONT_PATH_PRIMARY, 28)
+        draw.text((5, 5), f"{BOT_NAME}", fill="white", font=bot_font)
+    except Exception:
+        pass
+
+    # Title block (at most 3 lines, the last one ellipsized)
+    runs = text.layout(title, title_font, max_w, origin=(right_x, 0), line_step=78, max_lines=3)
+    y_text = (CANVAS_H // 2) - (len(runs) * 42)
+    for run in runs:
+        run.y += y_text
+    if header:
+        draw.text((right_x, y_text - 50), header, font=small_font, fill=(255, 214, 0), stroke_width=1, stroke_fill=(0, 0, 0))
+    text.draw_runs(
+        draw, runs, title_font,
+        shadow=(3, 3, (0, 0, 0, 200)),
+        fill=(255, 255, 255, 255), stroke_width=2, stroke_fill=(0, 0, 0),
+    )
+    y_text += 78 * len(runs)
+
+    # small meta lines
+    y_meta = y_text + 6
+    if channel:
+        draw.text((right_x, y_meta), f"Channel: {channel}", font=main_font, fill=(220, 220, 220))
+        y_meta += 44
+    if views:
+        draw.text((right_x, y_meta), f"Views: {views}", font=main_font, fill=(220, 220, 220))
+        y_meta += 36
+    if duration:
+        draw.text((right_x, y_meta), f"Duration: {duration}", font=main_font, fill=(220, 220, 220))
+        y_meta += 36
+
+    # footer
+    footer_text = f"Powered by {os.getenv('BOT_NAME', BOT_NAME)}"
+    draw.text((right_x, CANVAS_H - 60), footer_text, font=footer_font, fill=(180, 180, 180))
+
+    # finalize (alpha is dropped by the RGB conversion, so no corner mask)
+    out_rgb = canvas.convert("RGB")
+    out_rgb.save(out_name, quality=88, optimize=True)
+    return out_name
+
+
+# ---------------- render pool + card cache ----------------
+
+
+class RenderPool:
+    """Worker processes for `_render_card`; rebuilt if a worker dies."""
+
+    def __init__(self, workers: int = THUMB_WORKERS):
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: never fork the running bot (event loop, client threads)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def render(self, info: dict, thumb_bytes: Optional[bytes], out_name: str, header: str = "") -> str:
+        loop = asyncio.get_running_loop()
         try:
-            bot_font = _load_font(FONT_PATH_PRIMARY, 28)
-            draw.text((5, 5), f"{BOT_NAME}", fill="white", font=bot_font)
-        except Exception:
-            pass
-
-        # Title block
-        title_lines = _wrap_text(title, title_font, max_w)
-        y_text = (CANVAS_H // 2) - (len(title_lines) * 42)
-        for line in title_lines[:3]:  # limit lines to 3
-            # shadow
-            draw.text((right_x + 3, y_text + 3), line, font=title_font, fill=(0, 0, 0, 200))
-            # main text with stroke
-            draw.text((right_x, y_text), line, font=title_font, fill=(255, 255, 255, 255), stroke_width=2, stroke_fill=(0, 0, 0))
-            y_text += 78
-
-        # small meta lines
-        y_meta = y_text + 6
-        if channel:
-            draw.text((right_x, y_meta), f"Channel: {channel}", font=main_font, fill=(220, 220, 220))
-            y_meta += 44
-        if views:
-            draw.text((right_x, y_meta), f"Views: {views}", font=main_font, fill=(220, 220, 220))
-            y_meta += 36
-        if duration:
-            draw.text((right_x, y_meta), f"Duration: {duration}", font=main_font, fill=(220, 220, 220))
-            y_meta += 36
-
-        # footer
-        footer_text = f"Powered by {os.getenv('BOT_NAME', BOT_NAME)}"
-        draw.text((right_x, CANVAS_H - 60), footer_text, font=footer_font, fill=(180, 180, 180))
-
-        # finalize: rounded corners mask
-        final = Image.new("RGBA", canvas.size)
-        final.paste(canvas, (0, 0))
-        mask = Image.new("L", final.size, 255)
-        mdraw = ImageDraw.Draw(mask)
-        mdraw.rounded_rectangle([(0, 0), final.size], radius=28, fill=255)
-        final.putalpha(mask)
-
-        out_rgb = final.convert("RGB")
-        out_rgb.save(out_name, quality=88, optimize=True)
-        return out_name
+            return await loop.run_in_executor(self._pool(), _render_card, info, thumb_bytes, out_name, header)
+        except BrokenProcessPool:
+            log.warning("thumbnail render pool broke, restarting it")
+            self.stop()
+            return await loop.run_in_executor(self._pool(), _render_card, info, thumb_bytes, out_name, header)
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+render_pool = RenderPool()
+card_cache = DiskCache(THUMB_CACHE_DIR, THUMB_CACHE_BYTES)
+_renders = SingleFlight()
+
+
+async def _fetch_thumb_bytes(url: Optional[str]) -> Optional[bytes]:
+    if not url:
+        return None
+    try:
+        return await _download_image_bytes(url)
     except Exception:
-        # debug print
-        traceback.print_exc()
         return None
 
 
-async def play_thumb(videoid: str) -> str:
-    """
-    Generate a 'NOW PLAYING' thumbnail for a YouTube video id.
-    Returns path of generated file or fallback YOUTUBE_IMG_URL.
-    """
+async def _fetch_and_render(digest: str, videoid: str, header: str) -> Optional[str]:
+    info = await _fetch_youtube_info(videoid)
+    if not info:
+        return None
+    thumb_bytes = await _fetch_thumb_bytes(info.get("thumbnail"))
+    tmp = card_cache.tmp_path(".png")
     try:
-        info = await _fetch_youtube_info(videoid)
-        if not info:
-            return YOUTUBE_IMG_URL
-
-        out = await _make_thumbnail_from_info(info, prefix="pfinal_", videoid=videoid)
+        await render_pool.render(info, thumb_bytes, tmp, header)
+    except BaseException:
+        card_cache.discard(tmp)
+        raise
+    return card_cache.commit(digest, tmp)
+
+
+async def _card(videoid: str, prefix: str) -> str:
+    """Cached card path for (videoid, TEMPLATE, prefix), or YOUTUBE_IMG_URL."""
+    digest = DiskCache.key(videoid, TEMPLATE, prefix)
+    path = card_cache.get(digest)
+    if path:
+        return path
+    try:
+        out = await _renders.do(digest, _fetch_and_render, digest, videoid, HEADERS.get(prefix, ""))
         return out or YOUTUBE_IMG_URL
     except Exception:
         traceback.print_exc()
         return YOUTUBE_IMG_URL
 
 
+async def play_thumb(videoid: str) -> str:
+    """
+    Generate a 'NOW PLAYING' thumbnail for a YouTube video id.
+    Returns path of generated file or fallback YOUTUBE_IMG_URL.
+    """
+    return await _card(videoid, "pfinal_")
+
+
 async def queue_thumb(videoid: str) -> str:
     """
     Generate an 'IN QUEUE' thumbnail for a YouTube video id.
     Returns path of generated file or fallback YOUTUBE_IMG_URL.
     """
-    try:
-        info = await _fetch_youtube_info(videoid)
-        if not info:
-            return YOUTUBE_IMG_URL
-
-        # change title of block to 'IN QUEUE' by temporarily adding it to title
-        info_copy = dict(info)
-        info_copy["title"] = info_copy.get("title", "")
-        out = await _make_thumbnail_from_info(info_copy, prefix="qfinal_", videoid=videoid)
-        return out or YOUTUBE_IMG_URL
-    except Exception:
-        traceback.print_exc()
-        return YOUTUBE_IMG_URL
+    return await _card(videoid, "qfinal_")
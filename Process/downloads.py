@@ -0,0 +1,350 @@
+"""
+Download manager for /song, /vsong and the download buttons.
+
+yt-dlp downloads (and the ffmpeg merges they trigger) are blocking, so
+they run on a bounded worker pool instead of the event loop. Jobs are
+capped globally (DOWNLOAD_WORKERS) and per user (DOWNLOADS_PER_USER),
+report progress through an async callback, and can be cancelled.
+
+A job can have several callers waiting on it (the same file asked for
+from two chats). Each caller is a Waiter with its own progress callback;
+/cancel drops only that user's waiters, and the job itself is cancelled
+once nobody is waiting for it any more.
+
+Cancellation is checked by yt-dlp's progress and post-processor hooks.
+A merge or conversion step can't be interrupted half way, so callers
+are released straight away and the job's files are cleaned up once the
+worker thread lets go of them.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from Process.Cache.media import media_cache
+from Process.errors import DownloadCancelled, DownloadLimitError
+
+log = logging.getLogger(__name__)
+
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS") or 3)
+DOWNLOADS_PER_USER = int(os.environ.get("DOWNLOADS_PER_USER") or 1)
+# minimum seconds between two progress callbacks of one job (message edits)
+PROGRESS_INTERVAL = 4.0
+
+_ids = itertools.count(1)
+
+
+class DownloadJob:
+    """State of one download, shared between the event loop and its worker thread."""
+
+    __slots__ = (
+        "id", "url", "key", "status", "downloaded", "total", "speed", "eta",
+        "started", "waiters", "task", "_cancel", "_stopped", "_last_report",
+    )
+
+    def __init__(self, url: str, key: Optional[Hashable] = None):
+        self.id = next(_ids)
+        self.url = url
+        self.key = key
+        self.status = "queued"
+        self.downloaded = 0
+        self.total = 0
+        self.speed = 0.0
+        self.eta = 0
+        self.started = time.monotonic()
+        self.waiters: List["Waiter"] = []
+        self.task: Optional[asyncio.Task] = None
+        self._cancel = threading.Event()
+        # resolved on cancel, so the loop side doesn't wait for the worker
+        self._stopped = asyncio.get_running_loop().create_future()
+        self._last_report = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def percent(self) -> float:
+        return (self.downloaded * 100.0 / self.total) if self.total else 0.0
+
+    def users(self) -> List[Optional[int]]:
+        return [w.user_id for w in self.waiters]
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        if not self._stopped.done():
+            self._stopped.set_result(None)
+
+    def check(self, _: dict = None) -> None:
+        """yt-dlp hook (worker thread): abort the job once it is cancelled."""
+        if self._cancel.is_set():
+            raise DownloadCancelled(self.id)
+
+
+class Waiter:
+    """One caller waiting for a (possibly shared) job."""
+
+    __slots__ = ("user_id", "on_progress", "dropped")
+
+    def __init__(self, user_id: Optional[int], on_progress: Optional["ProgressCallback"]):
+        self.user_id = user_id
+        self.on_progress = on_progress
+        self.dropped = asyncio.get_running_loop().create_future()
+
+    def drop(self) -> None:
+        if not self.dropped.done():
+            self.dropped.set_result(None)
+
+
+ProgressCallback = Callable[[DownloadJob], Awaitable[None]]
+
+
+class DownloadManager:
+    def __init__(self, workers: int = DOWNLOAD_WORKERS, per_user: int = DOWNLOADS_PER_USER):
+        self.workers = max(1, workers)
+        self.per_user = max(1, per_user)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ytdl-dl")
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.jobs: Dict[int, DownloadJob] = {}
+        self._shared: Dict[Hashable, DownloadJob] = {}
+
+    def _user_jobs(self, user_id: Optional[int]) -> List[DownloadJob]:
+        return [j for j in self.jobs.values() if user_id is not None and user_id in j.users()]
+
+    def shared(self, key: Hashable) -> Optional[DownloadJob]:
+        """The running job started with `key`, if any."""
+        return self._shared.get(key)
+
+    def start(
+        self,
+        url: str,
+        ydl_opts: dict,
+        key: Optional[Hashable] = None,
+        finish: Optional[Callable[[dict], Any]] = None,
+        cleanup: Optional[Callable[[], None]] = None,
+    ) -> DownloadJob:
+        """
+        Start downloading `url` in the background and return the job;
+        callers then `wait` on it. `finish(info)` turns the info dict into
+        the job's result, `cleanup()` runs when the job fails or is
+        cancelled (again once the worker has let go of the files).
+        """
+        job = DownloadJob(url, key)
+        self.jobs[job.id] = job
+        if key is not None:
+            self._shared[key] = job
+        job.task = asyncio.ensure_future(self._run(job, ydl_opts, finish, cleanup))
+        # nobody may be left to read the outcome of a cancelled job
+        job.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return job
+
+    async def _run(self, job: DownloadJob, ydl_opts: dict, finish, cleanup) -> Any:
+        loop = asyncio.get_running_loop()
+
+        def hook(d: dict) -> None:
+            # runs in the worker thread
+            job.check()
+            job.status = d.get("status") or job.status
+            job.downloaded = d.get("downloaded_bytes") or job.downloaded
+            job.total = d.get("total_bytes") or d.get("total_bytes_estimate") or job.total
+            job.speed = d.get("speed") or 0.0
+            job.eta = d.get("eta") or 0
+            now = time.monotonic()
+            if now - job._last_report >= PROGRESS_INTERVAL:
+                job._last_report = now
+                for waiter in list(job.waiters):
+                    if waiter.on_progress:
+                        loop.call_soon_threadsafe(_report, waiter.on_progress, job)
+
+        opts = dict(ydl_opts)
+        opts["progress_hooks"] = list(opts.get("progress_hooks") or []) + [hook]
+        opts["postprocessor_hooks"] = list(opts.get("postprocessor_hooks") or []) + [job.check]
+        try:
+            if self._sem is None:
+                self._sem = asyncio.Semaphore(self.workers)
+            async with self._sem:
+                job.check()
+                job.status = "downloading"
+                future = loop.run_in_executor(self._executor, _run_ydl, job.url, opts, True)
+                await asyncio.wait((future, job._stopped), return_when=asyncio.FIRST_COMPLETED)
+                if not future.done():
+                    # cancelled in a step the hooks don't reach (merge, conversion)
+                    future.add_done_callback(lambda f: _abandoned(f, cleanup))
+                    raise DownloadCancelled(job.id)
+                info = future.result()
+            job.check()
+            job.status = "finished"
+            return finish(info) if finish else info
+        except BaseException as e:
+            if cleanup:
+                cleanup()
+            if job.cancelled and not isinstance(e, DownloadCancelled):
+                raise DownloadCancelled(job.id) from e
+            raise
+        finally:
+            self.jobs.pop(job.id, None)
+            if job.key is not None and self._shared.get(job.key) is job:
+                del self._shared[job.key]
+
+    async def wait(
+        self,
+        job: DownloadJob,
+        user_id: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Any:
+        """
+        Wait for `job` as one of its callers and return its result.
+        Raises DownloadLimitError if the user is at their cap, and
+        DownloadCancelled if this caller or the whole job was cancelled.
+        Leaving (cancelled, or the caller's task cancelled) cancels the
+        job only if no other caller is waiting for it.
+        """
+        busy = [j for j in self._user_jobs(user_id) if j is not job]
+        if len(busy) >= self.per_user:
+            if not job.waiters:
+                job.cancel()
+            raise DownloadLimitError(user_id, self.per_user)
+        waiter = Waiter(user_id, on_progress)
+        job.waiters.append(waiter)
+        try:
+            await asyncio.wait((job.task, waiter.dropped, job._stopped), return_when=asyncio.FIRST_COMPLETED)
+            if not job.task.done():
+                raise DownloadCancelled(job.id)
+            return job.task.result()
+        finally:
+            job.waiters.remove(waiter)
+            if not job.waiters and not job.task.done():
+                job.cancel()
+
+    async def download(
+        self,
+        url: str,
+        ydl_opts: dict,
+        user_id: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> dict:
+        """
+        Download `url` with `ydl_opts` on the worker pool and return the
+        yt-dlp info dict. Raises DownloadLimitError if the user is at
+        their cap and DownloadCancelled if the job is cancelled.
+        """
+        return await self.wait(self.start(url, ydl_opts), user_id=user_id, on_progress=on_progress)
+
+    async def extract_info(self, url: str, ydl_opts: Optional[dict] = None) -> dict:
+        """Metadata only (formats listing), on the same pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _run_ydl, url, dict(ydl_opts or {"quiet": True}), False)
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job for every caller."""
+        job = self.jobs.get(job_id)
+        if job:
+            job.cancel()
+        return job is not None
+
+    def cancel_user(self, user_id: int) -> int:
+        """
+        Stop waiting on every download of `user_id`; returns how many.
+        Shared jobs keep running for their other callers.
+        """
+        jobs = self._user_jobs(user_id)
+        for job in jobs:
+            for waiter in job.waiters:
+                if waiter.user_id == user_id:
+                    waiter.drop()
+        return len(jobs)
+
+    def stop(self) -> None:
+        for job in list(self.jobs.values()):
+            job.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_ydl(url: str, opts: dict, download: bool) -> dict:
+    import yt_dlp
+
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        return ydl.extract_info(url, download=download)
+
+
+def _report(callback: ProgressCallback, job: DownloadJob) -> None:
+    async def _safe() -> None:
+        try:
+            await callback(job)
+        except Exception as e:
+            # progress edits are best effort (message deleted, not modified, ...)
+            log.debug("progress callback failed: %s", e)
+
+    asyncio.ensure_future(_safe())
+
+
+def _abandoned(future, cleanup: Optional[Callable[[], None]]) -> None:
+    """The worker of a cancelled job returned: drop whatever it left behind."""
+    if not future.cancelled():
+        future.exception()
+    if cleanup:
+        cleanup()
+
+
+downloads = DownloadManager()
+
+
+# what yt-dlp leaves next to an unfinished download
+_PARTIAL = (".part", ".ytdl", ".temp")
+
+
+def downloaded_path(info: dict, outtmpl: str) -> str:
+    """
+    Where yt-dlp actually left the file (after merges / postprocessors).
+    Without a usable filepath in `info`, the file next to `outtmpl` that
+    shares its stem (e.g. <stem>.%(ext)s -> <stem>.m4a) is it.
+    """
+    info = info or {}
+    candidates = [d.get("filepath") for d in info.get("requested_downloads") or []]
+    candidates += [info.get("filepath"), info.get("_filename")]
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    directory = os.path.dirname(outtmpl) or "."
+    stem = os.path.basename(outtmpl).split(".", 1)[0]
+    found = [
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith(stem + ".") and not name.endswith(_PARTIAL)
+    ]
+    if not found:
+        raise FileNotFoundError(f"yt-dlp left no file for {outtmpl}")
+    # a merge / conversion leaves its output last
+    return max(found, key=os.path.getmtime)
+
+
+async def cached_download(
+    digest: str,
+    url: str,
+    ydl_opts: dict,
+    ext: str,
+    user_id: Optional[int] = None,
+    on_progress=None,
+) -> str:
+    """
+    Return the cached file for `digest`, downloading it into the media
+    cache first if needed. Concurrent requests share one download.
+    """
+    path = media_cache.get(digest)
+    if path:
+        return path
+    job = downloads.shared(digest)
+    if job is None:
+        tmp = media_cache.tmp_path(ext)
+        job = downloads.start(
+            url,
+            dict(ydl_opts, outtmpl=tmp),
+            key=digest,
+            finish=lambda info: media_cache.commit(digest, downloaded_path(info, tmp)),
+            cleanup=lambda: media_cache.discard(tmp),
+        )
+    return await downloads.wait(job, user_id=user_id, on_progress=on_progress)
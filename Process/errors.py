@@ -59,4 +59,79 @@ class FFmpegReturnCodeError(BotError):
         return base
 
 
-__all__ = ["BotError", "DurationLimitError", "FFmpegReturnCodeError"]
+class DownloadCancelled(BotError):
+    """
+    Raised inside a download job when its owner cancelled it.
+
+    Attributes:
+        job_id: int - id of the cancelled job
+    """
+    def __init__(self, job_id: int, message: Optional[str] = None):
+        super().__init__(message or f"Download #{job_id} was cancelled")
+        self.job_id = job_id
+
+
+class FFmpegCancelled(BotError):
+    """
+    Raised when a queued or running FFmpeg job is cancelled (e.g. its track was skipped).
+
+    Attributes:
+        job_id: int - id of the cancelled job
+        chat_id: Optional[int] - chat the job belonged to
+    """
+    def __init__(self, job_id: int, chat_id: Optional[int] = None, message: Optional[str] = None):
+        super().__init__(message or f"FFmpeg job #{job_id} was cancelled")
+        self.job_id = job_id
+        self.chat_id = chat_id
+
+
+class DownloadLimitError(BotError):
+    """
+    Raised when a user already has the maximum number of downloads running.
+
+    Attributes:
+        user_id: int - the user that hit the limit
+        limit: int - configured per-user limit
+    """
+    def __init__(self, user_id: int, limit: int, message: Optional[str] = None):
+        super().__init__(message or f"User {user_id} already has {limit} download(s) running")
+        self.user_id = user_id
+        self.limit = limit
+
+
+class HttpError(BotError):
+    """
+    Raised when an outbound HTTP request fails after all retries.
+
+    Attributes:
+        url: str - the requested url
+        status: Optional[int] - last HTTP status (None for network errors)
+    """
+    def __init__(self, url: str, status: Optional[int] = None, message: Optional[str] = None):
+        super().__init__(message or (f"HTTP {status} from {url}" if status is not None else f"Request to {url} failed"))
+        self.url = url
+        self.status = status
+
+
+class BroadcastRunning(BotError):
+    """
+    Raised when a broadcast is started while the same one is still running.
+
+    Attributes:
+        key: str - the broadcast's key (source chat and message)
+    """
+    def __init__(self, key: str, message: Optional[str] = None):
+        super().__init__(message or f"Broadcast {key} is already running")
+        self.key = key
+
+
+__all__ = [
+    "BotError",
+    "DurationLimitError",
+    "FFmpegReturnCodeError",
+    "FFmpegCancelled",
+    "DownloadCancelled",
+    "DownloadLimitError",
+    "HttpError",
+    "BroadcastRunning",
+]
@@ -0,0 +1,299 @@
+"""
+Bounded scheduler for ffmpeg (and other subprocess) jobs.
+
+Every conversion used to start its own ffmpeg the moment it was asked
+for, so twenty chats starting at once meant twenty decoders fighting
+for the CPU next to the event loop and the live calls. Jobs now wait
+for one of FFMPEG_WORKERS slots (default: one per core). Waiting jobs
+are started by priority, so a chat's now-playing track goes ahead of
+prefetch and housekeeping work.
+
+Jobs carry the chat they belong to; `cancel_chat` drops a chat's queued
+jobs and kills its running ones (skip / stop). Each finished job
+records queue wait, wall time and, with psutil installed, CPU time.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from Process.errors import FFmpegCancelled
+
+log = logging.getLogger(__name__)
+
+FFMPEG_WORKERS = int(os.environ.get("FFMPEG_WORKERS") or os.cpu_count() or 2)
+# seconds between CPU time samples of a running job (psutil only)
+CPU_SAMPLE_INTERVAL = 0.5
+
+# lower runs first
+NOW_PLAYING = 0
+PREFETCH = 10
+BACKGROUND = 20
+
+Command = Union[str, Sequence[str]]
+
+_ids = itertools.count(1)
+
+
+class FFmpegJob:
+    """One subprocess: where it is in the queue, and what it cost."""
+
+    __slots__ = (
+        "id", "cmd", "priority", "chat_id", "status", "process",
+        "returncode", "stdout", "stderr", "queued", "started", "finished",
+        "cpu", "_waiter",
+    )
+
+    def __init__(self, cmd: Command, priority: int, chat_id: Optional[int]):
+        self.id = next(_ids)
+        self.cmd = cmd
+        self.priority = priority
+        self.chat_id = chat_id
+        self.status = "queued"
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.returncode: Optional[int] = None
+        self.stdout = b""
+        self.stderr = b""
+        self.queued = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cpu: Optional[float] = None
+        self._waiter: Optional[asyncio.Future] = None
+
+    @property
+    def wait(self) -> float:
+        return (self.started or time.monotonic()) - self.queued
+
+    @property
+    def wall(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def cancelled(self) -> bool:
+        return self.status == "cancelled"
+
+    def cancel(self) -> None:
+        if self.status in ("done", "cancelled"):
+            return
+        self.status = "cancelled"
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.cancel()
+        if self.process is not None and self.process.returncode is None:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+
+
+class FFmpegScheduler:
+    def __init__(self, workers: int = FFMPEG_WORKERS):
+        self.workers = max(1, workers)
+        self.active = 0
+        # (priority, seq, job) of jobs waiting for a slot
+        self._waiting: List[Tuple[int, int, FFmpegJob]] = []
+        self._seq = itertools.count()
+        self.jobs: Dict[int, FFmpegJob] = {}
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self._recent = deque(maxlen=200)  # (wait, wall, cpu) of finished jobs
+
+    # ---------- slots ----------
+
+    async def _acquire(self, job: FFmpegJob) -> None:
+        if self.active < self.workers and not self._waiting:
+            self.active += 1
+            return
+        job._waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (job.priority, next(self._seq), job))
+        try:
+            # _release hands its slot over by resolving the waiter
+            await job._waiter
+        except asyncio.CancelledError:
+            if job._waiter.done() and not job._waiter.cancelled():
+                # got the slot in the same tick it was cancelled
+                self._release()
+            if job.cancelled:
+                raise FFmpegCancelled(job.id, job.chat_id) from None
+            raise
+        finally:
+            job._waiter = None
+
+    def _release(self) -> None:
+        while self._waiting:
+            _, _, job = heapq.heappop(self._waiting)
+            if job._waiter is not None and not job._waiter.done():
+                job._waiter.set_result(None)
+                return
+        self.active -= 1
+
+    # ---------- jobs ----------
+
+    async def _start(self, job: FFmpegJob, **popen_kwargs) -> asyncio.subprocess.Process:
+        self.jobs[job.id] = job
+        try:
+            await self._acquire(job)
+        except BaseException:
+            self._finish(job)
+            raise
+        job.status = "running"
+        job.started = time.monotonic()
+        try:
+            if isinstance(job.cmd, str):
+                job.process = await asyncio.create_subprocess_shell(job.cmd, **popen_kwargs)
+            else:
+                job.process = await asyncio.create_subprocess_exec(*job.cmd, **popen_kwargs)
+        except BaseException:
+            self._release()
+            self._finish(job)
+            raise
+        if job.cancelled:
+            # cancelled while the process was being created
+            job.process.kill()
+        return job.process
+
+    def _finish(self, job: FFmpegJob) -> None:
+        if job.finished is not None:
+            return
+        job.finished = time.monotonic()
+        self.jobs.pop(job.id, None)
+        if job.cancelled:
+            self.cancelled += 1
+            return
+        job.status = "done"
+        if job.returncode:
+            self.failed += 1
+        else:
+            self.completed += 1
+        if job.started is not None:
+            self._recent.append((job.wait, job.wall, job.cpu))
+            log.debug(
+                "ffmpeg job #%d chat=%s rc=%s wait=%.2fs wall=%.2fs cpu=%s",
+                job.id, job.chat_id, job.returncode, job.wait, job.wall,
+                f"{job.cpu:.2f}s" if job.cpu is not None else "n/a",
+            )
+
+    async def run(
+        self,
+        cmd: Command,
+        priority: int = PREFETCH,
+        chat_id: Optional[int] = None,
+    ) -> FFmpegJob:
+        """
+        Run `cmd` (argv list, or a shell string) to completion in a slot and
+        return the finished job (returncode / stdout / stderr / metrics).
+        Raises FFmpegCancelled if the job was cancelled while queued or running.
+        """
+        job = FFmpegJob(cmd, priority, chat_id)
+        process = await self._start(
+            job,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        sampler = asyncio.ensure_future(_sample_cpu(job)) if _psutil else None
+        try:
+            job.stdout, job.stderr = await process.communicate()
+            job.returncode = process.returncode
+        except asyncio.CancelledError:
+            job.cancel()
+            raise
+        finally:
+            if sampler is not None:
+                sampler.cancel()
+            self._release()
+            self._finish(job)
+        if job.cancelled:
+            raise FFmpegCancelled(job.id, chat_id)
+        return job
+
+    async def spawn(
+        self,
+        cmd: Command,
+        priority: int = NOW_PLAYING,
+        chat_id: Optional[int] = None,
+        **popen_kwargs,
+    ) -> asyncio.subprocess.Process:
+        """
+        Start a long-lived process (a stream paced by its reader) and return it.
+        It waits for a slot like any job but hands it back once started:
+        only the startup burst is CPU heavy, and holding the slot for the
+        whole track would cap concurrent calls at FFMPEG_WORKERS. The job
+        stays registered, so `cancel_chat` still kills it.
+        """
+        job = FFmpegJob(cmd, priority, chat_id)
+        process = await self._start(job, **popen_kwargs)
+        self._release()
+        asyncio.ensure_future(self._reap(job))
+        return process
+
+    async def _reap(self, job: FFmpegJob) -> None:
+        sampler = asyncio.ensure_future(_sample_cpu(job)) if _psutil else None
+        try:
+            job.returncode = await job.process.wait()
+        finally:
+            if sampler is not None:
+                sampler.cancel()
+            self._finish(job)
+
+    def cancel_chat(self, chat_id: int) -> int:
+        """Cancel every queued or running job of `chat_id`; returns how many."""
+        jobs = [j for j in self.jobs.values() if j.chat_id == chat_id]
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    def stats(self) -> dict:
+        recent = list(self._recent)
+        cpu = [c for _, _, c in recent if c is not None]
+        return {
+            "workers": self.workers,
+            "running": self.active,
+            "queued": len([w for w in self._waiting if w[2]._waiter is not None]),
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "avg_wait": sum(w for w, _, _ in recent) / len(recent) if recent else 0.0,
+            "avg_wall": sum(w for _, w, _ in recent) / len(recent) if recent else 0.0,
+            "avg_cpu": sum(cpu) / len(cpu) if cpu else None,
+        }
+
+    def stop(self) -> None:
+        for job in list(self.jobs.values()):
+            job.cancel()
+
+
+# ---------- cpu metrics ----------
+
+try:
+    import psutil as _psutil
+except ImportError:
+    _psutil = None
+
+
+async def _sample_cpu(job: FFmpegJob) -> None:
+    """
+    Track user + system CPU time of a running job. The last sample before
+    exit wins, so this slightly under-reports; samples start dense so
+    short jobs still get a figure.
+    """
+    delay = 0.02
+    try:
+        proc = _psutil.Process(job.process.pid)
+        while job.process.returncode is None:
+            times = proc.cpu_times()
+            job.cpu = times.user + times.system + times.children_user + times.children_system
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, CPU_SAMPLE_INTERVAL)
+    except (_psutil.Error, ProcessLookupError):
+        pass
+
+
+scheduler = FFmpegScheduler()
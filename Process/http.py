@@ -0,0 +1,149 @@
+"""
+Shared outbound HTTP client.
+
+One aiohttp session for the whole bot, so connections to ytimg,
+telegra.ph and the lyrics API are reused (keep-alive, cached DNS)
+instead of paying a TCP + TLS handshake per call. Per-host connection
+limits keep one slow host from starving the others, and transient
+failures (connection errors, timeouts, 429/5xx) are retried with
+exponential backoff. A POST may already have taken effect when it
+times out or gets a 5xx, so POSTs are only retried when the connection
+could not be made at all.
+
+main.py starts and stops the client; if something calls it before that,
+the session is created on first use.
+"""
+
+import asyncio
+import logging
+import os
+import random
+from typing import Any, Callable, Optional, Union
+
+import aiohttp
+
+from Process.errors import HttpError
+
+log = logging.getLogger(__name__)
+
+HTTP_LIMIT = int(os.environ.get("HTTP_LIMIT") or 100)
+HTTP_LIMIT_PER_HOST = int(os.environ.get("HTTP_LIMIT_PER_HOST") or 10)
+HTTP_DNS_TTL = int(os.environ.get("HTTP_DNS_TTL") or 300)
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT") or 20)
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES") or 2)
+# first retry waits about this long, then doubles (with jitter)
+HTTP_BACKOFF = 0.5
+KEEPALIVE_TIMEOUT = 30
+
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+# safe to send twice
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+Timeout = Union[None, float, aiohttp.ClientTimeout]
+
+
+class HttpClient:
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def start(self) -> None:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_LIMIT,
+                limit_per_host=HTTP_LIMIT_PER_HOST,
+                ttl_dns_cache=HTTP_DNS_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                enable_cleanup_closed=True,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+            )
+
+    async def stop(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        read: str = "bytes",
+        retries: Optional[int] = None,
+        timeout: Timeout = None,
+        data: Any = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Send a request and return the body as "bytes", "text" or "json".
+        `data` may be a zero-argument callable building a fresh body per
+        attempt (aiohttp.FormData can only be sent once).
+        Raises HttpError once retries are exhausted or on a non-retryable status.
+        """
+        session = await self.session()
+        retries = HTTP_RETRIES if retries is None else retries
+        if isinstance(timeout, (int, float)):
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        self.requests += 1
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        status = None
+        for attempt in range(retries + 1):
+            delay = HTTP_BACKOFF * (2 ** attempt) * (0.5 + random.random())
+            body = data() if callable(data) else data
+            try:
+                async with session.request(method, url, data=body, **kwargs) as resp:
+                    status = resp.status
+                    if status < 400:
+                        if read == "json":
+                            return await resp.json(content_type=None)
+                        if read == "text":
+                            return await resp.text()
+                        return await resp.read()
+                    if status not in RETRY_STATUSES or not idempotent:
+                        break
+                    retry_after = resp.headers.get("Retry-After", "")
+                    if retry_after.isdigit():
+                        if float(retry_after) > HTTP_TIMEOUT:
+                            # not worth holding the caller for
+                            break
+                        delay = max(delay, float(retry_after))
+            except aiohttp.ClientConnectorError as e:
+                # never reached the server: safe to retry any method
+                status = None
+                log.debug("%s %s failed (attempt %d): %r", method, url, attempt + 1, e)
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                status = None
+                log.debug("%s %s failed (attempt %d): %r", method, url, attempt + 1, e)
+                if not idempotent:
+                    break
+            if attempt < retries:
+                self.retries += 1
+                await asyncio.sleep(delay)
+        self.failures += 1
+        raise HttpError(url, status)
+
+    async def get_bytes(self, url: str, **kwargs) -> bytes:
+        return await self.request("GET", url, read="bytes", **kwargs)
+
+    async def get_json(self, url: str, **kwargs) -> Any:
+        return await self.request("GET", url, read="json", **kwargs)
+
+    async def post_json(self, url: str, data: Union[Any, Callable[[], Any]] = None, **kwargs) -> Any:
+        return await self.request("POST", url, read="json", data=data, **kwargs)
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "retries": self.retries, "failures": self.failures}
+
+
+client = HttpClient()
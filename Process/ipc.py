@@ -0,0 +1,33 @@
+"""
+Length-prefixed frames over a local stream (Unix socket) between the
+supervisor and its workers: 4-byte big-endian length, then a pickle.
+Only ever used between processes of this bot on one host.
+"""
+
+import asyncio
+import pickle
+import struct
+from typing import Any
+
+HEADER = struct.Struct(">I")
+MAX_FRAME = 16 * 1024 * 1024
+
+
+def pack(obj: Any) -> bytes:
+    body = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(body) > MAX_FRAME:
+        raise ValueError(f"frame too large ({len(body)} bytes)")
+    return HEADER.pack(len(body)) + body
+
+
+async def send(writer: asyncio.StreamWriter, obj: Any) -> None:
+    writer.write(pack(obj))
+    await writer.drain()
+
+
+async def receive(reader: asyncio.StreamReader) -> Any:
+    """Next frame; raises asyncio.IncompleteReadError when the peer is gone."""
+    (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if size > MAX_FRAME:
+        raise ValueError(f"frame too large ({size} bytes)")
+    return pickle.loads(await reader.readexactly(size))
@@ -5,29 +5,38 @@ import traceback
 from pyrogram import Client, idle
 from pytgcalls import PyTgCalls
 
+from Process.assistants import Assistant, AssistantPool, CallRouter
+
 API_ID = int(os.environ.get("API_ID") or 0)
 API_HASH = os.environ.get("API_HASH") or ""
 BOT_TOKEN = os.environ.get("BOT_TOKEN") or ""
 SESSION_NAME = os.environ.get("SESSION_NAME") or "assistant"
+BOT_SESSION_NAME = os.environ.get("BOT_SESSION_NAME") or "RaiChu"
+# set by the supervisor in multi-process mode (Process/workers.py): updates
+# arrive over its socket, not from Telegram
+WORKER_SOCKET = os.environ.get("WORKER_SOCKET")
 SESSION_STRING = os.environ.get("SESSION_STRING")  # preferred
+# more assistant accounts, whitespace / comma separated; chats are spread over all of them
+SESSION_STRINGS = (os.environ.get("SESSION_STRINGS") or "").replace(",", " ").split()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # ---------------- BOT CLIENT ----------------
 bot = Client(
-    "RaiChu",
+    BOT_SESSION_NAME,
     api_id=API_ID,
     api_hash=API_HASH,
     bot_token=BOT_TOKEN,
     plugins=dict(root="RaiChu.Player"),
+    no_updates=bool(WORKER_SOCKET),
 )
 
 # ---------------- ASSISTANT CLIENT ----------------
 if SESSION_STRING:
     logger.info("Using SESSION_STRING for assistant (in-memory session).")
     aman = Client(
-        "assistant_mem",
+        f"assistant_mem{os.environ.get('WORKER_INDEX') or ''}",
         api_id=API_ID,
         api_hash=API_HASH,
         session_string=SESSION_STRING,
@@ -40,8 +49,24 @@ else:
         api_hash=API_HASH,
     )
 
+# extra assistants from SESSION_STRINGS (the first one above stays `aman`)
+assistants = [aman]
+for n, session in enumerate(s for s in SESSION_STRINGS if s != SESSION_STRING):
+    assistants.append(
+        Client(
+            f"assistant_mem{os.environ.get('WORKER_INDEX') or ''}_{n + 1}",
+            api_id=API_ID,
+            api_hash=API_HASH,
+            session_string=session,
+        )
+    )
+if len(assistants) > 1:
+    logger.info(f"Assistant pool: {len(assistants)} accounts.")
+
 # ---------------- PYTGCALLS ----------------
-call_py = PyTgCalls(aman)
+# one PyTgCalls per assistant; call_py routes each chat to its assistant
+assistant_pool = AssistantPool([Assistant(i, c, PyTgCalls(c)) for i, c in enumerate(assistants)])
+call_py = CallRouter(assistant_pool)
 
 
 # -------------- STARTUP LOGIC --------------
@@ -50,22 +75,28 @@ async def start_clients():
     await bot.start()
     logger.info("Bot started.")
 
-    logger.info("Testing assistant session...")
-    try:
-        await aman.start()
-        me = await aman.get_me()
-        logger.info(f"Assistant logged in as: {me.first_name} (@{me.username}) is_bot={me.is_bot}")
-
-        if me.is_bot:
-            logger.error("❌ ERROR: Assistant account is a BOT. VC join NEVER works with bot accounts.")
-            logger.error("👉 Fix: Create SESSION_STRING using USER (phone login), not bot token.")
-            raise SystemExit
-
-    except Exception:
-        logger.error("❌ Assistant failed to start. SESSION_STRING may be invalid or corrupted.")
-        logger.error("👉 Fix: Generate new SESSION_STRING on your phone/laptop.")
-        traceback.print_exc()
-        raise SystemExit
+    logger.info("Testing assistant sessions...")
+    for assistant in assistant_pool.assistants:
+        client = assistant.client
+        try:
+            await client.start()
+            me = await client.get_me()
+            logger.info(f"Assistant #{assistant.index} logged in as: {me.first_name} (@{me.username}) is_bot={me.is_bot}")
+
+            if me.is_bot:
+                logger.error("❌ ERROR: Assistant account is a BOT. VC join NEVER works with bot accounts.")
+                logger.error("👉 Fix: Create SESSION_STRING using USER (phone login), not bot token.")
+                raise SystemExit
+
+        except (Exception, SystemExit):
+            if client is aman:
+                logger.error("❌ Assistant failed to start. SESSION_STRING may be invalid or corrupted.")
+                logger.error("👉 Fix: Generate new SESSION_STRING on your phone/laptop.")
+                traceback.print_exc()
+                raise SystemExit
+            # an extra account from SESSION_STRINGS: run without it
+            assistant.healthy = False
+            logger.exception(f"❌ Assistant #{assistant.index} failed to start; taking it out of the pool.")
 
     logger.info("Starting PyTgCalls...")
     try:
@@ -83,10 +114,11 @@ async def stop_clients():
         await call_py.stop()
     except:
         pass
-    try:
-        await aman.stop()
-    except:
-        pass
+    for client in assistants:
+        try:
+            await client.stop()
+        except:
+            pass
     try:
         await bot.stop()
     except:
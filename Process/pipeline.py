@@ -0,0 +1,91 @@
+"""
+Per-chat command pipeline for playback state changes.
+
+Every transition that reads and mutates a chat's queue across an await
+(play, skip, stop, stream end) is submitted here and executed one at a
+time for that chat. Different chats get their own worker task, so they
+still run fully in parallel.
+
+`python -m bench.pipeline_stress` runs a stress benchmark against a fake
+call client.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+_Job = Tuple[Callable[..., Awaitable[Any]], tuple, dict, asyncio.Future]
+
+
+class ChatPipeline:
+    """
+    One FIFO command queue plus one worker task per chat.
+    Workers exit after `idle_timeout` seconds without commands.
+    """
+
+    def __init__(self, idle_timeout: float = 30.0):
+        self.idle_timeout = idle_timeout
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    async def run(self, chat_id: int, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Queue `fn(*args, **kwargs)` behind earlier commands for this chat
+        and return its result (or raise its exception).
+        Never call this from inside a command for the same chat: it would
+        wait on itself. Call the unserialized function directly instead.
+        """
+        fut = asyncio.get_running_loop().create_future()
+        q = self._queues.get(chat_id)
+        if q is None:
+            q = self._queues[chat_id] = asyncio.Queue()
+        q.put_nowait((fn, args, kwargs, fut))
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.create_task(self._worker(chat_id, q))
+        return await fut
+
+    def pending(self, chat_id: int) -> int:
+        """Number of commands waiting for this chat."""
+        q = self._queues.get(chat_id)
+        return q.qsize() if q else 0
+
+    def active_chats(self) -> int:
+        return len(self._workers)
+
+    async def _worker(self, chat_id: int, q: asyncio.Queue) -> None:
+        try:
+            while True:
+                try:
+                    job: _Job = await asyncio.wait_for(q.get(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    # no await between this check and the cleanup, so run() can't
+                    # slip a command into a queue nobody is reading
+                    if q.empty():
+                        return
+                    continue
+                fn, args, kwargs, fut = job
+                if fut.cancelled():
+                    continue
+                try:
+                    result = await fn(*args, **kwargs)
+                except asyncio.CancelledError:
+                    if not fut.done():
+                        fut.cancel()
+                    raise
+                except Exception as e:
+                    if not fut.done():
+                        fut.set_exception(e)
+                else:
+                    if not fut.done():
+                        fut.set_result(result)
+        finally:
+            self._workers.pop(chat_id, None)
+            if self._queues.get(chat_id) is q:
+                del self._queues[chat_id]
+            while not q.empty():
+                *_, fut = q.get_nowait()
+                if not fut.done():
+                    fut.cancel()
+
@@ -0,0 +1,133 @@
+"""
+Background prefetcher for upcoming queue items.
+
+Direct googlevideo links are signed and carry an `expire=` timestamp.
+A link resolved when a track was queued can be dead by the time the
+track plays. The prefetcher keeps the next few items of each chat
+resolved ahead of their expiry, so a skip only has to swap the stream.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from Process.queues import QUEUE, Track
+from Process.ytdl import url_expiry
+
+logger = logging.getLogger(__name__)
+
+Resolver = Callable[..., Awaitable[Optional[str]]]
+
+
+def is_refreshable(track: Track) -> bool:
+    """Only tracks queued from a web page (ref) with a remote link can be re-resolved."""
+    ref = track.ref if isinstance(track.ref, str) else ""
+    link = track.link or ""
+    return ref.startswith(("http://", "https://")) and link.startswith(("http://", "https://"))
+
+
+class Prefetcher:
+    """
+    Keeps queue items 1..depth of every chat resolved.
+    `schedule(chat_id)` after any queue change; `ready_url(track, chat_id)` right
+    before playing a track.
+    """
+
+    def __init__(self, resolve: Resolver, depth: int = 2, margin: float = 1800.0):
+        self.resolve = resolve
+        self.depth = depth
+        self.margin = margin
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._dirty: Dict[int, bool] = {}
+        self._inflight: Dict[int, asyncio.Task] = {}  # id(track) -> refresh task
+
+    def is_fresh(self, track: Track, now: Optional[float] = None) -> bool:
+        if not is_refreshable(track):
+            return True
+        expires = url_expiry(track.link)
+        if expires is None:
+            return True
+        return expires - (now or time.time()) > self.margin
+
+    def schedule(self, chat_id: int) -> None:
+        """Refresh upcoming items of `chat_id` in the background."""
+        task = self._tasks.get(chat_id)
+        if task and not task.done():
+            self._dirty[chat_id] = True
+            return
+        self._tasks[chat_id] = asyncio.create_task(self._run(chat_id))
+
+    def forget(self, chat_id: int) -> None:
+        """Stop background work for a chat that left the call."""
+        timer = self._timers.pop(chat_id, None)
+        if timer:
+            timer.cancel()
+        task = self._tasks.pop(chat_id, None)
+        if task and not task.done():
+            task.cancel()
+        self._dirty.pop(chat_id, None)
+
+    async def ready_url(self, track: Track, chat_id: int, force: bool = False) -> str:
+        """
+        Return a playable link for `track` (queued in `chat_id`), refreshing
+        it first if it is about to expire (or always, with `force`, e.g.
+        after the stored link failed to play). Falls back to the stored
+        link if resolving fails.
+        """
+        if force and is_refreshable(track):
+            await self._refresh(chat_id, track, force=True)
+        elif not self.is_fresh(track):
+            await self._refresh(chat_id, track)
+        return track.link
+
+    async def _refresh(self, chat_id: int, track: Track, force: bool = False) -> None:
+        key = id(track)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._resolve_into(chat_id, track, force))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        await asyncio.shield(task)
+
+    async def _resolve_into(self, chat_id: int, track: Track, force: bool) -> None:
+        try:
+            url = await self.resolve(track, min_ttl=self.margin, refresh=force)
+        except Exception:
+            logger.exception("prefetch: resolving %s failed", track.ref)
+            return
+        if url and url != track.link:
+            track.link = url
+            # the link is part of the persisted queue
+            QUEUE.save(chat_id)
+
+    async def _run(self, chat_id: int) -> None:
+        try:
+            while True:
+                self._dirty[chat_id] = False
+                q = QUEUE.get(chat_id)
+                if not q:
+                    return
+                upcoming = [q[i] for i in range(1, min(len(q), self.depth + 1))]
+                stale = [t for t in upcoming if not self.is_fresh(t)]
+                if stale:
+                    await asyncio.gather(*(self._refresh(chat_id, t) for t in stale), return_exceptions=True)
+                if not self._dirty.get(chat_id):
+                    self._arm_timer(chat_id, upcoming)
+                    return
+        finally:
+            if self._tasks.get(chat_id) is asyncio.current_task():
+                del self._tasks[chat_id]
+
+    def _arm_timer(self, chat_id: int, upcoming) -> None:
+        """Wake up again just before the earliest upcoming link goes stale."""
+        old = self._timers.pop(chat_id, None)
+        if old:
+            old.cancel()
+        expiries = [url_expiry(t.link) for t in upcoming if is_refreshable(t)]
+        expiries = [e for e in expiries if e is not None]
+        if not expiries:
+            return
+        delay = max(min(expiries) - self.margin - time.time(), 30.0)
+        self._timers[chat_id] = asyncio.get_running_loop().call_later(delay, self.schedule, chat_id)
@@ -1,7 +1,84 @@
-from typing import Dict, List, Optional, Any
+from collections import deque
+from typing import Any, Callable, Iterable, List, Optional
 
-# Structure: { chat_id: [ {song info dict}, ... ] }
-QUEUE: Dict[int, List[dict]] = {}
+from Process.state import store
+
+
+class Track:
+    """
+    A single queued item.
+    Uses __slots__ so long, playlist-sized queues stay compact.
+    Supports read-only dict-style access (item["title"], item.get("link"))
+    for code written against the old dict items.
+    """
+
+    __slots__ = ("title", "link", "ref", "type", "quality")
+
+    def __init__(self, title: str, link: str, ref: Any, type: str, quality: Any):
+        self.title = title
+        self.link = link
+        self.ref = ref
+        self.type = type
+        self.quality = quality
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"Track(title={self.title!r}, type={self.type!r})"
+
+
+class ChatQueue(deque):
+    """
+    Per-chat queue backed by a deque.
+    Head pops and appends are O(1); index 0 is the track currently playing.
+    `pop(index)` mirrors list.pop so older call sites keep working.
+    """
+
+    __slots__ = ()
+
+    def pop(self, index: Optional[int] = None) -> Track:
+        if index is None or index == -1:
+            return super().pop()
+        if index == 0:
+            return self.popleft()
+        item = self[index]
+        del self[index]
+        return item
+
+
+# Structure: { chat_id: ChatQueue([Track, ...]) }
+# A StoreMap: reads stay local, every mutation below is also written to the
+# state store (STATE_URL) so another process / a restart can pick it up.
+QUEUE = store.namespace("queues")
+
+# called as fn(op, chat_id, *args) after every mutation below (the queue
+# journal listens here); listeners must be cheap and must not raise
+_listeners: List[Callable[..., None]] = []
+
+
+def add_listener(fn: Callable[..., None]) -> None:
+    if fn not in _listeners:
+        _listeners.append(fn)
+
+
+def remove_listener(fn: Callable[..., None]) -> None:
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+def _emit(op: str, chat_id: int, *args) -> None:
+    for fn in _listeners:
+        fn(op, chat_id, *args)
 
 
 def add_to_queue(
@@ -16,47 +93,60 @@ def add_to_queue(
     Add a song item to queue.
     Returns index of newly added item.
     """
+    q = QUEUE.get(chat_id)
+    if q is None:
+        q = QUEUE[chat_id] = ChatQueue()
 
-    item = {
-        "title": songname,
-        "link": link,
-        "ref": ref,
-        "type": type,
-        "quality": quality
-    }
+    track = Track(songname, link, ref, type, quality)
+    q.append(track)
+    QUEUE.save(chat_id)
+    _emit("add", chat_id, track)
+    return len(q) - 1
 
-    if chat_id not in QUEUE:
-        QUEUE[chat_id] = []
 
-    QUEUE[chat_id].append(item)
-    return len(QUEUE[chat_id]) - 1
+def extend_queue(chat_id: int, tracks: Iterable[Track]) -> int:
+    """
+    Append several tracks at once (playlists).
+    Returns the new queue length.
+    """
+    q = QUEUE.get(chat_id)
+    if q is None:
+        q = QUEUE[chat_id] = ChatQueue()
+    tracks = list(tracks)
+    q.extend(tracks)
+    QUEUE.save(chat_id)
+    _emit("extend", chat_id, tracks)
+    return len(q)
 
 
-def get_queue(chat_id: int) -> List[dict]:
+def get_queue(chat_id: int) -> ChatQueue:
     """
-    Return queue list for chat or an empty list.
+    Return queue for chat or an empty queue.
     """
-    return QUEUE.get(chat_id, [])
+    return QUEUE.get(chat_id) or ChatQueue()
 
 
-def get_next(chat_id: int) -> Optional[dict]:
+def get_next(chat_id: int) -> Optional[Track]:
     """
     Return the next song (first element) without removing it.
     """
     q = QUEUE.get(chat_id)
-    if q and len(q) > 0:
+    if q:
         return q[0]
     return None
 
 
-def pop_an_item(chat_id: int) -> Optional[dict]:
+def pop_an_item(chat_id: int) -> Optional[Track]:
     """
     Pop the first item safely.
     Returns the popped item or None.
     """
     q = QUEUE.get(chat_id)
-    if q and len(q) > 0:
-        return q.pop(0)
+    if q:
+        item = q.popleft()
+        QUEUE.save(chat_id)
+        _emit("pop", chat_id)
+        return item
     return None
 
 
@@ -66,6 +156,7 @@ def clear_queue(chat_id: int) -> bool:
     """
     if chat_id in QUEUE:
         del QUEUE[chat_id]
+        _emit("clear", chat_id)
         return True
     return False
 
@@ -74,15 +165,19 @@ def queue_length(chat_id: int) -> int:
     """
     Return number of items in the queue.
     """
-    return len(QUEUE.get(chat_id, []))
+    q = QUEUE.get(chat_id)
+    return len(q) if q else 0
 
 
-def remove_index(chat_id: int, index: int) -> Optional[dict]:
+def remove_index(chat_id: int, index: int) -> Optional[Track]:
     """
     Remove a specific item by index.
     Returns removed item or None.
     """
     q = QUEUE.get(chat_id)
     if q and 0 <= index < len(q):
-        return q.pop(index)
+        item = q.pop(index)
+        QUEUE.save(chat_id)
+        _emit("remove", chat_id, index)
+        return item
     return None
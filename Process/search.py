@@ -0,0 +1,118 @@
+"""
+Async YouTube search shared by every handler.
+
+Searches never run on the event loop thread's critical path: the backend
+is the async `youtubesearchpython.__future__` client, results are cached
+per normalized query (LRU + TTL), identical concurrent searches share one
+request, and at most SEARCH_CONCURRENCY requests are in flight.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from typing import List, Optional
+
+from Process.Cache.ttl import SingleFlight, TTLCache
+
+log = logging.getLogger(__name__)
+
+SEARCH_TTL = int(os.environ.get("SEARCH_TTL") or 900)
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE") or 2048)
+SEARCH_CONCURRENCY = int(os.environ.get("SEARCH_CONCURRENCY") or 8)
+# every backend call fetches this many results; smaller limits are slices
+SEARCH_PAGE = 10
+# "no results" is remembered briefly so typos don't hammer YouTube
+_EMPTY_TTL = 60
+
+_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_TTL)
+_flights = SingleFlight()
+_sem: Optional[asyncio.Semaphore] = None
+
+
+# case matters in urls and video ids; only free text is folded
+_VIDEO_ID = re.compile(r"[A-Za-z0-9_-]{11}")
+
+
+def _is_url(word: str) -> bool:
+    return "://" in word or "/" in word or word.lower().startswith("www.")
+
+
+def normalize_query(query: str) -> str:
+    words = (query or "").split()
+    if len(words) == 1 and _VIDEO_ID.fullmatch(words[0]):
+        return words[0]
+    return " ".join(w if _is_url(w) else w.casefold() for w in words)
+
+
+def duration_seconds(duration: str) -> int:
+    """'1:02:03' -> 3723; anything unparsable -> 0."""
+    total = 0
+    try:
+        for part in str(duration).split(":"):
+            total = total * 60 + int(part)
+    except ValueError:
+        return 0
+    return total
+
+
+def _normalize_result(r: dict) -> dict:
+    vid = r.get("id") or r.get("videoId") or ""
+    thumbs = r.get("thumbnails") or [{"url": ""}]
+    return {
+        "id": vid,
+        "title": r.get("title") or "Unknown Title",
+        "link": r.get("link") or f"https://www.youtube.com/watch?v={vid}",
+        "duration": r.get("duration") or "Unknown",
+        "views": (r.get("viewCount") or {}).get("short") or "Unknown Views",
+        "channel": (r.get("channel") or {}).get("name") or "Unknown",
+        "thumbnail": f"https://i.ytimg.com/vi/{vid}/hqdefault.jpg",
+        "thumb_src": (thumbs[0].get("url") or "").split("?")[0],
+    }
+
+
+async def _backend(query: str) -> List[dict]:
+    from youtubesearchpython.__future__ import VideosSearch
+
+    data = await VideosSearch(query, limit=SEARCH_PAGE).next()
+    items = (data or {}).get("result") or []
+    return [_normalize_result(r) for r in items]
+
+
+async def _search_and_cache(key: str, query: str) -> List[dict]:
+    global _sem
+    if _sem is None:
+        _sem = asyncio.Semaphore(SEARCH_CONCURRENCY)
+    async with _sem:
+        results = await _backend(query)
+    _cache.set(key, results, ttl=SEARCH_TTL if results else _EMPTY_TTL)
+    return results
+
+
+async def search(query: str, limit: int = 1) -> List[dict]:
+    """
+    Return up to `limit` normalized results:
+    { id, title, link, duration, views, channel, thumbnail, thumb_src }.
+    Returns an empty list on failure.
+    """
+    key = normalize_query(query)
+    if not key:
+        return []
+    results = _cache.get(key)
+    if results is None:
+        try:
+            results = await _flights.do(key, _search_and_cache, key, query)
+        except Exception:
+            log.exception("YouTube search failed for %r", query)
+            return []
+    # copies: callers may tweak the dicts
+    return [dict(r) for r in results[:limit]]
+
+
+async def search_one(query: str) -> Optional[dict]:
+    results = await search(query, limit=1)
+    return results[0] if results else None
+
+
+def stats() -> dict:
+    return {**_cache.stats(), "in_flight": _flights.in_flight()}
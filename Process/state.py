@@ -0,0 +1,607 @@
+"""
+Pluggable state store for the queues and the admin cache.
+
+STATE_URL picks the backend:
+ - memory://            (default) plain dicts, nothing survives the process
+ - sqlite:///cache/state.sqlite3   (sqlite:////abs/path for an absolute one)
+ - redis://[:password@]host:6379/0   any server speaking RESP
+
+Call sites keep synchronous, dict-like access: `namespace(name)` returns
+a StoreMap. Its local dict serves every read, and every write is also
+handed to the store. The persistent backends buffer writes (coalesced
+per key) and a writer thread sends them every STATE_FLUSH_INTERVAL
+seconds as one SQLite transaction or one pipelined round trip to Redis.
+Writing to a StoreMap therefore never waits on the backend.
+
+Mutating a stored value in place (appending to a queue) must be
+followed by `StoreMap.save(key)`. On memory:// that is free, the store
+holds the very same object. On a persistent store the key is marked
+dirty and snapshotted once per flush interval: the event loop pays one
+shallow copy per interval, however many mutations came in, and the
+writer thread pickles the copy.
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlparse
+
+log = logging.getLogger(__name__)
+
+STATE_URL = os.environ.get("STATE_URL") or "memory://"
+STATE_FLUSH_INTERVAL = float(os.environ.get("STATE_FLUSH_INTERVAL") or 0.05)
+# most writes sent in one transaction / pipeline
+BATCH_SIZE = 500
+
+_DELETE = object()
+
+
+class _Deferred:
+    """A value handed over by `set_later`, pickled by the writer thread."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+def _blob(value: Any) -> Any:
+    if isinstance(value, _Deferred):
+        return pickle.dumps(value.value, protocol=pickle.HIGHEST_PROTOCOL)
+    return value
+
+
+def _key(key: Hashable) -> str:
+    return json.dumps(key)
+
+
+def _unkey(raw: str) -> Hashable:
+    return json.loads(raw)
+
+
+class StateStore:
+    """Namespaced key -> value store. Values are any picklable object."""
+
+    persistent = False
+
+    def __init__(self):
+        self._views: List["StoreMap"] = []
+
+    def get(self, ns: str, key: Hashable, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, ns: str, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def set_later(self, ns: str, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Like `set`, but `value` may be serialized later, off the caller's thread; don't mutate it afterwards."""
+        self.set(ns, key, value, ttl)
+
+    def delete(self, ns: str, key: Hashable) -> None:
+        raise NotImplementedError
+
+    def scan(self, ns: str) -> Iterator[Tuple[Hashable, Any]]:
+        """Every live (key, value) of a namespace."""
+        raise NotImplementedError
+
+    def clear(self, ns: str) -> None:
+        for key, _ in list(self.scan(ns)):
+            self.delete(ns, key)
+
+    def flush(self) -> None:
+        """Block until buffered writes reached the backend."""
+
+    def stop(self) -> None:
+        self.flush()
+
+    def stats(self) -> dict:
+        return {}
+
+    def namespace(self, ns: str) -> "StoreMap":
+        view = StoreMap(self, ns)
+        self._views.append(view)
+        return view
+
+
+# ---------- memory ----------
+
+
+class MemoryStore(StateStore):
+    def __init__(self):
+        super().__init__()
+        self._data: Dict[str, Dict[Hashable, Tuple[Optional[float], Any]]] = {}
+
+    def get(self, ns: str, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(ns, {}).get(key)
+        if entry is None or (entry[0] is not None and entry[0] <= time.time()):
+            return default
+        return entry[1]
+
+    def set(self, ns: str, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._data.setdefault(ns, {})[key] = (time.time() + ttl if ttl else None, value)
+
+    def delete(self, ns: str, key: Hashable) -> None:
+        self._data.get(ns, {}).pop(key, None)
+
+    def scan(self, ns: str) -> Iterator[Tuple[Hashable, Any]]:
+        now = time.time()
+        for key, (expires, value) in list(self._data.get(ns, {}).items()):
+            if expires is None or expires > now:
+                yield key, value
+
+    def clear(self, ns: str) -> None:
+        self._data.pop(ns, None)
+
+
+# ---------- write-behind base ----------
+
+
+class BatchedStore(StateStore):
+    """
+    Buffers writes per (ns, key), last one wins, and flushes them from a
+    writer thread in batches. Reads see buffered writes first.
+    """
+
+    persistent = True
+
+    def __init__(self, flush_interval: float = STATE_FLUSH_INTERVAL):
+        super().__init__()
+        self.flush_interval = flush_interval
+        self._pending: "OrderedDict[Tuple[str, str], Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._io = threading.Lock()  # one backend connection, shared by reads and the writer
+        self._wake = threading.Event()
+        self._flushed = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.writes = 0
+        self.batches = 0
+
+    # backend hooks; `batch` is [(ns, key, blob | _DELETE, expires_at | None)]
+    def _write_batch(self, batch: list) -> None:
+        raise NotImplementedError
+
+    def _read(self, ns: str, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def _read_all(self, ns: str) -> List[Tuple[str, bytes]]:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        pass
+
+    def _ensure_writer(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="state-writer", daemon=True)
+            self._thread.start()
+
+    def _enqueue(self, ns: str, key: Hashable, value: Any, ttl: Optional[float]) -> None:
+        k = (ns, _key(key))
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            if self._closed:
+                # shutting down: whatever is dropped here (leave handlers
+                # clearing queues) must not reach the store
+                return
+            self._pending.pop(k, None)
+            self._pending[k] = (value, expires)
+            big = len(self._pending) >= BATCH_SIZE
+        self._ensure_writer()
+        if big:
+            self._wake.set()
+
+    def get(self, ns: str, key: Hashable, default: Any = None) -> Any:
+        k = (ns, _key(key))
+        with self._lock:
+            pending = self._pending.get(k)
+        if pending is not None:
+            value, expires = pending
+            if value is _DELETE or (expires is not None and expires <= time.time()):
+                return default
+            return pickle.loads(_blob(value))
+        with self._io:
+            blob = self._read(ns, k[1])
+        return default if blob is None else pickle.loads(blob)
+
+    def set(self, ns: str, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        # serialized now: the caller may keep mutating the object
+        self._enqueue(ns, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ttl)
+
+    def set_later(self, ns: str, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._enqueue(ns, key, _Deferred(value), ttl)
+
+    def delete(self, ns: str, key: Hashable) -> None:
+        self._enqueue(ns, key, _DELETE, None)
+
+    def scan(self, ns: str) -> Iterator[Tuple[Hashable, Any]]:
+        self.flush()
+        with self._io:
+            rows = self._read_all(ns)
+        for raw_key, blob in rows:
+            yield _unkey(raw_key), pickle.loads(blob)
+
+    def _take(self) -> list:
+        with self._lock:
+            batch = []
+            while self._pending and len(batch) < BATCH_SIZE:
+                (ns, key), (value, expires) = self._pending.popitem(last=False)
+                batch.append((ns, key, value, expires))
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            while True:
+                batch = self._take()
+                if not batch:
+                    break
+                try:
+                    batch = [(ns, key, _blob(value), expires) for ns, key, value, expires in batch]
+                    with self._io:
+                        self._write_batch(batch)
+                    self.writes += len(batch)
+                    self.batches += 1
+                except Exception:
+                    log.exception("state store: writing %d keys failed, retrying", len(batch))
+                    with self._lock:
+                        for ns, key, value, expires in reversed(batch):
+                            if (ns, key) not in self._pending:
+                                self._pending[(ns, key)] = (value, expires)
+                                self._pending.move_to_end((ns, key), last=False)
+                    time.sleep(1.0)
+                    break
+            with self._lock:
+                if not self._pending:
+                    self._flushed.notify_all()
+                    if self._closed:
+                        return
+
+    def flush(self, timeout: float = 10.0) -> None:
+        if self._thread is None:
+            return
+        with self._lock:
+            if not self._pending:
+                return
+            self._wake.set()
+            self._flushed.wait_for(lambda: not self._pending, timeout=timeout)
+
+    def stop(self) -> None:
+        # snapshots still waiting for their flush interval
+        for view in self._views:
+            view.save_pending()
+        if self._thread is not None:
+            with self._lock:
+                self._closed = True
+            self._wake.set()
+            self._thread.join(timeout=10)
+            self._thread = None
+        with self._io:
+            self._close()
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "writes": self.writes, "batches": self.batches}
+
+
+# ---------- sqlite ----------
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    ns      TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    value   BLOB NOT NULL,
+    expires REAL,
+    PRIMARY KEY (ns, key)
+)
+"""
+
+
+class SQLiteStore(BatchedStore):
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+
+    def _write_batch(self, batch: list) -> None:
+        db = self._db
+        db.execute("BEGIN")
+        try:
+            db.executemany(
+                "DELETE FROM state WHERE ns=? AND key=?",
+                [(ns, key) for ns, key, value, _ in batch if value is _DELETE],
+            )
+            db.executemany(
+                "INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?)",
+                [(ns, key, value, expires) for ns, key, value, expires in batch if value is not _DELETE],
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _read(self, ns: str, key: str) -> Optional[bytes]:
+        row = self._db.execute(
+            "SELECT value FROM state WHERE ns=? AND key=? AND (expires IS NULL OR expires > ?)",
+            (ns, key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _read_all(self, ns: str) -> List[Tuple[str, bytes]]:
+        return self._db.execute(
+            "SELECT key, value FROM state WHERE ns=? AND (expires IS NULL OR expires > ?)",
+            (ns, time.time()),
+        ).fetchall()
+
+    def _close(self) -> None:
+        self._db.close()
+
+
+# ---------- redis protocol ----------
+
+
+class RespError(Exception):
+    pass
+
+
+class RespConnection:
+    """Minimal blocking RESP2 client: pipelined commands, no pub/sub."""
+
+    def __init__(self, host: str, port: int, db: int = 0, password: Optional[str] = None, timeout: float = 5.0):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection(self.address, timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            self._pipeline(setup)
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(out)
+
+    def _reply(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            return RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            if size < 0:
+                return None
+            data = self._file.read(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            size = int(rest)
+            return None if size < 0 else [self._reply() for _ in range(size)]
+        raise ConnectionError(f"bad redis reply {line!r}")
+
+    def _pipeline(self, commands) -> list:
+        self._sock.sendall(b"".join(self._encode(c) for c in commands))
+        return [self._reply() for _ in commands]
+
+    def pipeline(self, commands) -> list:
+        """Send every command in one write, then read all replies."""
+        for attempt in (0, 1):
+            try:
+                if self._sock is None:
+                    self._connect()
+                replies = self._pipeline(commands)
+                break
+            except (OSError, ConnectionError):
+                self.close()
+                if attempt:
+                    raise
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def command(self, *args):
+        return self.pipeline([args])[0]
+
+    def close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._file = None
+
+
+class RedisStore(BatchedStore):
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, prefix: str = "raichu", **kwargs):
+        super().__init__(**kwargs)
+        self.prefix = prefix
+        self._conn = RespConnection(host, port, db, password)
+
+    def _name(self, ns: str, key: str) -> str:
+        return f"{self.prefix}:{ns}:{key}"
+
+    def _write_batch(self, batch: list) -> None:
+        commands = []
+        now = time.time()
+        for ns, key, value, expires in batch:
+            name = self._name(ns, key)
+            if value is _DELETE:
+                commands.append(("DEL", name))
+            elif expires is not None:
+                commands.append(("SET", name, value, "PX", max(1, int((expires - now) * 1000))))
+            else:
+                commands.append(("SET", name, value))
+        self._conn.pipeline(commands)
+
+    def _read(self, ns: str, key: str) -> Optional[bytes]:
+        return self._conn.command("GET", self._name(ns, key))
+
+    def _read_all(self, ns: str) -> List[Tuple[str, bytes]]:
+        match = self._name(ns, "*")
+        offset = len(self._name(ns, ""))
+        names, cursor = [], b"0"
+        while True:
+            cursor, found = self._conn.command("SCAN", cursor, "MATCH", match, "COUNT", 500)
+            names.extend(found)
+            if cursor in (b"0", 0, "0"):
+                break
+        rows = []
+        for start in range(0, len(names), BATCH_SIZE):
+            chunk = names[start:start + BATCH_SIZE]
+            for name, blob in zip(chunk, self._conn.command("MGET", *chunk)):
+                if blob is not None:
+                    rows.append((name[offset:].decode(), blob))
+        return rows
+
+    def _close(self) -> None:
+        self._conn.close()
+
+
+# ---------- mapping view ----------
+
+
+class StoreMap:
+    """
+    Dict-like view of one namespace. Reads come from the local dict;
+    writes go to both, so callers never wait on the backend.
+    """
+
+    def __init__(self, store: StateStore, ns: str):
+        self.store = store
+        self.ns = ns
+        self._local: Dict[Hashable, Any] = {}
+        self._dirty: Set[Hashable] = set()
+
+    def load(self, accept: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """Pull the namespace from the store (e.g. on startup); returns how many keys."""
+        for key, value in self.store.scan(self.ns):
+            if accept is None or accept(key):
+                self._local[key] = value
+        return len(self._local)
+
+    def save(self, key: Hashable) -> None:
+        """Persist `key` again after its value was mutated in place."""
+        if key not in self._local or not self.store.persistent:
+            # memory:// already holds this very object
+            return
+        if key in self._dirty:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._snapshot(key)
+            return
+        self._dirty.add(key)
+        loop.call_later(getattr(self.store, "flush_interval", STATE_FLUSH_INTERVAL), self._snapshot, key)
+
+    def _snapshot(self, key: Hashable) -> None:
+        self._dirty.discard(key)
+        if key in self._local:
+            # the copy is pickled by the store's writer, off the event loop
+            self.store.set_later(self.ns, key, copy.copy(self._local[key]))
+
+    def save_pending(self) -> None:
+        """Snapshot every key saved since the last flush interval now."""
+        for key in list(self._dirty):
+            self._snapshot(key)
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self._local[key]
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self._local[key] = value
+        self.store.set(self.ns, key, value)
+
+    def __delitem__(self, key: Hashable) -> None:
+        del self._local[key]
+        self.store.delete(self.ns, key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._local
+
+    def __iter__(self):
+        return iter(self._local)
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self._local.get(key, default)
+
+    def pop(self, key: Hashable, *default) -> Any:
+        if key in self._local:
+            self.store.delete(self.ns, key)
+        return self._local.pop(key, *default)
+
+    def keys(self):
+        return self._local.keys()
+
+    def values(self):
+        return self._local.values()
+
+    def items(self):
+        return self._local.items()
+
+    def clear(self) -> None:
+        self._local.clear()
+        self.store.clear(self.ns)
+
+    def __repr__(self) -> str:
+        return f"StoreMap({self.ns!r}, {len(self._local)} keys)"
+
+
+def open_store(url: str = STATE_URL) -> StateStore:
+    parsed = urlparse(url)
+    if parsed.scheme in ("", "memory"):
+        return MemoryStore()
+    if parsed.scheme == "sqlite":
+        # sqlite:///relative/path, sqlite:////absolute/path
+        return SQLiteStore(unquote(parsed.path[1:]) or os.path.join("cache", "state.sqlite3"))
+    if parsed.scheme == "redis":
+        return RedisStore(
+            parsed.hostname or "127.0.0.1",
+            parsed.port or 6379,
+            int(parsed.path.lstrip("/") or 0),
+            unquote(parsed.password) if parsed.password else None,
+        )
+    raise ValueError(f"unknown STATE_URL scheme: {url!r}")
+
+
+store = open_store()
+
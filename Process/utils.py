@@ -1,13 +1,18 @@
 import os
 import logging
 import asyncio
-import traceback
-from typing import Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 from Process.main import bot, call_py
+from Process.admins import warm as warm_admins
+from Process.callbacks import encode
+from Process.ffmpeg import BACKGROUND, scheduler as ffmpeg_jobs
 from pytgcalls.types import Update
-from pytgcalls.types.input_stream import AudioPiped, AudioVideoPiped
-from Process.queues import get_queue, pop_an_item, clear_queue
+from pytgcalls.types.input_stream import AudioParameters, AudioPiped, AudioVideoPiped, InputAudioStream, InputStream
+from Process.pipeline import ChatPipeline
+from Process.prefetch import Prefetcher, is_refreshable
+from Process.queues import QUEUE, Track, add_to_queue, extend_queue, get_queue, pop_an_item, clear_queue, remove_index
+from pytgcalls import StreamType
 from pytgcalls.types.input_stream.quality import (
     HighQualityAudio,
     HighQualityVideo,
@@ -20,29 +25,54 @@ from pyrogram.types import (
     Message,
 )
 from pytgcalls.types.stream import StreamAudioEnded
+from Process.ytdl import get_stream_url
+from RaiChu.config import PREFETCH_DEPTH, PREFETCH_MARGIN
+from RaiChu.converter import CONVERT_MODE, convert, release
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# serializes play / skip / stop / stream-end / leave events per chat
+pipeline = ChatPipeline()
+# chat_id -> calls joined so far; a leave event only cleans up after the call it was raised for
+_calls_joined: Dict[int, int] = {}
+
+
+async def _resolve_track(track: Track, min_ttl: float = 0.0, refresh: bool = False) -> Optional[str]:
+    height = int(track.quality) if str(track.quality).isdigit() and int(track.quality) else 720
+    return await get_stream_url(track.ref, max_height=height, min_ttl=min_ttl, refresh=refresh)
+
+
+# keeps the next queue items' stream urls resolved ahead of expiry
+prefetcher = Prefetcher(_resolve_track, depth=PREFETCH_DEPTH, margin=PREFETCH_MARGIN)
+
 
 keyboard = InlineKeyboardMarkup(
     [
         [
-            InlineKeyboardButton(text="• Mᴇɴᴜ", callback_data="cbmenu"),
-            InlineKeyboardButton(text="• Cʟᴏsᴇ", callback_data="cls"),
+            InlineKeyboardButton(text="• Mᴇɴᴜ", callback_data=encode("cbmenu")),
+            InlineKeyboardButton(text="• Cʟᴏsᴇ", callback_data=encode("cls")),
         ]
     ]
 )
 
 
-def _normalize_item(item: Union[list, dict]) -> dict:
+def _normalize_item(item: Union[Track, list, dict]) -> dict:
     """
     Normalize a queue item to a dict with keys:
       title, link, ref, type, quality
-    Supports legacy list style [songname, link, ref, type, quality].
+    Supports legacy dict and list style [songname, link, ref, type, quality].
     """
     if item is None:
         return {}
+    if isinstance(item, Track):
+        return {
+            "title": item.title or "",
+            "link": item.link or "",
+            "ref": item.ref,
+            "type": item.type or "Audio",
+            "quality": item.quality or 0,
+        }
     if isinstance(item, dict):
         return {
             "title": item.get("title") or item.get("songname") or "",
@@ -79,42 +109,119 @@ def _quality_obj(q) -> Tuple:
     return audio, HighQualityVideo()
 
 
+def _input_stream(stream_url: str, media_type: str, quality):
+    # select stream based on type
+    if media_type.lower() == "audio":
+        return AudioPiped(stream_url)
+    audio_obj, video_obj = _quality_obj(quality)
+    return AudioVideoPiped(stream_url, audio_obj, video_obj)
+
+
+# ---------------- converted audio ----------------
+# In stream mode, audio tracks don't use pytgcalls' own ffmpeg: RaiChu.converter
+# runs ffmpeg on the scheduler (FFMPEG_WORKERS, priorities, cancel_chat) and
+# the call reads raw PCM from its named pipe. Video keeps AudioVideoPiped.
+
+# chat_id -> pipe its call is reading
+_pipes: Dict[int, str] = {}
+
+
+async def _open_input(chat_id: int, stream_url: str, media_type: str, quality):
+    """(input stream for pytgcalls, pipe path or None)."""
+    if media_type.lower() == "audio" and CONVERT_MODE == "stream":
+        pipe = await convert(stream_url, chat_id=chat_id)
+        return InputStream(InputAudioStream(pipe, AudioParameters(bitrate=48000))), pipe
+    return _input_stream(stream_url, media_type, quality), None
+
+
+async def _play_input(chat_id: int, stream_url: str, media_type: str, quality, join: bool = False, **join_kwargs) -> None:
+    """
+    Join the call with (or switch it to) `stream_url`. The pipe the call
+    played before is released once the new one is in; a pipe that never
+    made it into the call is released right away.
+    """
+    stream, pipe = await _open_input(chat_id, stream_url, media_type, quality)
+    try:
+        if join:
+            await call_py.join_group_call(chat_id, stream, **join_kwargs)
+            _calls_joined[chat_id] = _calls_joined.get(chat_id, 0) + 1
+        else:
+            await call_py.change_stream(chat_id, stream)
+    except BaseException:
+        if pipe:
+            await release(pipe)
+        raise
+    old = _pipes.pop(chat_id, None)
+    if pipe:
+        _pipes[chat_id] = pipe
+    if old and old != pipe:
+        await release(old)
+
+
+async def _drop_media(chat_id: int) -> None:
+    """The chat stopped playing: kill its ffmpeg work and its pipe."""
+    pipe = _pipes.pop(chat_id, None)
+    ffmpeg_jobs.cancel_chat(chat_id)
+    if pipe:
+        await release(pipe)
+
+
+async def _change_stream(chat_id: int, stream_url: str, media_type: str, quality) -> None:
+    await _play_input(chat_id, stream_url, media_type, quality)
+
+
 async def skip_current_song(chat_id: int) -> Union[int, list]:
     """
     Skip the current song and start the next one.
+    Serialized with every other playback change in this chat.
     Returns:
       - 1 if queue emptied and bot left the vc
       - 2 if error occurred and bot left
       - [title, link, type] if next song started successfully
       - 0 if no queue present
     """
+    return await pipeline.run(chat_id, _skip_current_song, chat_id)
+
+
+async def _skip_current_song(chat_id: int) -> Union[int, list]:
     try:
         q = get_queue(chat_id)
         if not q:
             return 0
 
+        # the outgoing track's pipe is released once the next one plays
+        # (killing it first would end its stream and trigger another skip)
         if len(q) == 1:
             # nothing to play next
             await call_py.leave_group_call(chat_id)
             clear_queue(chat_id)
+            prefetcher.forget(chat_id)
+            await _drop_media(chat_id)
             return 1
 
         # get the next item (index 1 because index 0 is current)
+        if isinstance(q[1], Track):
+            # usually already refreshed in the background; resolves now if not
+            await prefetcher.ready_url(q[1], chat_id)
         next_item = _normalize_item(q[1])
         title = next_item["title"]
         stream_url = next_item["link"]
         media_type = next_item["type"]
         quality = next_item["quality"]
 
-        # select stream based on type
-        if media_type.lower() == "audio":
-            await call_py.change_stream(chat_id, AudioPiped(stream_url))
-        else:
-            audio_obj, video_obj = _quality_obj(quality)
-            await call_py.change_stream(chat_id, AudioVideoPiped(stream_url, audio_obj, video_obj))
+        try:
+            await _change_stream(chat_id, stream_url, media_type, quality)
+        except Exception:
+            if not (isinstance(q[1], Track) and is_refreshable(q[1])):
+                raise
+            # the cached link may have gone bad early: resolve a fresh one, retry once
+            logger.warning("change_stream failed in chat %s, retrying with a fresh url", chat_id)
+            stream_url = await prefetcher.ready_url(q[1], chat_id, force=True)
+            await _change_stream(chat_id, stream_url, media_type, quality)
 
         # pop the current (index 0)
-        popped = pop_an_item(chat_id)
+        pop_an_item(chat_id)
+        prefetcher.schedule(chat_id)
         return [title, stream_url, media_type]
     except Exception:
         logger.exception("Error while skipping to next song in chat %s", chat_id)
@@ -123,6 +230,8 @@ async def skip_current_song(chat_id: int) -> Union[int, list]:
         except Exception:
             logger.exception("Error leaving group call for chat %s", chat_id)
         clear_queue(chat_id)
+        prefetcher.forget(chat_id)
+        await _drop_media(chat_id)
         return 2
 
 
@@ -131,18 +240,23 @@ async def skip_item(chat_id: int, index: int) -> Union[str, int]:
     Remove an item at position `index` from the queue (0-based).
     Returns the removed song title or 0 on failure.
     """
+    return await pipeline.run(chat_id, _skip_item, chat_id, index)
+
+
+async def _skip_item(chat_id: int, index: int) -> Union[str, int]:
     try:
         q = get_queue(chat_id)
         if not q:
             return 0
-        # if legacy list style, operate carefully
-        if index < 0 or index >= len(q):
+        item = remove_index(chat_id, index)
+        if item is None:
             return 0
-        item = q.pop(index)
         # if you removed the current (index 0) we should advance the stream
         if index == 0:
             # try to start next automatically
-            await skip_current_song(chat_id)
+            await _skip_current_song(chat_id)
+        elif index <= prefetcher.depth:
+            prefetcher.schedule(chat_id)
         normalized = _normalize_item(item)
         return normalized.get("title", "") or 0
     except Exception:
@@ -150,22 +264,142 @@ async def skip_item(chat_id: int, index: int) -> Union[str, int]:
         return 0
 
 
+async def play_or_queue(
+    chat_id: int,
+    title: str,
+    link: str,
+    ref,
+    media_type: str,
+    quality,
+    **join_kwargs,
+) -> int:
+    """
+    Join the call and start playing `link` if nothing is playing, otherwise
+    queue it. Returns the queue position (0 means it started playing now).
+    Join errors propagate to the caller; the queue is left untouched then.
+    """
+
+    async def _play() -> int:
+        if chat_id in QUEUE:
+            pos = add_to_queue(chat_id, title, link, ref, media_type, quality)
+            if pos <= prefetcher.depth:
+                prefetcher.schedule(chat_id)
+            return pos
+        await _play_input(chat_id, link, media_type, quality, join=True, **join_kwargs)
+        # control buttons are about to be tapped; fetch admins once, up front
+        warm_admins(bot, chat_id)
+        return add_to_queue(chat_id, title, link, ref, media_type, quality)
+
+    return await pipeline.run(chat_id, _play)
+
+
+async def stop_stream(chat_id: int) -> bool:
+    """
+    Leave the call and drop the queue.
+    Returns False if nothing was streaming.
+    """
+
+    async def _stop() -> bool:
+        if chat_id not in QUEUE:
+            return False
+        try:
+            await call_py.leave_group_call(chat_id)
+        finally:
+            clear_queue(chat_id)
+            prefetcher.forget(chat_id)
+            await _drop_media(chat_id)
+        return True
+
+    return await pipeline.run(chat_id, _stop)
+
+
+# ---------------- restart recovery ----------------
+
+
+def restore_queues(saved: Dict[int, List[dict]]) -> int:
+    """Put queues loaded from the journal back into QUEUE; returns how many chats."""
+    for chat_id, items in saved.items():
+        extend_queue(chat_id, (Track(**item) for item in items))
+    return len(saved)
+
+
+async def resume_chat(chat_id: int) -> bool:
+    """
+    Rejoin the call of a restored chat and play its head track from the
+    start. Tracks that can't be played any more (a downloaded file that
+    is gone) are dropped; if nothing is left, the queue is cleared.
+    """
+
+    async def _resume() -> bool:
+        q = get_queue(chat_id)
+        while q:
+            track = q[0]
+            link = track.link or ""
+            if is_refreshable(track):
+                # whatever was stored has most likely expired by now
+                link = await prefetcher.ready_url(track, chat_id, force=True)
+            elif not (link.startswith(("http://", "https://")) or os.path.isfile(link)):
+                pop_an_item(chat_id)
+                continue
+            try:
+                await _play_input(
+                    chat_id, link, track.type or "Audio", track.quality,
+                    join=True, stream_type=StreamType().local_stream,
+                )
+            except Exception:
+                logger.exception("Could not rejoin the call in chat %s", chat_id)
+                break
+            warm_admins(bot, chat_id)
+            prefetcher.schedule(chat_id)
+            return True
+        clear_queue(chat_id)
+        return False
+
+    return await pipeline.run(chat_id, _resume)
+
+
+async def resume_calls(chat_ids: List[int]) -> int:
+    """Rejoin every restored chat concurrently; returns how many are playing again."""
+    results = await asyncio.gather(*(resume_chat(c) for c in chat_ids), return_exceptions=True)
+    return sum(1 for r in results if r is True)
+
+
 # --- PyTgCalls event handlers ---
+# kicked/closed/left are queued on the pipeline like every other change,
+# so they can't interleave with a skip for the same chat. They are not
+# awaited: they can fire from inside leave_group_call while a transition
+# for the chat is still running, and waiting on it would deadlock.
+
+
+def _call_gone(chat_id: int) -> None:
+    asyncio.ensure_future(pipeline.run(chat_id, _forget_call, chat_id, _calls_joined.get(chat_id, 0)))
+
+
+async def _forget_call(chat_id: int, call: int) -> None:
+    if _calls_joined.get(chat_id, 0) != call:
+        # a play queued before this event joined a new call already
+        return
+    try:
+        clear_queue(chat_id)
+        prefetcher.forget(chat_id)
+        await _drop_media(chat_id)
+    except Exception:
+        logger.exception("Error cleaning up after the call in chat %s", chat_id)
 
 
 @call_py.on_kicked()
 async def _kicked_handler(_, chat_id: int):
-    clear_queue(chat_id)
+    _call_gone(chat_id)
 
 
 @call_py.on_closed_voice_chat()
 async def _closed_voice_chat_handler(_, chat_id: int):
-    clear_queue(chat_id)
+    _call_gone(chat_id)
 
 
 @call_py.on_left()
 async def _left_handler(_, chat_id: int):
-    clear_queue(chat_id)
+    _call_gone(chat_id)
 
 
 @call_py.on_stream_end()
@@ -210,14 +444,12 @@ async def _stream_end_handler(_, u: Update):
 # ---------------- utility ----------------
 
 
-async def bash(cmd: str) -> Tuple[str, str]:
+async def bash(cmd: str, chat_id: Optional[int] = None, priority: int = BACKGROUND) -> Tuple[str, str]:
     """
     Run a shell command asynchronously and return (stdout, stderr).
+    Goes through the ffmpeg scheduler, so it shares the worker cap.
     """
-    process = await asyncio.create_subprocess_shell(
-        cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await process.communicate()
-    out = stdout.decode().strip()
-    err = stderr.decode().strip()
+    job = await ffmpeg_jobs.run(cmd, priority=priority, chat_id=chat_id)
+    out = job.stdout.decode().strip()
+    err = job.stderr.decode().strip()
     return out, err
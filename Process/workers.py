@@ -0,0 +1,272 @@
+"""
+Multi-process mode: one supervisor, WORKERS worker processes.
+
+Everything used to share one event loop on one core: Pillow renders,
+yt-dlp and every call's media path. With WORKERS > 1, `main.py` runs a
+supervisor instead of the bot:
+
+- The supervisor holds the only bot session that receives updates. It
+  parses nothing and just forwards each raw update to the worker owning
+  the update's chat (shard = chat id mod worker count) over a Unix
+  socket (Process/ipc.py frames).
+- Each worker is a full bot process (`python main.py` with WORKER_*
+  set) with its own assistants (SESSION_STRING + SESSION_STRINGS are
+  split across workers), PyTgCalls, queue journal, media / card cache
+  directories (the byte budgets are split too) and pools. Its bot
+  client sends and answers normally but doesn't receive updates itself.
+  Forwarded updates are fed into its pyrogram dispatcher, so the
+  plugins run unchanged.
+- Workers that exit are restarted with backoff. Updates for a worker
+  that is (re)connecting are buffered briefly.
+"""
+
+import asyncio
+import io
+import logging
+import os
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from Process import ipc
+
+log = logging.getLogger(__name__)
+
+WORKERS = int(os.environ.get("WORKERS") or 0)
+WORKER_SOCKET = os.environ.get("WORKER_SOCKET") or ""
+WORKER_INDEX = int(os.environ.get("WORKER_INDEX") or 0)
+WORKER_COUNT = int(os.environ.get("WORKER_COUNT") or 1)
+# updates kept per disconnected worker before the oldest are dropped
+BACKLOG = 1000
+RESTART_BACKOFF_MAX = 60.0
+
+# on-disk caches (env var of the directory, its default, env var of the byte
+# budget, its default). A DiskCache indexes, pins and evicts only what its
+# own process knows about, so each worker gets its own directory and a
+# share of the budget.
+_DISK_CACHES = (
+    ("MEDIA_CACHE_DIR", os.path.join("cache", "media"), "MEDIA_CACHE_BYTES", 2 * 1024 ** 3),
+    ("THUMB_CACHE_DIR", os.path.join("cache", "cards"), "THUMB_CACHE_BYTES", 256 * 1024 ** 2),
+)
+
+
+def is_worker() -> bool:
+    return bool(WORKER_SOCKET)
+
+
+def shard_of(chat_id: int, count: int) -> int:
+    return abs(chat_id) % count
+
+
+def chat_of(update) -> int:
+    """Chat an update belongs to; user id for chat-less updates (inline queries)."""
+    from pyrogram import utils
+
+    message = getattr(update, "message", None)
+    peer = getattr(message, "peer_id", None) or getattr(update, "peer", None)
+    if peer is not None:
+        try:
+            return utils.get_peer_id(peer)
+        except Exception:
+            pass
+    channel_id = getattr(update, "channel_id", None)
+    if channel_id:
+        return -1000000000000 - channel_id
+    chat_id = getattr(update, "chat_id", None)
+    if chat_id:
+        return -chat_id
+    return getattr(update, "user_id", None) or 0
+
+
+def _assistant_sessions() -> List[str]:
+    sessions = [os.environ.get("SESSION_STRING") or ""]
+    sessions += (os.environ.get("SESSION_STRINGS") or "").replace(",", " ").split()
+    seen, out = set(), []
+    for s in sessions:
+        if s and s not in seen:
+            seen.add(s)
+            out.append(s)
+    return out
+
+
+# ---------- supervisor ----------
+
+
+class Supervisor:
+    def __init__(self, count: int, socket_path: str):
+        sessions = _assistant_sessions()
+        if sessions and count > len(sessions):
+            log.warning("only %d assistant sessions for %d workers; running %d", len(sessions), count, len(sessions))
+            count = len(sessions)
+        self.count = max(1, count)
+        self.socket_path = socket_path
+        self.sessions = sessions
+        self.procs: Dict[int, asyncio.subprocess.Process] = {}
+        self._writers: Dict[int, asyncio.StreamWriter] = {}
+        self._backlog: Dict[int, Deque[bytes]] = {i: deque(maxlen=BACKLOG) for i in range(self.count)}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._watchers: List[asyncio.Task] = []
+        self._stopping = False
+        self.front = None  # the update-receiving bot client, set by `supervise`
+        self.forwarded = [0] * self.count
+
+    def _env(self, index: int) -> dict:
+        env = dict(os.environ)
+        mine = self.sessions[index::self.count]
+        env.update(
+            WORKER_INDEX=str(index),
+            WORKER_COUNT=str(self.count),
+            WORKER_SOCKET=self.socket_path,
+            BOT_SESSION_NAME=f"RaiChu_w{index}",
+            QUEUE_JOURNAL_DB=os.path.join("cache", f"queues-{index}.sqlite3"),
+        )
+        for dir_var, dir_default, bytes_var, bytes_default in _DISK_CACHES:
+            env[dir_var] = f"{os.environ.get(dir_var) or dir_default}-{index}"
+            env[bytes_var] = str(int(os.environ.get(bytes_var) or bytes_default) // self.count)
+        if mine:
+            env["SESSION_STRING"] = mine[0]
+            env["SESSION_STRINGS"] = " ".join(mine[1:])
+        env.pop("WORKERS", None)
+        return env
+
+    async def start(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._on_connect, path=self.socket_path)
+        for i in range(self.count):
+            self._watchers.append(asyncio.ensure_future(self._keep_running(i)))
+
+    async def _keep_running(self, index: int) -> None:
+        backoff = 1.0
+        while not self._stopping:
+            started = time.monotonic()
+            proc = await asyncio.create_subprocess_exec(sys.executable, sys.argv[0], env=self._env(index))
+            self.procs[index] = proc
+            log.info("worker %d started (pid %d)", index, proc.pid)
+            code = await proc.wait()
+            if self._stopping:
+                return
+            # a worker that ran for a while gets a fresh backoff
+            backoff = 1.0 if time.monotonic() - started > RESTART_BACKOFF_MAX else min(backoff * 2, RESTART_BACKOFF_MAX)
+            log.warning("worker %d exited with %s; restarting in %.0fs", index, code, backoff)
+            await asyncio.sleep(backoff)
+
+    async def _on_connect(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            index = await ipc.receive(reader)
+        except Exception:
+            writer.close()
+            return
+        self._writers[index] = writer
+        backlog = self._backlog[index]
+        while backlog:
+            writer.write(backlog.popleft())
+        log.info("worker %d connected", index)
+        try:
+            # nothing is sent back; this only notices the disconnect
+            await reader.read()
+        finally:
+            if self._writers.get(index) is writer:
+                del self._writers[index]
+            writer.close()
+
+    async def forward(self, client, update, users, chats) -> None:
+        """RawUpdateHandler callback on the front-end bot."""
+        index = shard_of(chat_of(update), self.count)
+        frame = ipc.pack((
+            update.write(),
+            [u.write() for u in users.values()],
+            [c.write() for c in chats.values()],
+        ))
+        writer = self._writers.get(index)
+        if writer is None or writer.is_closing():
+            self._backlog[index].append(frame)
+            return
+        writer.write(frame)
+        self.forwarded[index] += 1
+        await writer.drain()
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self.front is not None:
+            try:
+                await self.front.stop()
+            except Exception:
+                pass
+        for proc in self.procs.values():
+            if proc.returncode is None:
+                proc.terminate()
+        await asyncio.gather(*(p.wait() for p in self.procs.values()), return_exceptions=True)
+        for task in self._watchers:
+            task.cancel()
+        if self._server is not None:
+            self._server.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+# ---------- worker ----------
+
+
+def _read(data: bytes):
+    from pyrogram.raw.core import TLObject
+
+    return TLObject.read(io.BytesIO(data))
+
+
+def _start_handlers(bot) -> List[asyncio.Task]:
+    """
+    What Dispatcher.start() does for a client with updates. pyrogram skips
+    it for `no_updates` clients, so without this nothing would ever read
+    the dispatcher's updates_queue.
+    """
+    dispatcher = bot.dispatcher
+    loop = asyncio.get_running_loop()
+    tasks = []
+    for _ in range(bot.workers):
+        lock = asyncio.Lock()
+        dispatcher.locks_list.append(lock)
+        tasks.append(loop.create_task(dispatcher.handler_worker(lock)))
+    dispatcher.handler_worker_tasks.extend(tasks)
+    return tasks
+
+
+async def receive_updates(bot) -> None:
+    """Feed updates forwarded by the supervisor into this worker's dispatcher."""
+    dispatcher = bot.dispatcher
+    handlers = _start_handlers(bot)
+    reader, writer = await asyncio.open_unix_connection(WORKER_SOCKET)
+    await ipc.send(writer, WORKER_INDEX)
+    log.info("worker %d/%d receiving updates", WORKER_INDEX, WORKER_COUNT)
+    try:
+        while True:
+            raw_update, raw_users, raw_chats = await ipc.receive(reader)
+            users = {u.id: u for u in map(_read, raw_users)}
+            chats = {c.id: c for c in map(_read, raw_chats)}
+            dispatcher.updates_queue.put_nowait((_read(raw_update), users, chats))
+    except asyncio.IncompleteReadError:
+        log.error("supervisor went away; worker %d exiting", WORKER_INDEX)
+        raise SystemExit(1)
+    finally:
+        writer.close()
+        # Dispatcher.stop() doesn't either for `no_updates` clients
+        for _ in handlers:
+            dispatcher.updates_queue.put_nowait(None)
+
+
+async def supervise(count: int, socket_path: Optional[str] = None) -> Supervisor:
+    """Start the workers and a front-end bot that forwards every update to them."""
+    from pyrogram import Client
+    from pyrogram.handlers import RawUpdateHandler
+
+    from Process.main import API_HASH, API_ID, BOT_TOKEN
+
+    supervisor = Supervisor(count, socket_path or os.path.abspath(os.path.join("cache", "workers.sock")))
+    os.makedirs(os.path.dirname(supervisor.socket_path), exist_ok=True)
+    await supervisor.start()
+    front = Client("RaiChu", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
+    front.add_handler(RawUpdateHandler(supervisor.forward))
+    await front.start()
+    supervisor.front = front
+    return supervisor
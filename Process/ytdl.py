@@ -0,0 +1,282 @@
+"""
+yt-dlp helpers shared by the player plugins and the queue engine.
+
+Stream urls are resolved by a pool of long-lived worker processes, each
+holding one warm `yt_dlp.YoutubeDL`. That skips interpreter startup and
+extractor import on every /play. If yt-dlp can't be imported in-process
+we fall back to the `yt-dlp -g` CLI, run on the ffmpeg scheduler.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import multiprocessing
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from Process.Cache.ttl import SingleFlight, TTLCache
+from Process.errors import FFmpegCancelled
+from Process.ffmpeg import NOW_PLAYING, scheduler as ffmpeg_jobs
+
+log = logging.getLogger(__name__)
+
+YTDL_WORKERS = int(os.environ.get("YTDL_WORKERS") or min(4, os.cpu_count() or 1))
+# log pool stats every this many resolutions (0 disables)
+YTDL_STATS_EVERY = int(os.environ.get("YTDL_STATS_EVERY") or 50)
+# resolved urls without an expire= parameter are kept this long
+STREAM_CACHE_TTL = int(os.environ.get("STREAM_CACHE_TTL") or 1800)
+STREAM_CACHE_SIZE = int(os.environ.get("STREAM_CACHE_SIZE") or 4096)
+
+# matches both ?expire=123 and /expire/123/ forms
+_EXPIRE_RE = re.compile(r"[?&/]expire[=/](\d+)")
+_VIDEO_ID_RE = re.compile(r"(?:v=|youtu\.be/|/shorts/|/embed/|/live/)([0-9A-Za-z_-]{11})")
+
+
+def url_expiry(url: str) -> Optional[float]:
+    """Return the unix time a signed url expires at, or None if unknown."""
+    if not url:
+        return None
+    m = _EXPIRE_RE.search(url)
+    return float(m.group(1)) if m else None
+
+
+def video_id(url: str) -> Optional[str]:
+    """Extract the YouTube video id from a watch / short / youtu.be url."""
+    if not url:
+        return None
+    m = _VIDEO_ID_RE.search(url)
+    return m.group(1) if m else None
+
+
+def _format_selector(max_height: int) -> str:
+    return f"(bv*[height<={max_height}]+ba/bestaudio)"
+
+
+# ---------------- worker process side ----------------
+
+_ydl = None
+# format string -> compiled selector; YoutubeDL only compiles params["format"] in __init__
+_selectors: dict = {}
+
+
+def _init_worker() -> None:
+    """Build the YoutubeDL instance once per worker; extractors stay loaded."""
+    global _ydl
+    import yt_dlp
+
+    _ydl = yt_dlp.YoutubeDL(
+        {
+            "quiet": True,
+            "no_warnings": True,
+            "skip_download": True,
+            "noplaylist": True,
+        }
+    )
+
+
+def _extract_url(url: str, fmt: str) -> Optional[str]:
+    """Same result as the first line of `yt-dlp -g -f fmt url`."""
+    selector = _selectors.get(fmt)
+    if selector is None:
+        selector = _selectors[fmt] = _ydl.build_format_selector(fmt)
+    _ydl.params["format"] = fmt
+    _ydl.format_selector = selector
+    info = _ydl.extract_info(url, download=False)
+    if not info:
+        return None
+    if info.get("entries"):
+        info = next((e for e in info["entries"] if e), None) or {}
+    requested = info.get("requested_formats")
+    if requested:
+        return requested[0].get("url")
+    return info.get("url")
+
+
+# ---------------- CLI fallback ----------------
+
+
+async def _cli_stream_url(url: str, fmt: str, timeout: int) -> Optional[str]:
+    # on the ffmpeg scheduler: a burst of fallbacks shares its worker cap
+    try:
+        job = await asyncio.wait_for(
+            ffmpeg_jobs.run(["yt-dlp", "-g", "-f", fmt, url], priority=NOW_PLAYING),
+            timeout=timeout,
+        )
+    except (asyncio.TimeoutError, FFmpegCancelled):
+        return None
+    out = (job.stdout or b"").decode().strip()
+    # take first non-empty line
+    for line in out.splitlines():
+        line = line.strip()
+        if line:
+            return line
+    return None
+
+
+# ---------------- resolver pool ----------------
+
+
+class ResolverPool:
+    """
+    Bounded pool of warm yt-dlp worker processes.
+    At most `workers` resolutions run at once; the rest wait their turn
+    and are counted in `waiting` (the queue depth).
+    """
+
+    def __init__(self, workers: int = YTDL_WORKERS):
+        self.workers = max(1, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._in_process: Optional[bool] = None
+        self.waiting = 0
+        self.in_flight = 0
+        self.resolved = 0
+        self.failed = 0
+        self.timeouts = 0
+        self._latencies = deque(maxlen=500)
+
+    def _available(self) -> bool:
+        if self._in_process is None:
+            # only the workers import yt_dlp; here it is enough to know it's there
+            self._in_process = importlib.util.find_spec("yt_dlp") is not None
+            if not self._in_process:
+                log.warning("yt_dlp not importable, resolving through the CLI")
+        return self._in_process
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: never fork the running bot (event loop, client threads)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    async def resolve(self, url: str, fmt: str, timeout: int = 25) -> Optional[str]:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.workers)
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            result = await self._resolve(url, fmt, timeout)
+        finally:
+            self.in_flight -= 1
+            self._sem.release()
+        self._latencies.append(time.perf_counter() - started)
+        if result:
+            self.resolved += 1
+        else:
+            self.failed += 1
+        if YTDL_STATS_EVERY and (self.resolved + self.failed) % YTDL_STATS_EVERY == 0:
+            log.info("ytdl resolver: %s", self.stats())
+        return result
+
+    async def _resolve(self, url: str, fmt: str, timeout: int) -> Optional[str]:
+        if not self._available():
+            return await _cli_stream_url(url, fmt, timeout)
+        loop = asyncio.get_running_loop()
+        executor = self._pool()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(executor, _extract_url, url, fmt),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            # the stuck call would keep its worker busy while the semaphore
+            # reports a free slot; kill the pool, the next call builds a new one
+            self.timeouts += 1
+            log.warning("ytdl resolution timed out after %ss, restarting the worker pool", timeout)
+            self._shutdown_executor(executor, kill=True)
+            return None
+        except BrokenProcessPool:
+            log.warning("ytdl worker pool broke, restarting it")
+            self._shutdown_executor(executor)
+            return await _cli_stream_url(url, fmt, timeout)
+
+    def stats(self) -> dict:
+        lat = sorted(self._latencies)
+        p50 = lat[len(lat) // 2] if lat else 0.0
+        p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))] if lat else 0.0
+        return {
+            "workers": self.workers,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "resolved": self.resolved,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "p50_ms": round(p50 * 1000, 1),
+            "p95_ms": round(p95 * 1000, 1),
+        }
+
+    def _shutdown_executor(self, executor: Optional[ProcessPoolExecutor] = None, kill: bool = False) -> None:
+        """
+        Drop the pool (only if it is still `executor`, when given: a
+        concurrent failure may have replaced it already). `kill` also
+        terminates the workers, stuck calls included.
+        """
+        if self._executor is None or (executor is not None and executor is not self._executor):
+            return
+        executor, self._executor = self._executor, None
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        if kill:
+            for process in processes:
+                process.terminate()
+
+    def stop(self) -> None:
+        self._shutdown_executor()
+
+
+resolver = ResolverPool()
+
+# (video id or url, format selector) -> direct url, expiring with the signature
+stream_cache = TTLCache(maxsize=STREAM_CACHE_SIZE, ttl=STREAM_CACHE_TTL)
+_flights = SingleFlight()
+
+
+async def _resolve_and_cache(key: tuple, url: str, fmt: str, timeout: int) -> Optional[str]:
+    direct = await resolver.resolve(url, fmt, timeout=timeout)
+    if direct:
+        expires = url_expiry(direct)
+        ttl = expires - time.time() if expires else STREAM_CACHE_TTL
+        stream_cache.set(key, direct, ttl=ttl)
+    return direct
+
+
+async def get_stream_url(
+    url: str,
+    max_width: int = 1280,
+    max_height: int = 720,
+    timeout: int = 25,
+    min_ttl: float = 0.0,
+    refresh: bool = False,
+) -> Optional[str]:
+    """
+    Use yt-dlp to fetch a direct stream URL that works with AudioPiped.
+    Returns direct url string or None on failure.
+    Cached per (video id, format) until the signed url expires; cached
+    urls with less than `min_ttl` seconds left, or `refresh=True`, are
+    resolved again. Concurrent misses for one key share a single call.
+    """
+    fmt = _format_selector(max_height)
+    key = (video_id(url) or url, fmt)
+    if not refresh:
+        cached = stream_cache.get(key, min_ttl=min_ttl)
+        if cached:
+            return cached
+    try:
+        return await _flights.do(key, _resolve_and_cache, key, url, fmt, timeout)
+    except Exception as e:
+        log.exception("get_stream_url error: %s", e)
+        return None
@@ -6,7 +6,10 @@ from time import time
 
 from Process.main import bot      # IMPORTANT: bind handlers to your bot instance
 from Process.filters import command, other_filters2
-from Process.decorators import authorized_users_only
+from Process.decorators import authorized_users_only, sudo_users_only
+from Process.ytdl import resolver, stream_cache
+from Process.Cache.fileids import file_index
+from Process.ffmpeg import scheduler as ffmpeg_jobs
 from RaiChu.config import (
     ASSISTANT_NAME,
     BOT_NAME,
@@ -62,6 +65,30 @@ async def ping_pong(_, message: Message):
     await m.edit_text(f"🏓 **Pong!**\n`{delta:.2f} ms`")
 
 
+# ====================== RESOLVER STATS ======================
+@bot.on_message(command(["ytstats", f"ytstats@{BOT_USERNAME}"]) & ~filters.edited)
+@sudo_users_only
+async def resolver_stats(_, message: Message):
+    s = resolver.stats()
+    c = stream_cache.stats()
+    f = file_index.stats()
+    j = ffmpeg_jobs.stats()
+    cpu = f"{j['avg_cpu']:.2f}s" if j["avg_cpu"] is not None else "n/a"
+    await message.reply_text(
+        "🧰 **yt-dlp resolver**\n"
+        f"➤ **Workers:** `{s['workers']}`\n"
+        f"➤ **Waiting / in flight:** `{s['waiting']}` / `{s['in_flight']}`\n"
+        f"➤ **Resolved / failed / timeouts:** `{s['resolved']}` / `{s['failed']}` / `{s['timeouts']}`\n"
+        f"➤ **Latency p50 / p95:** `{s['p50_ms']} ms` / `{s['p95_ms']} ms`\n"
+        f"➤ **Url cache size / hits / misses:** `{c['size']}` / `{c['hits']}` / `{c['misses']}`\n"
+        f"➤ **File ids stored / hits / misses:** `{f['entries']}` / `{f['hits']}` / `{f['misses']}`\n\n"
+        "🎛 **ffmpeg jobs**\n"
+        f"➤ **Running / queued (of {j['workers']}):** `{j['running']}` / `{j['queued']}`\n"
+        f"➤ **Done / failed / cancelled:** `{j['completed']}` / `{j['failed']}` / `{j['cancelled']}`\n"
+        f"➤ **Avg wait / wall / cpu:** `{j['avg_wait']:.2f}s` / `{j['avg_wall']:.2f}s` / `{cpu}`"
+    )
+
+
 # ====================== START (GROUPS) ======================
 @bot.on_message(command(["start", f"start@{BOT_USERNAME}"]) & filters.group)
 async def start(_, message: Message):
@@ -4,20 +4,21 @@ import logging
 from os import remove as os_remove
 from typing import Optional
 
-from pyrogram import filters
 from pyrogram.types import (
     CallbackQuery,
+    ChatMemberUpdated,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
     Message,
 )
 
 from Process.main import bot, call_py
-from Process.Cache.admins import admins
+from Process.admins import on_member_updated, voice_admins
+from Process.callbacks import encode, router
 from Process.decorators import authorized_users_only
 from Process.filters import command, other_filters
-from Process.queues import QUEUE, clear_queue
-from Process.utils import skip_current_song, skip_item  # these should exist in repo
+from Process.queues import QUEUE
+from Process.utils import skip_current_song, skip_item, stop_stream
 from RaiChu.config import (
     BOT_USERNAME,
     GROUP_SUPPORT,
@@ -108,8 +109,8 @@ async def change_volume_safe(chat_id: int, volume: int):
 
 
 # Inline keyboard small helpers
-bttn = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Go Back", callback_data="cbmenu")]])
-bcl = InlineKeyboardMarkup([[InlineKeyboardButton("🗑 Close", callback_data="cls")]])
+bttn = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Go Back", callback_data=encode("cbmenu"))]])
+bcl = InlineKeyboardMarkup([[InlineKeyboardButton("🗑 Close", callback_data=encode("cls"))]])
 
 
 # ----------------------- reload admin list -----------------------
@@ -117,10 +118,7 @@ bcl = InlineKeyboardMarkup([[InlineKeyboardButton("🗑 Close", callback_data="c
 @authorized_users_only
 async def update_admin(_, message: Message):
     try:
-        new_admins = []
-        async for m in bot.get_chat_members(message.chat.id, filter="administrators"):
-            new_admins.append(m.user.id)
-        admins[message.chat.id] = new_admins
+        await voice_admins(bot, message.chat.id, refresh=True)
         await message.reply_text(
             "✅ Bot reloaded correctly!\n✅ Admin list updated."
         )
@@ -129,6 +127,13 @@ async def update_admin(_, message: Message):
         await message.reply_text(f"❌ Failed to reload admins: {e}")
 
 
+# keep the admin cache in step with promotions / demotions (own group so
+# other member-update handlers still run)
+@bot.on_chat_member_updated(group=-1)
+async def admin_cache_sync(_, update: ChatMemberUpdated):
+    on_member_updated(update.chat.id, update.new_chat_member)
+
+
 # ----------------------- skip command -----------------------
 @bot.on_message(command(["skip", f"skip@{BOT_USERNAME}", "vskip"]) & other_filters)
 @authorized_users_only
@@ -138,8 +143,8 @@ async def skip(_, m: Message):
     keyboard = InlineKeyboardMarkup(
         [
             [
-                InlineKeyboardButton(text="• Menu", callback_data="cbmenu"),
-                InlineKeyboardButton(text="• Close", callback_data="cls"),
+                InlineKeyboardButton(text="• Menu", callback_data=encode("cbmenu")),
+                InlineKeyboardButton(text="• Close", callback_data=encode("cls")),
             ]
         ]
     )
@@ -195,9 +200,7 @@ async def skip(_, m: Message):
 async def stop(_, m: Message):
     chat_id = m.chat.id
     try:
-        if chat_id in QUEUE:
-            await leave_group_call_safe(chat_id)
-            clear_queue(chat_id)
+        if await stop_stream(chat_id):
             await m.reply("✅ Userbot disconnected from the voice chat.")
         else:
             await m.reply("❌ Nothing is streaming.")
@@ -268,14 +271,11 @@ async def unmute(_, m: Message):
 
 
 # ----------------------- callback handlers -----------------------
-@bot.on_callback_query(filters.regex("cbpause"))
+@router.action("cbpause", admin=True, debounce=True)
 async def cbpause(_, query: CallbackQuery):
     try:
         if query.message.sender_chat:
             return await query.answer("You're an Anonymous Admin. Revert to your user account.", show_alert=True)
-        a = await _.get_chat_member(query.message.chat.id, query.from_user.id)
-        if not getattr(a, "can_manage_voice_chats", False):
-            return await query.answer("Only admins with manage voice chats permission can use this.", show_alert=True)
         chat_id = query.message.chat.id
         if chat_id in QUEUE:
             await pause_stream_safe(chat_id)
@@ -290,14 +290,11 @@ async def cbpause(_, query: CallbackQuery):
             await query.answer("An error occurred.", show_alert=True)
 
 
-@bot.on_callback_query(filters.regex("cbresume"))
+@router.action("cbresume", admin=True, debounce=True)
 async def cbresume(_, query: CallbackQuery):
     try:
         if query.message.sender_chat:
             return await query.answer("You're an Anonymous Admin. Revert to your user account.", show_alert=True)
-        a = await _.get_chat_member(query.message.chat.id, query.from_user.id)
-        if not getattr(a, "can_manage_voice_chats", False):
-            return await query.answer("Only admins with manage voice chats permission can use this.", show_alert=True)
         chat_id = query.message.chat.id
         if chat_id in QUEUE:
             await resume_stream_safe(chat_id)
@@ -312,18 +309,13 @@ async def cbresume(_, query: CallbackQuery):
             await query.answer("An error occurred.", show_alert=True)
 
 
-@bot.on_callback_query(filters.regex("cbstop"))
+@router.action("cbstop", admin=True, debounce=True)
 async def cbstop(_, query: CallbackQuery):
     try:
         if query.message.sender_chat:
             return await query.answer("You're an Anonymous Admin. Revert to your user account.", show_alert=True)
-        a = await _.get_chat_member(query.message.chat.id, query.from_user.id)
-        if not getattr(a, "can_manage_voice_chats", False):
-            return await query.answer("Only admins with manage voice chats permission can use this.", show_alert=True)
         chat_id = query.message.chat.id
-        if chat_id in QUEUE:
-            await leave_group_call_safe(chat_id)
-            clear_queue(chat_id)
+        if await stop_stream(chat_id):
             await query.edit_message_text("✅ This streaming has ended", reply_markup=bcl)
         else:
             await query.answer("❌ Nothing is currently streaming", show_alert=True)
@@ -335,14 +327,11 @@ async def cbstop(_, query: CallbackQuery):
             await query.answer("An error occurred.", show_alert=True)
 
 
-@bot.on_callback_query(filters.regex("cbmute"))
+@router.action("cbmute", admin=True, debounce=True)
 async def cbmute(_, query: CallbackQuery):
     try:
         if query.message.sender_chat:
             return await query.answer("You're an Anonymous Admin. Revert to your user account.", show_alert=True)
-        a = await _.get_chat_member(query.message.chat.id, query.from_user.id)
-        if not getattr(a, "can_manage_voice_chats", False):
-            return await query.answer("Only admins with manage voice chats permission can use this.", show_alert=True)
         chat_id = query.message.chat.id
         if chat_id in QUEUE:
             await mute_stream_safe(chat_id)
@@ -357,14 +346,11 @@ async def cbmute(_, query: CallbackQuery):
             await query.answer("An error occurred.", show_alert=True)
 
 
-@bot.on_callback_query(filters.regex("cbunmute"))
+@router.action("cbunmute", admin=True, debounce=True)
 async def cbunmute(_, query: CallbackQuery):
     try:
         if query.message.sender_chat:
             return await query.answer("You're an Anonymous Admin. Revert to your user account.", show_alert=True)
-        a = await _.get_chat_member(query.message.chat.id, query.from_user.id)
-        if not getattr(a, "can_manage_voice_chats", False):
-            return await query.answer("Only admins with manage voice chats permission can use this.", show_alert=True)
         chat_id = query.message.chat.id
         if chat_id in QUEUE:
             await unmute_stream_safe(chat_id)
@@ -406,12 +392,9 @@ async def change_volume(_, m: Message):
 
 
 # ----------------------- skip callback (UI skip) -----------------------
-@bot.on_callback_query(filters.regex("cbskip"))
+@router.action("cbskip", admin=True, debounce=True)
 async def cbskip(_, query: CallbackQuery):
     try:
-        a = await _.get_chat_member(query.message.chat.id, query.from_user.id)
-        if not getattr(a, "can_manage_voice_chats", False):
-            return await query.answer("Only admins with manage voice chats permission can use this.", show_alert=True)
         chat_id = query.message.chat.id
         queue = await skip_current_song(chat_id)
         if queue == 0:
@@ -436,7 +419,7 @@ async def cbskip(_, query: CallbackQuery):
 
                     buttons = stream_markup(user_id)
                 except Exception:
-                    buttons = [[InlineKeyboardButton("🔙 Back", callback_data="cbmenu")]]
+                    buttons = [[InlineKeyboardButton("🔙 Back", callback_data=encode("cbmenu"))]]
                 await _.send_photo(
                     chat_id,
                     photo=image,
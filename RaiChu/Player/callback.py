@@ -1,11 +1,9 @@
 # RaiChu/Player/callback.py
 import re
 import os
-import yt_dlp
 import logging
 from typing import Optional
 
-from pyrogram import filters
 from pyrogram.types import (
     CallbackQuery,
     InlineKeyboardButton,
@@ -14,6 +12,12 @@ from pyrogram.types import (
     InputMediaVideo,
 )
 from Process.main import bot
+from Process.admins import is_voice_admin
+from Process.callbacks import encode, router
+from Process.downloads import cached_download, downloads
+from Process.Cache.fileids import file_index
+from Process.Cache.media import media_cache
+from Process.errors import DownloadCancelled, DownloadLimitError
 from Process.queues import QUEUE
 from RaiChu.config import (
     ASSISTANT_NAME,
@@ -32,16 +36,23 @@ try:
         audio_markup,
     )
 except Exception:
-    menu_markup = lambda user_id, *a, **k: [[InlineKeyboardButton("🔙 Back", callback_data="cbstart")]]
-    song_download_markup = lambda vid: [[InlineKeyboardButton("🔙 Back", callback_data=f"song_back {vid}|0")]]
-    stream_markup = lambda uid, *a, **k: [[InlineKeyboardButton("🔙 Back", callback_data="cbstart")]]
-    audio_markup = lambda *a, **k: [[InlineKeyboardButton("🔙 Back", callback_data="cbstart")]]
+    menu_markup = lambda user_id, *a, **k: [[InlineKeyboardButton("🔙 Back", callback_data=encode("cbstart"))]]
+    song_download_markup = lambda vid: [[InlineKeyboardButton("🔙 Back", callback_data=encode("song_back", vid, 0))]]
+    stream_markup = lambda uid, *a, **k: [[InlineKeyboardButton("🔙 Back", callback_data=encode("cbstart"))]]
+    audio_markup = lambda *a, **k: [[InlineKeyboardButton("🔙 Back", callback_data=encode("cbstart"))]]
 
 log = logging.getLogger(__name__)
 
 
+# ---------- the one callback-query handler ----------
+@bot.on_callback_query()
+async def dispatch_callback(client, query: CallbackQuery):
+    """Every button tap (admins.py and this module) goes through the router."""
+    await router.dispatch(client, query)
+
+
 # ---------- simple start menu ----------
-@bot.on_callback_query(filters.regex(r"cbstart"))
+@router.action("cbstart")
 async def cbstart(_, query: CallbackQuery):
     await query.answer()
     text = (
@@ -51,8 +62,8 @@ async def cbstart(_, query: CallbackQuery):
     )
     markup = InlineKeyboardMarkup(
         [
-            [InlineKeyboardButton("Commands & Help ❔", callback_data="cbbasic")],
-            [InlineKeyboardButton("How to Use Me ❓", callback_data="cbhowtouse")],
+            [InlineKeyboardButton("Commands & Help ❔", callback_data=encode("cbbasic"))],
+            [InlineKeyboardButton("How to Use Me ❓", callback_data=encode("cbhowtouse"))],
             [
                 InlineKeyboardButton("Updates", url=f"https://t.me/{UPDATES_CHANNEL}"),
                 InlineKeyboardButton("Support", url=f"https://t.me/{GROUP_SUPPORT}"),
@@ -73,7 +84,7 @@ async def cbstart(_, query: CallbackQuery):
 
 
 # ---------- how to use ----------
-@bot.on_callback_query(filters.regex(r"cbhowtouse"))
+@router.action("cbhowtouse")
 async def cbguides(_, query: CallbackQuery):
     await query.answer()
     text = (
@@ -85,7 +96,7 @@ async def cbguides(_, query: CallbackQuery):
         "5) Start the video chat before playing music/video.\n\n"
         "If the userbot didn't join, try /userbotleave then /userbotjoin again."
     )
-    markup = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="cbstart")]])
+    markup = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data=encode("cbstart"))]])
     try:
         await query.edit_message_text(text, reply_markup=markup)
     except Exception:
@@ -93,7 +104,7 @@ async def cbguides(_, query: CallbackQuery):
 
 
 # ---------- basic commands list ----------
-@bot.on_callback_query(filters.regex(r"cbbasic"))
+@router.action("cbbasic")
 async def cbbasic(_, query: CallbackQuery):
     await query.answer()
     text = (
@@ -109,7 +120,7 @@ async def cbbasic(_, query: CallbackQuery):
         "• /repo - Repo link\n"
         "• /end - End play"
     )
-    markup = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Go Back", callback_data="cbstart")]])
+    markup = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Go Back", callback_data=encode("cbstart"))]])
     try:
         await query.edit_message_text(text, reply_markup=markup)
     except Exception:
@@ -117,18 +128,9 @@ async def cbbasic(_, query: CallbackQuery):
 
 
 # ---------- control panel menu ----------
-@bot.on_callback_query(filters.regex(r"cbmenu"))
+@router.action("cbmenu", admin=True)
 async def cbmenu(_, query: CallbackQuery):
     await query.answer()
-    try:
-        member = await _.get_chat_member(query.message.chat.id, query.from_user.id)
-        if not getattr(member, "can_manage_voice_chats", False):
-            return await query.answer(
-                "Only admins with manage voice chats permission can tap this button.", show_alert=True
-            )
-    except Exception:
-        return await query.answer("Could not verify permissions.", show_alert=True)
-
     chat_id = query.message.chat.id
     user_id = query.from_user.id
     buttons = menu_markup(user_id)
@@ -143,21 +145,13 @@ async def cbmenu(_, query: CallbackQuery):
 
 
 # ---------- download menu (callback) ----------
-@bot.on_callback_query(filters.regex(r"cbdown"))
-async def cbdown(_, query: CallbackQuery):
+@router.action("cbdown")
+async def cbdown(_, query: CallbackQuery, *args):
     await query.answer()
-    data = query.data or ""
-    # format: "cbdown <videoid>|<user>"
-    parts = data.split(None, 1)
-    if len(parts) < 2:
+    # format: "cbdown|<videoid>|<user>" (user optional)
+    if not args:
         return await query.answer("Invalid callback data.", show_alert=True)
-    callback_request = parts[1]
-    # some handlers expect "videoid|user"
-    try:
-        videoid, user_id = callback_request.split("|")
-    except ValueError:
-        videoid = callback_request
-        user_id = str(query.from_user.id)
+    videoid = args[0]
     buttons = song_download_markup(videoid)
     try:
         await query.edit_message_reply_markup(reply_markup=InlineKeyboardMarkup(buttons))
@@ -166,19 +160,14 @@ async def cbdown(_, query: CallbackQuery):
 
 
 # ---------- song back helper (show formats again) ----------
-@bot.on_callback_query(filters.regex(r"song_back"))
-async def songs_back_helper(_, query: CallbackQuery):
+@router.action("song_back")
+async def songs_back_helper(_, query: CallbackQuery, *args):
     await query.answer()
-    data = query.data or ""
-    parts = data.split(None, 1)
-    if len(parts) < 2:
+    # format: "song_back|<stype>|<videoid>"; the video id is the last arg
+    # in every variant that was ever sent
+    if not args:
         return await query.answer("Invalid callback data.", show_alert=True)
-    callback_request = parts[1]
-    try:
-        stype, videoid = callback_request.split("|")
-    except ValueError:
-        # fallback if only videoid present
-        videoid = callback_request.split("|")[-1]
+    videoid = args[-1]
     buttons = song_download_markup(videoid)
     try:
         await query.edit_message_reply_markup(reply_markup=InlineKeyboardMarkup(buttons))
@@ -187,19 +176,13 @@ async def songs_back_helper(_, query: CallbackQuery):
 
 
 # ---------- song formats & download helper (guarded) ----------
-@bot.on_callback_query(filters.regex(r"gets"))
-async def song_helper_cb(_, query: CallbackQuery):
+@router.action("gets", debounce=True)
+async def song_helper_cb(_, query: CallbackQuery, *args):
     await query.answer()
-    data = query.data or ""
-    parts = data.split(None, 1)
-    if len(parts) < 2:
-        return await query.answer("Invalid callback data.", show_alert=True)
-    callback_request = parts[1]
-    # expected pattern: "<stype>|<videoid>"
-    try:
-        stype, videoid = callback_request.split("|")
-    except ValueError:
+    # expected pattern: "gets|<stype>|<videoid>"
+    if len(args) != 2:
         return await query.answer("Invalid parameters.", show_alert=True)
+    stype, videoid = args
 
     # If your repo supplies a YouTube helper, use it. Otherwise show message.
     try:
@@ -208,8 +191,7 @@ async def song_helper_cb(_, query: CallbackQuery):
             formats_available, link = await YouTube.formats(videoid, True)
         else:
             # fallback: attempt to use yt_dlp to fetch formats (best-effort)
-            with yt_dlp.YoutubeDL({"quiet": True}) as ytdl:
-                info = ytdl.extract_info(f"https://www.youtube.com/watch?v={videoid}", download=False)
+            info = await downloads.extract_info(f"https://www.youtube.com/watch?v={videoid}")
             formats_available = info.get("formats", [])
             link = info.get("webpage_url", None)
     except Exception as e:
@@ -233,7 +215,7 @@ async def song_helper_cb(_, query: CallbackQuery):
                 continue
             done.add(label)
             sz = f"{round((filesize or 0) / (1024*1024), 2)} MB"
-            keyboard.append([InlineKeyboardButton(text=f"{label} — {sz}", callback_data=f"song_download audio|{fid}|{videoid}")])
+            keyboard.append([InlineKeyboardButton(text=f"{label} — {sz}", callback_data=encode("song_download", "audio", fid, videoid))])
     else:
         # video: select some common MP4 formats
         done = set()
@@ -249,30 +231,32 @@ async def song_helper_cb(_, query: CallbackQuery):
                 continue
             done.add(label)
             sz = f"{round((filesize or 0) / (1024*1024), 2)} MB"
-            keyboard.append([InlineKeyboardButton(text=f"{label} — {sz}", callback_data=f"song_download video|{fid}|{videoid}")])
+            keyboard.append([InlineKeyboardButton(text=f"{label} — {sz}", callback_data=encode("song_download", "video", fid, videoid))])
 
-    keyboard.append([InlineKeyboardButton("🔙 Back", callback_data=f"song_back {stype}|{videoid}"),
-                     InlineKeyboardButton("✖️ Close", callback_data="cls")])
+    keyboard.append([InlineKeyboardButton("🔙 Back", callback_data=encode("song_back", stype, videoid)),
+                     InlineKeyboardButton("✖️ Close", callback_data=encode("cls"))])
     try:
         await query.edit_message_reply_markup(reply_markup=InlineKeyboardMarkup(keyboard))
     except Exception:
         pass
 
 
+def _progress_editor(query: CallbackQuery):
+    async def _edit(job):
+        if job.total:
+            await query.edit_message_text(f"📥 Downloading… `{job.percent:.1f}%`\nSend /cancel to stop.")
+
+    return _edit
+
+
 # ---------- song download & send (heavier; guarded) ----------
-@bot.on_callback_query(filters.regex(r"song_download"))
-async def song_download_cb(_, query: CallbackQuery):
+@router.action("song_download", debounce=True)
+async def song_download_cb(_, query: CallbackQuery, *args):
     await query.answer()
-    data = query.data or ""
-    parts = data.split(None, 1)
-    if len(parts) < 2:
-        return await query.answer("Invalid callback data.", show_alert=True)
-    callback_request = parts[1]
-    # expected: "<stype>|<format_id>|<videoid>"
-    try:
-        stype, format_id, videoid = callback_request.split("|")
-    except ValueError:
+    # expected: "song_download|<stype>|<format_id>|<videoid>"
+    if len(args) != 3:
         return await query.answer("Invalid parameters.", show_alert=True)
+    stype, format_id, videoid = args
 
     # Busy indicator
     try:
@@ -309,26 +293,39 @@ async def song_download_cb(_, query: CallbackQuery):
             log.exception("YouTube.download error: %s", e)
             return await query.edit_message_text("Failed to download via helper.")
     else:
-        # fallback: attempt direct yt_dlp download (simple)
-        tmp_name = f"/tmp/{videoid}_{format_id}.{ 'mp4' if stype=='video' else 'mp3'}"
-        ydl_opts = {"quiet": True, "outtmpl": tmp_name}
+        # fallback: direct yt_dlp download through the media cache
+        digest = media_cache.key(videoid, format_id, stype)
+        send = query.message.reply_video if stype == "video" else query.message.reply_audio
+        known = file_index.get(videoid, format_id, stype)
+        if known:
+            try:
+                await send(known[0])
+                return await query.edit_message_text("✅ Downloaded and sent.")
+            except Exception:
+                file_index.drop(videoid, format_id, stype)
+        ydl_opts = {"quiet": True}
         if stype == "audio":
             ydl_opts.update({"format": f"{format_id}/bestaudio", "postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": "mp3"}]})
         else:
             ydl_opts.update({"format": f"{format_id}/best"})
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ytdl:
-                ytdl.extract_info(f"https://www.youtube.com/watch?v={videoid}", download=True)
-            # send file
-            if stype == "video":
-                await query.message.reply_video(tmp_name)
-            else:
-                await query.message.reply_audio(tmp_name)
-            try:
-                os.remove(tmp_name)
-            except:
-                pass
+            path = await cached_download(
+                digest,
+                f"https://www.youtube.com/watch?v={videoid}",
+                ydl_opts,
+                ".%(ext)s",
+                user_id=query.from_user.id,
+                on_progress=_progress_editor(query),
+            )
+            # send file (stays in the media cache)
+            with media_cache.pinned(digest):
+                sent = await send(path)
+            file_index.remember(videoid, format_id, stype, sent and (sent.video if stype == "video" else sent.audio))
             return await query.edit_message_text("✅ Downloaded and sent.")
+        except DownloadLimitError:
+            return await query.edit_message_text("⏳ You already have a download running. Wait for it or send /cancel.")
+        except DownloadCancelled:
+            return await query.edit_message_text("🚫 Download cancelled.")
         except Exception as e:
             log.exception("yt_dlp download error: %s", e)
             try:
@@ -339,16 +336,9 @@ async def song_download_cb(_, query: CallbackQuery):
 
 
 # ---------- home/control (stream) ----------
-@bot.on_callback_query(filters.regex(r"cbhome"))
+@router.action("cbhome", admin=True)
 async def cbhome(_, query: CallbackQuery):
     await query.answer()
-    try:
-        member = await _.get_chat_member(query.message.chat.id, query.from_user.id)
-        if not getattr(member, "can_manage_voice_chats", False):
-            return await query.answer("Only admins with manage voice chats permission can tap.", show_alert=True)
-    except Exception:
-        return await query.answer("Permission check failed.", show_alert=True)
-
     chat_id = query.message.chat.id
     user_id = query.from_user.id
     # dlurl may be undefined; guard it
@@ -368,16 +358,20 @@ async def cbhome(_, query: CallbackQuery):
 
 
 # ---------- close message ----------
-@bot.on_callback_query(filters.regex(r"cls"))
-async def close(_, query: CallbackQuery):
+@router.action("cls")
+async def close(client, query: CallbackQuery):
+    # anyone may close in a private chat; in groups only voice-chat admins,
+    # but a failed lookup should not leave the message stuck
+    chat = query.message.chat
+    if chat.id < 0 and query.from_user:
+        try:
+            allowed = await is_voice_admin(client, chat.id, query.from_user.id)
+        except Exception:
+            log.debug("permission check failed for close in %s", chat.id, exc_info=True)
+            allowed = True
+        if not allowed:
+            return await query.answer("Only admins with manage voice chats permission can close this.", show_alert=True)
     await query.answer()
-    try:
-        member = await _.get_chat_member(query.message.chat.id, query.from_user.id)
-        if not getattr(member, "can_manage_voice_chats", False):
-            return await query.answer("Only admins with manage voice chats permission can use this.", show_alert=True)
-    except Exception:
-        # still attempt to delete
-        pass
     try:
         await query.message.delete()
     except Exception:
@@ -1,7 +1,6 @@
 # RaiChu/Player/inline.py
 
 import logging
-from youtubesearchpython import VideosSearch
 from pyrogram.types import (
     InlineQuery,
     InlineQueryResultArticle,
@@ -9,28 +8,23 @@ from pyrogram.types import (
 )
 from pyrogram import filters
 from Process.main import bot   # IMPORTANT: use bot instance
+from Process.search import search_one
 
 log = logging.getLogger(__name__)
 
 
 # ---------- YouTube search helper ----------
-def ytsearch(query: str):
-    try:
-        search = VideosSearch(query, limit=1).result()
-        if not search["result"]:
-            return None
-
-        data = search["result"][0]
-        return {
-            "title": data.get("title"),
-            "url": data.get("link"),
-            "duration": data.get("duration") or "Unknown",
-            "thumbnail": f"https://i.ytimg.com/vi/{data['id']}/hqdefault.jpg",
-            "videoid": data["id"],
-        }
-    except Exception as e:
-        log.exception("ytsearch error: %s", e)
+async def ytsearch(query: str):
+    data = await search_one(query)
+    if not data:
         return None
+    return {
+        "title": data["title"],
+        "url": data["link"],
+        "duration": data["duration"],
+        "thumbnail": data["thumbnail"],
+        "videoid": data["id"],
+    }
 
 
 # ---------- INLINE HANDLER ----------
@@ -89,7 +83,7 @@ async def inline_handler(client, query: InlineQuery):
         )
 
     # ---------- 2) User searched something: YouTube Search ----------
-    result = ytsearch(search_text)
+    result = await ytsearch(search_text)
 
     if not result:
         return await client.answer_inline_query(
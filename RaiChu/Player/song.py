@@ -3,59 +3,85 @@ from __future__ import unicode_literals
 
 import os
 import asyncio
+from typing import Optional
 import aiofiles
-import aiohttp
-import yt_dlp
 from pyrogram import filters
 from pyrogram.types import Message
 
 from Process.main import bot
 from RaiChu.config import BOT_USERNAME as BN
 from Process.filters import command
+from Process.search import duration_seconds, search_one
+from Process.downloads import cached_download, downloads
+from Process.Cache.fileids import file_index
+from Process.Cache.media import media_cache
+from Process.decorators import humanbytes
+from Process.errors import DownloadCancelled, DownloadLimitError
+from Process.http import client
 
 TMP_DIR = "/tmp/raichu_songs"
 os.makedirs(TMP_DIR, exist_ok=True)
 
+AUDIO_FORMAT = "bestaudio[ext=m4a]/bestaudio/best"
+VIDEO_FORMAT = "bestvideo+bestaudio/best"
+
 
 # ---------------- YT SEARCH (safe) ----------------
 async def yt_search(query: str):
-    try:
-        ydl_opts = {
-            "quiet": True,
-            "skip_download": True,
-            "extract_flat": "in_playlist",
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(f"ytsearch:{query}", download=False)
-            if not info or not info.get("entries"):
-                return None
-            entry = info["entries"][0]
-            return {
-                "title": entry.get("title"),
-                "url": f"https://www.youtube.com/watch?v={entry.get('id')}",
-                "duration": entry.get("duration") or 0,
-                "thumbnail": entry.get("thumbnail"),
-            }
-    except Exception:
+    entry = await search_one(query)
+    if not entry:
         return None
+    return {
+        "id": entry["id"],
+        "title": entry["title"],
+        "url": entry["link"],
+        "duration": duration_seconds(entry["duration"]),
+        "thumbnail": entry["thumbnail"],
+    }
 
 
 # ---------------- FILE DOWNLOAD ----------------
 async def download_from_url(url: str, filename: str):
     try:
         path = os.path.join(TMP_DIR, filename)
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as r:
-                if r.status != 200:
-                    return None
-                f = await aiofiles.open(path, "wb")
-                await f.write(await r.read())
-                await f.close()
+        data = await client.get_bytes(url)
+        async with aiofiles.open(path, "wb") as f:
+            await f.write(data)
         return path
     except:
         return None
 
 
+# ---------------- DOWNLOAD PROGRESS ----------------
+def progress_editor(status: Message, label: str):
+    """Build an on_progress callback that edits `status` with the job's progress."""
+
+    async def _edit(job):
+        if not job.total:
+            return
+        await status.edit(
+            f"{label}\n"
+            f"`{job.percent:.1f}%` of `{humanbytes(job.total)}`"
+            f" at `{humanbytes(job.speed or 0)}/s`, ETA `{job.eta}s`\n"
+            "Send /cancel to stop."
+        )
+
+    return _edit
+
+
+async def run_download(status: Message, user_id: int, url: str, ydl_opts: dict, label: str, digest: str, ext: str) -> Optional[str]:
+    """Download through the media cache; reports failures on `status` and returns None."""
+    try:
+        return await cached_download(digest, url, ydl_opts, ext, user_id=user_id, on_progress=progress_editor(status, label))
+    except DownloadLimitError:
+        await status.edit("⏳ You already have a download running. Wait for it or send /cancel.")
+    except DownloadCancelled:
+        await status.edit("🚫 Download cancelled.")
+    except Exception as e:
+        await status.edit(f"❌ Error downloading\n`{e}`")
+    return None
+
+
 # ---------------- /song handler ----------------
 @bot.on_message(command(["song", f"song@{BN}"]) & ~filters.edited)
 async def song_cmd(_, m: Message):
@@ -73,22 +99,28 @@ async def song_cmd(_, m: Message):
     url = data["url"]
     thumbnail = data["thumbnail"]
     duration = data["duration"]
+    vid = data["id"] or url
+    digest = media_cache.key(vid, AUDIO_FORMAT, "audio")
+
+    # sent before: re-send by file_id, no download and no upload
+    known = file_index.get(vid, AUDIO_FORMAT, "audio")
+    if known:
+        try:
+            await m.reply_audio(known[0], caption=f"🎧 {title}", title=title, duration=duration)
+            return await status.delete()
+        except Exception:
+            file_index.drop(vid, AUDIO_FORMAT, "audio")
 
     await status.edit("📥 Downloading audio…")
 
     # download best audio
-    audio_path = os.path.join(TMP_DIR, f"{title}.m4a")
-
-    try:
-        ydl_opts = {
-            "format": "bestaudio[ext=m4a]/bestaudio/best",
-            "outtmpl": audio_path,
-            "quiet": True
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-    except Exception as e:
-        return await status.edit(f"❌ Error downloading audio\n`{e}`")
+    ydl_opts = {
+        "format": AUDIO_FORMAT,
+        "quiet": True
+    }
+    audio_path = await run_download(status, m.from_user.id, url, ydl_opts, "📥 Downloading audio…", digest, ".m4a")
+    if not audio_path:
+        return
 
     # thumbnail
     thumb_path = None
@@ -98,21 +130,22 @@ async def song_cmd(_, m: Message):
     await status.edit("📤 Uploading…")
 
     try:
-        await m.reply_audio(
-            audio_path,
-            caption=f"🎧 {title}",
-            title=title,
-            duration=duration,
-            thumb=thumb_path if thumb_path else None,
-        )
+        with media_cache.pinned(digest):
+            sent = await m.reply_audio(
+                audio_path,
+                caption=f"🎧 {title}",
+                title=title,
+                duration=duration,
+                thumb=thumb_path if thumb_path else None,
+            )
     except Exception as e:
         await status.edit(f"❌ Upload failed\n`{e}`")
     else:
+        file_index.remember(vid, AUDIO_FORMAT, "audio", sent and sent.audio)
         await status.delete()
 
-    # cleanup
+    # cleanup (the audio itself stays in the media cache)
     try:
-        os.remove(audio_path)
         if thumb_path:
             os.remove(thumb_path)
     except:
@@ -136,23 +169,30 @@ async def vsong_cmd(_, m: Message):
     url = data["url"]
     thumbnail = data["thumbnail"]
     duration = data["duration"]
+    vid = data["id"] or url
+    digest = media_cache.key(vid, VIDEO_FORMAT, "video")
+
+    # sent before: re-send by file_id, no download and no upload
+    known = file_index.get(vid, VIDEO_FORMAT, "video")
+    if known:
+        try:
+            await m.reply_video(known[0], caption=f"🎬 {title}", duration=duration)
+            return await status.delete()
+        except Exception:
+            file_index.drop(vid, VIDEO_FORMAT, "video")
 
     await status.edit("📥 Downloading video…")
 
-    video_path = os.path.join(TMP_DIR, f"{title}.mp4")
     thumb_path = None
 
-    try:
-        ydl_opts = {
-            "format": "bestvideo+bestaudio/best",
-            "outtmpl": video_path,
-            "merge_output_format": "mp4",
-            "quiet": True,
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-    except Exception as e:
-        return await status.edit(f"❌ Error downloading video\n`{e}`")
+    ydl_opts = {
+        "format": VIDEO_FORMAT,
+        "merge_output_format": "mp4",
+        "quiet": True,
+    }
+    video_path = await run_download(status, m.from_user.id, url, ydl_opts, "📥 Downloading video…", digest, ".mp4")
+    if not video_path:
+        return
 
     if thumbnail:
         thumb_path = await download_from_url(thumbnail, f"{title}.jpg")
@@ -160,26 +200,39 @@ async def vsong_cmd(_, m: Message):
     await status.edit("📤 Uploading…")
 
     try:
-        await m.reply_video(
-            video_path,
-            caption=f"🎬 {title}",
-            duration=duration,
-            thumb=thumb_path if thumb_path else None,
-        )
+        with media_cache.pinned(digest):
+            sent = await m.reply_video(
+                video_path,
+                caption=f"🎬 {title}",
+                duration=duration,
+                thumb=thumb_path if thumb_path else None,
+            )
     except Exception as e:
         await status.edit(f"❌ Upload failed\n`{e}`")
     else:
+        file_index.remember(vid, VIDEO_FORMAT, "video", sent and sent.video)
         await status.delete()
 
-    # cleanup
+    # cleanup (the video itself stays in the media cache)
     try:
-        os.remove(video_path)
         if thumb_path:
             os.remove(thumb_path)
     except:
         pass
 
 
+# ---------------- /cancel handler ----------------
+@bot.on_message(command(["cancel", f"cancel@{BN}"]) & ~filters.edited)
+async def cancel_cmd(_, m: Message):
+    if not m.from_user:
+        return
+    n = downloads.cancel_user(m.from_user.id)
+    if n:
+        await m.reply_text(f"🚫 Cancelling {n} download(s)…")
+    else:
+        await m.reply_text("❌ You have no running downloads.")
+
+
 # ---------------- /lyric handler (fixed API) ----------------
 @bot.on_message(command(["lyric", f"lyric@{BN}"]) & ~filters.edited)
 async def lyric_cmd(_, m: Message):
@@ -191,10 +244,7 @@ async def lyric_cmd(_, m: Message):
 
     try:
         # working lyrics API
-        url = f"https://some-random-api.com/lyrics?title={query}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as r:
-                data = await r.json()
+        data = await client.get_json("https://some-random-api.com/lyrics", params={"title": query})
 
         lyrics = data.get("lyrics")
         if not lyrics:
@@ -3,24 +3,24 @@
 import os
 import asyncio
 import speedtest
-import aiohttp
 from PIL import Image
 from pyrogram import filters
 from pyrogram.types import Message
 
 from Process.main import bot as app
+from Process.errors import HttpError
+from Process.http import client
 from RaiChu.config import SUDO_USERS as SUDOERS
 
 
 # ---------- Async file downloader ----------
 async def download_file(url: str, path: str):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            if resp.status != 200:
-                return None
-            data = await resp.read()
-            with open(path, "wb") as f:
-                f.write(data)
+    try:
+        data = await client.get_bytes(url)
+    except HttpError:
+        return None
+    with open(path, "wb") as f:
+        f.write(data)
     return path
 
 
@@ -5,7 +5,7 @@ from pyrogram import Client, filters
 from pyrogram.errors import UserAlreadyParticipant, FloodWait
 from Process.filters import command
 from Process.decorators import authorized_users_only, sudo_users_only, errors
-from Process.main import aman as USER   # correct import
+from Process.main import assistants, call_py
 from RaiChu.config import BOT_USERNAME, SUDO_USERS
 
 
@@ -28,7 +28,8 @@ async def userbot_join_group(bot, message):
             "Give permission and try again."
         )
 
-    # Step 2: check assistant account
+    # Step 2: check assistant account (the one the pool serves this chat with)
+    USER = call_py.client_for(chat_id)
     try:
         assistant = await USER.get_me()
     except Exception:
@@ -65,6 +66,7 @@ async def userbot_leave_group(bot, message):
     chat_id = message.chat.id
 
     try:
+        USER = call_py.client_for(chat_id, reserve=False)
         await USER.send_message(chat_id, "👋 Assistant leaving chat.")
         await USER.leave_chat(chat_id)
     except Exception:
@@ -86,20 +88,21 @@ async def leave_all_groups(bot, message):
     failed = 0
     status_msg = await message.reply("🔄 Leaving all groups...")
 
-    async for dialog in USER.iter_dialogs():
-        try:
-            await USER.leave_chat(dialog.chat.id)
-            left += 1
-        except Exception:
-            failed += 1
-
-        await status_msg.edit(
-            f"🚪 Leaving groups...\n\n"
-            f"**Left:** {left}\n"
-            f"**Failed:** {failed}"
-        )
-
-        await asyncio.sleep(0.7)
+    for USER in assistants:
+        async for dialog in USER.iter_dialogs():
+            try:
+                await USER.leave_chat(dialog.chat.id)
+                left += 1
+            except Exception:
+                failed += 1
+
+            await status_msg.edit(
+                f"🚪 Leaving groups...\n\n"
+                f"**Left:** {left}\n"
+                f"**Failed:** {failed}"
+            )
+
+            await asyncio.sleep(0.7)
 
     await message.reply(
         f"🏁 **Finished**\n\n"
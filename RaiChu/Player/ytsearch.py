@@ -3,8 +3,9 @@
 import logging
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardButton, InlineKeyboardMarkup
-from youtube_search import YoutubeSearch
+from Process.callbacks import encode
 from Process.filters import command, other_filters
+from Process.search import search
 from RaiChu.config import BOT_USERNAME
 
 logging.basicConfig(level=logging.INFO)
@@ -16,7 +17,7 @@ async def ytsearch_handler(_, message: Message):
 
     # Close button
     keyboard = InlineKeyboardMarkup(
-        [[InlineKeyboardButton("🗑 Close", callback_data="cls")]]
+        [[InlineKeyboardButton("🗑 Close", callback_data=encode("cls"))]]
     )
 
     # Check argument
@@ -28,7 +29,7 @@ async def ytsearch_handler(_, message: Message):
 
     try:
         # Perform search
-        results = YoutubeSearch(query, max_results=5).to_dict()
+        results = await search(query, limit=5)
 
         if len(results) == 0:
             return await status.edit("❌ No results found.", reply_markup=keyboard)
@@ -39,7 +40,7 @@ async def ytsearch_handler(_, message: Message):
             duration = item.get("duration", "Unknown")
             views = item.get("views", "Unknown")
             channel = item.get("channel", "Unknown")
-            link = "https://www.youtube.com" + item.get("url_suffix", "")
+            link = item.get("link", "")
 
             text += (
                 f"🎵 **{title}**\n"
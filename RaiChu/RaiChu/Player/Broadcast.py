@@ -1,16 +1,29 @@
 # RaiChu/Player/Broadcast.py
-import asyncio
 import logging
 from pyrogram import filters
 from pyrogram.types import Message
-from pyrogram.errors import FloodWait, ChatWriteForbidden, PeerIdInvalid, UserDeactivatedBan, RPCError
 
 from Process.main import bot as Ufo   # your bot client
+from Process.broadcast import Broadcast, running
 from RaiChu.config import SUDO_USERS
 
 log = logging.getLogger(__name__)
 
-# Usage: reply to a message with /gcast
+
+def _progress_text(b: Broadcast) -> str:
+    s = b.stats()
+    text = (
+        f"🔁 Broadcasting... Sent: {s['sent']}  Failed: {s['failed']}  Scanned: {s['scanned']}\n"
+        f"⚡ {s['msgs_per_sec']} msg/s (limit {s['rate']}/s)"
+    )
+    if s["paused"]:
+        text += f"\n⚠ FloodWait — paused for {s['paused']}s"
+    return text
+
+
+# Usage: reply to a message with /gcast, /gcast cancel stops it.
+# Re-running /gcast on the same message resumes an interrupted broadcast
+# (across restarts only with a persistent STATE_URL).
 @Ufo.on_message(filters.command("gcast") & filters.private)
 async def broadcast(_, message: Message):
     # basic permission check
@@ -22,70 +35,57 @@ async def broadcast(_, message: Message):
     if sender_id not in SUDO_USERS:
         return await message.reply_text("🚫 You are not authorized to use this command.")
 
+    if len(message.command) > 1 and message.command[1].lower() == "cancel":
+        for b in list(running.values()):
+            b.cancel()
+        return await message.reply_text(f"🛑 Cancelling {len(running)} broadcast(s); run /gcast again on the same message to resume.")
+
     # must reply to a message to broadcast
     if not message.reply_to_message:
         return await message.reply_text("Reply to a message with /gcast to broadcast it.")
 
-    text_to_send = message.reply_to_message.text or message.reply_to_message.caption or ""
-    media = None
-    # if original message had media, forward instead of send to preserve content
-    if message.reply_to_message.media:
-        media = message.reply_to_message
-
-    status = await message.reply_text("🔁 Starting broadcast... Scanning dialogs.")
-    sent = 0
-    failed = 0
-    total = 0
+    source = message.reply_to_message
+    text_to_send = source.text or source.caption or ""
+    key = f"{message.chat.id}:{source.message_id}"
+    if key in running:
+        return await message.reply_text("⏳ This message is already being broadcast.")
 
-    # iterate dialogs (dialogs include users, groups, channels)
-    async for dialog in Ufo.iter_dialogs():
-        total += 1
-        chat_id = dialog.chat.id
+    async def send(chat_id: int):
+        if source.media:
+            # forward preserves media and caption
+            return await Ufo.forward_messages(chat_id, message.chat.id, source.message_id)
+        # send text; disable preview to reduce size
+        return await Ufo.send_message(chat_id, text_to_send, disable_web_page_preview=True)
 
-        # skip bots and broadcast to channels where bot has no permission
-        try:
-            # skip if it's a service/chat you shouldn't message
-            if dialog.chat.is_bot:
-                log.debug("Skipping bot chat %s", chat_id)
+    async def targets():
+        # dialogs include users, groups, channels; bots are skipped
+        async for dialog in Ufo.iter_dialogs():
+            if getattr(dialog.chat, "is_bot", False):
                 continue
-        except Exception:
-            pass
+            yield dialog.chat.id
 
-        # polite short delay to reduce flood risk
-        await asyncio.sleep(0.7)
+    async def progress(b: Broadcast):
+        await status.edit(_progress_text(b))
 
-        try:
-            if media:
-                # forward preserves media and caption
-                await Ufo.forward_messages(chat_id, message.chat.id, message.reply_to_message.message_id)
-            else:
-                # send text; disable preview to reduce size
-                await Ufo.send_message(chat_id, text_to_send, disable_web_page_preview=True)
-            sent += 1
-            # update progress occasionally (not every loop)
-            if sent % 10 == 0:
-                await status.edit(f"🔁 Broadcasting... Sent: {sent}  Failed: {failed}  Scanned: {total}")
-        except FloodWait as e:
-            wait = int(e.x) if hasattr(e, "x") else 10
-            log.warning("FloodWait %s seconds, sleeping...", wait)
-            await status.edit(f"⚠ FloodWait {wait}s — sleeping...")
-            await asyncio.sleep(wait + 1)
-            # after wait, retry sending once
-            try:
-                if media:
-                    await Ufo.forward_messages(chat_id, message.chat.id, message.reply_to_message.message_id)
-                else:
-                    await Ufo.send_message(chat_id, text_to_send, disable_web_page_preview=True)
-                sent += 1
-            except Exception:
-                failed += 1
-        except (ChatWriteForbidden, PeerIdInvalid, UserDeactivatedBan, RPCError) as e:
-            log.exception("Failed to send to %s: %s", chat_id, e)
-            failed += 1
-        except Exception as e:
-            log.exception("Unexpected error while sending to %s: %s", chat_id, e)
-            failed += 1
+    job = await Broadcast(key, send).load()
+    status = await message.reply_text(
+        (f"🔁 Resuming broadcast ({len(job.done)} chats already sent to)..." if job.resumed
+         else "🔁 Starting broadcast... Scanning dialogs.")
+        + ("" if job.persistent else "\nℹ Progress is kept in memory only: a restart can't resume this broadcast.")
+    )
+    try:
+        await job.run(targets(), on_progress=progress)
+    except Exception as e:
+        log.exception("broadcast %s stopped", key)
+        return await status.edit(f"❌ Broadcast stopped: {e}\nRun /gcast on the same message to resume.\n\n{_progress_text(job)}")
 
+    s = job.stats()
+    state = "finished" if job.finished else "cancelled"
     # final status
-    await status.edit(f"✅ Broadcast finished.\n\nTotal scanned: {total}\nSent: {sent}\nFailed: {failed}")
-    await message.reply_text(f"✅ Gcast finished. Sent: {sent}, Failed: {failed}")
+    await status.edit(
+        f"✅ Broadcast {state}.\n\nTotal scanned: {s['scanned']}\nSent: {s['sent']}\nFailed: {s['failed']}\n"
+        f"Already sent before resume: {s['skipped']}\nFloodWaits: {s['flood_waits']}\n"
+        f"Throughput: {s['msgs_per_sec']} msg/s in {s['elapsed']}s"
+        + ("\n\nRun /gcast on the same message to retry the failed chats." if s["failed"] else "")
+    )
+    await message.reply_text(f"✅ Gcast {state}. Sent: {s['sent']}, Failed: {s['failed']}, {s['msgs_per_sec']} msg/s")
@@ -60,6 +60,14 @@ except Exception:
 DURATION_LIMIT = int(os.getenv("DURATION_LIMIT", "60"))  # minutes
 
 
+# -------------------- PLAYBACK --------------------
+
+# how many upcoming queue items keep a freshly resolved stream url
+PREFETCH_DEPTH = int(os.getenv("PREFETCH_DEPTH", "2"))
+# re-resolve a signed url this many seconds before it expires
+PREFETCH_MARGIN = int(os.getenv("PREFETCH_MARGIN", "1800"))
+
+
 # -------------------- STATIC IMAGE URLS --------------------
 
 ALIVE_IMG = os.getenv(
@@ -1,3 +1,4 @@
+
 # Joker/converter.py
 """
 Audio converter for JOKER_MUSIC
@@ -5,64 +6,222 @@ Converts any supported audio input into:
  - raw 16-bit little endian
  - mono
  - 48000 Hz
+
+Two modes (CONVERT_MODE):
+ - "stream" (default where named pipes exist): ffmpeg writes into a FIFO
+   that the call reads from. Playback starts as soon as the first chunk
+   is decoded, nothing is kept on disk, and the pipe's kernel buffer is
+   the backpressure — ffmpeg blocks while the reader is behind.
+ - "file": transcode the whole input to raw_files/<name>.raw first (the
+   old behaviour, ~100 MB per hour of audio).
 """
 
 import asyncio
+import hashlib
+import logging
 import os
+import uuid
 from os import path
-from Process.errors import FFmpegReturnCodeError
+from typing import Dict, List, Optional
+
+from Process.errors import FFmpegCancelled, FFmpegReturnCodeError
+from Process.ffmpeg import NOW_PLAYING, scheduler
+
+log = logging.getLogger(__name__)
+
+OUTPUT_DIR = "raw_files"
+CONVERT_MODE = os.environ.get("CONVERT_MODE") or ("stream" if hasattr(os, "mkfifo") else "file")
+# how long a fresh ffmpeg gets to fail on a bad input before we hand the pipe out
+STREAM_STARTUP_CHECK = 0.25
+
+
+def _stem(file_path: str) -> str:
+    """
+    Name for the output of `file_path`. A URL's basename carries its whole
+    query string (signed googlevideo links run to hundreds of characters,
+    past the filesystem's name limit), so URLs get a short hash instead.
+    """
+    if "://" in file_path:
+        return hashlib.sha1(file_path.encode()).hexdigest()[:16]
+    return path.splitext(path.basename(file_path))[0]
+
+
+def _ffmpeg_args(file_path: str, out_file: str) -> List[str]:
+    return [
+        "ffmpeg", "-y", "-nostdin", "-nostats", "-loglevel", "error",
+        "-i", file_path,
+        "-f", "s16le",
+        "-ac", "1",
+        "-ar", "48000",
+        "-acodec", "pcm_s16le",
+        out_file,
+    ]
+
+
+# ---------- streaming mode ----------
+
+
+class PipeStream:
+    """One ffmpeg process writing raw PCM into a named pipe."""
+
+    def __init__(self, file_path: str, fifo: str, chat_id: Optional[int] = None, priority: int = NOW_PLAYING):
+        self.file_path = file_path
+        self.path = fifo
+        self.chat_id = chat_id
+        self.priority = priority
+        self.cmd = " ".join(_ffmpeg_args(file_path, fifo))
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._stderr = b""
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def start(self) -> "PipeStream":
+        try:
+            os.mkfifo(self.path)
+            self.process = await scheduler.spawn(
+                _ffmpeg_args(self.file_path, self.path),
+                priority=self.priority,
+                chat_id=self.chat_id,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FFmpegCancelled:
+            self._unlink()
+            raise
+        except Exception as e:
+            self._unlink()
+            raise FFmpegReturnCodeError(
+                returncode=-1,
+                cmd=self.cmd,
+                stderr=str(e),
+                message="Unexpected FFmpeg conversion failure"
+            )
+        self._watcher = asyncio.ensure_future(self._watch())
+        # ffmpeg opens (and probes) the input before it blocks on the pipe,
+        # so a missing or broken input shows up right away
+        done, _ = await asyncio.wait({self._watcher}, timeout=STREAM_STARTUP_CHECK)
+        if done and self.process.returncode:
+            raise FFmpegReturnCodeError(
+                returncode=self.process.returncode,
+                cmd=self.cmd,
+                stderr=self._stderr.decode(errors="ignore"),
+                message=f"FFmpeg exited with code {self.process.returncode}"
+            )
+        return self
+
+    async def _watch(self) -> None:
+        try:
+            self._stderr = await self.process.stderr.read()
+            code = await self.process.wait()
+            if code not in (0, -9, -15):
+                log.warning("ffmpeg stream of %s exited with %s: %s",
+                            self.file_path, code, self._stderr.decode(errors="ignore")[-500:])
+        finally:
+            _streams.pop(self.path, None)
+            self._unlink()
+
+    def _unlink(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def close(self) -> None:
+        """Stop ffmpeg (e.g. on skip / stop) and remove the pipe."""
+        if self.running:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+            await self.process.wait()
+        if self._watcher is not None and not self._watcher.done():
+            # don't wait for stderr EOF, a killed ffmpeg's children may hold it
+            self._watcher.cancel()
+        _streams.pop(self.path, None)
+        self._unlink()
+
+
+# fifo path -> live stream
+_streams: Dict[str, PipeStream] = {}
+
 
+async def open_stream(file_path: str, chat_id: Optional[int] = None, priority: int = NOW_PLAYING) -> PipeStream:
+    """Start converting `file_path` into a fresh named pipe under raw_files/."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    fifo = path.join(OUTPUT_DIR, f"{_stem(file_path)}.{uuid.uuid4().hex[:8]}.fifo")
+    stream = await PipeStream(file_path, fifo, chat_id, priority).start()
+    _streams[fifo] = stream
+    return stream
 
-async def convert(file_path: str) -> str:
+
+async def release(raw_path: str) -> None:
+    """Stop the stream behind a path returned by `convert` (no-op for .raw files)."""
+    stream = _streams.pop(raw_path, None)
+    if stream is not None:
+        await stream.close()
+
+
+async def close_all() -> None:
+    await asyncio.gather(*(s.close() for s in list(_streams.values())), return_exceptions=True)
+    _streams.clear()
+
+
+# ---------- file mode ----------
+
+
+async def convert(
+    file_path: str,
+    mode: Optional[str] = None,
+    chat_id: Optional[int] = None,
+    priority: int = NOW_PLAYING,
+) -> str:
     """
     Convert input file to raw audio format for PyTgCalls.
-    Returns output filepath (inside raw_files folder).
+    Returns output filepath (inside raw_files folder): a named pipe in
+    stream mode (hand it back to `release` when playback ends), a .raw
+    file otherwise. Runs on the ffmpeg scheduler; pass the chat so a skip
+    can cancel it, and PREFETCH priority for tracks that aren't up yet.
     """
+    if (mode or CONVERT_MODE) == "stream":
+        return (await open_stream(file_path, chat_id, priority)).path
 
     # Ensure output directory exists
-    output_dir = "raw_files"
-    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
 
     # Generate output filename
-    base = path.basename(file_path)
-    name, _ = path.splitext(base)
-    out_file = path.join(output_dir, f"{name}.raw")
+    out_file = path.join(OUTPUT_DIR, f"{_stem(file_path)}.raw")
 
     # If raw already exists → skip conversion
     if path.isfile(out_file):
         return out_file
 
-    # Build ffmpeg command safely
-    cmd = (
-        f'ffmpeg -y -i "{file_path}" '
-        "-f s16le "
-        "-ac 1 "
-        "-ar 48000 "
-        "-acodec pcm_s16le "
-        f'"{out_file}"'
-    )
+    args = _ffmpeg_args(file_path, out_file)
+    cmd = " ".join(args)
 
     try:
-        process = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-
-        stdout, stderr = await process.communicate()
-        return_code = process.returncode
+        job = await scheduler.run(args, priority=priority, chat_id=chat_id)
+        return_code = job.returncode
 
         if return_code != 0:
             raise FFmpegReturnCodeError(
                 returncode=return_code,
                 cmd=cmd,
-                stderr=stderr.decode(errors="ignore"),
+                stderr=job.stderr.decode(errors="ignore"),
                 message=f"FFmpeg exited with code {return_code}"
             )
 
         return out_file
 
-    except FFmpegReturnCodeError:
+    except (FFmpegReturnCodeError, FFmpegCancelled):
+        # don't leave a half-written .raw behind for the next call to pick up
+        try:
+            os.unlink(out_file)
+        except FileNotFoundError:
+            pass
         raise  # rethrow with full metadata
 
     except Exception as e:
@@ -2,10 +2,12 @@
 RaiChu/inline.py — Inline search with rich generated song-card thumbnails.
 
 Behavior:
-- Search YouTube (youtubesearchpython async)
-- For each top result, generate a song-card image using your generator
-- Upload the generated image to telegraph (https://telegra.ph/upload)
-- Use returned telegraph URL as thumb_url in InlineQueryResultArticle
+- Search YouTube (shared async search service)
+- Answer right away: results whose card is already known use it, the rest
+  use the raw YouTube thumbnail, with a short cache_time
+- In the background, generate a song-card image for the missing results
+  and upload it to telegraph (https://telegra.ph/upload); the returned URL
+  is cached per video id, so the next query showing that video gets the card
 - Selecting a result sends "/play <videoid>" to the chat (your play handler should handle it)
 """
 
@@ -13,9 +15,8 @@ import asyncio
 import logging
 import os
 import io
-import uuid
 import traceback
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 
 from pyrogram import Client
 from pyrogram.types import (
@@ -25,82 +26,114 @@ from pyrogram.types import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
 )
-from youtubesearchpython.__future__ import VideosSearch
-
 import aiohttp
 
 from RaiChu.config import BOT_NAME, UPDATES_CHANNEL
 from Process.ImageFont.generator import generate_song_card  # uses your uploaded font
+from Process.search import search, search_one
+from Process.Cache.cardurls import card_urls
+from Process.errors import HttpError
+from Process.http import client
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# cache_time when every result already has its card / when some are still raw
+CARDS_CACHE_TIME = 300
+RAW_CACHE_TIME = 5
+CARD_WORKERS = 3
+# comma separated video ids / queries whose cards are generated at startup
+CARD_PREWARM = [s.strip() for s in (os.getenv("CARD_PREWARM") or "").split(",") if s.strip()]
+
+# video id -> background generate+upload task
+_card_tasks: Dict[str, asyncio.Task] = {}
+_card_sem: Optional[asyncio.Semaphore] = None
+
 
 async def _yt_search(query: str, limit: int = 6) -> List[dict]:
-    try:
-        s = VideosSearch(query, limit=limit)
-        data = await s.next()
-        items = data.get("result", []) if data else []
-        out = []
-        for r in items:
-            vid = r.get("id") or r.get("videoId") or ""
-            out.append(
-                {
-                    "id": vid,
-                    "title": r.get("title", "Unknown Title"),
-                    "duration": r.get("duration", "Unknown"),
-                    "channel": (r.get("channel") or {}).get("name", "Unknown"),
-                    "thumb_src": (r.get("thumbnails") or [{"url": ""}])[0].get("url", "").split("?")[0],
-                }
-            )
-        return out
-    except Exception:
-        logger.exception("YouTube search failed")
-        return []
+    return await search(query, limit=limit)
 
 
 async def _generate_and_upload(title: str, artist: str = "", duration: str = "", album_art: Optional[str] = None):
     """
     Generate a song card using your generator and upload to telegraph.
+    The JPEG stays in memory (BytesIO) from the generator to the upload form.
     Returns a public URL (https://telegra.ph/...) or None on error.
     """
-    uid = uuid.uuid4().hex
-    tmp_name = f"inline_{uid}.jpg"
-
     try:
+        # fetch album art here (shared client) so the generator thread never blocks on network
+        if album_art and album_art.startswith(("http://", "https://")):
+            try:
+                album_art = await client.get_bytes(album_art, timeout=15)
+            except HttpError:
+                album_art = None
+
         # generate image in a thread (generator is sync)
-        await asyncio.to_thread(generate_song_card, title, artist, duration, album_art, tmp_name)
+        buf = io.BytesIO()
+        await asyncio.to_thread(generate_song_card, title, artist, duration, album_art, buf, "JPEG")
 
         # upload to telegra.ph using aiohttp multipart/form-data
         upload_url = "https://telegra.ph/upload"
-        form = aiohttp.FormData()
-        f = open(tmp_name, "rb")
-        form.add_field("file", f, filename=os.path.basename(tmp_name), content_type="image/jpeg")
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(upload_url, data=form, timeout=30) as resp:
-                if resp.status == 200:
-                    j = await resp.json()
-                    # telegraph returns a list like [{ "src": "/file/xxxx" }]
-                    if isinstance(j, list) and len(j) > 0 and "src" in j[0]:
-                        src = j[0]["src"]
-                        # build public URL
-                        public = f"https://telegra.ph{src}"
-                        return public
+        jpeg = buf.getvalue()
+
+        def form():
+            # a FormData can only be sent once; build one per attempt
+            f = aiohttp.FormData()
+            f.add_field("file", jpeg, filename="card.jpg", content_type="image/jpeg")
+            return f
+
+        j = await client.post_json(upload_url, data=form, timeout=30)
+        # telegraph returns a list like [{ "src": "/file/xxxx" }]
+        if isinstance(j, list) and len(j) > 0 and "src" in j[0]:
+            src = j[0]["src"]
+            # build public URL
+            public = f"https://telegra.ph{src}"
+            return public
         return None
     except Exception:
         logger.exception("Thumbnail generation/upload failed")
         return None
-    finally:
-        try:
-            f.close()
-        except Exception:
-            pass
-        try:
-            if os.path.exists(tmp_name):
-                os.remove(tmp_name)
-        except Exception:
-            pass
+
+
+async def _card_job(item: dict) -> None:
+    global _card_sem
+    if _card_sem is None:
+        _card_sem = asyncio.Semaphore(CARD_WORKERS)
+    async with _card_sem:
+        # pass remote thumbnail (original) as album_art for nicer cards
+        public = await _generate_and_upload(item["title"], item.get("channel", ""), item.get("duration", ""), item.get("thumb_src"))
+    if public:
+        card_urls.set(item["id"], public)
+
+
+def _schedule_cards(items: List[dict]) -> None:
+    """Start background card generation for results without a cached card."""
+    for item in items:
+        vid = item.get("id")
+        if not vid or vid in card_urls or vid in _card_tasks:
+            continue
+        task = asyncio.create_task(_card_job(item))
+        _card_tasks[vid] = task
+        task.add_done_callback(lambda _, vid=vid: _card_tasks.pop(vid, None))
+
+
+async def prewarm_cards(refs: Iterable[str] = CARD_PREWARM) -> int:
+    """
+    Generate cards ahead of time for trending songs (video ids, links or
+    queries). Returns how many new cards were made.
+    """
+    items = []
+    for ref in refs:
+        query = f"https://www.youtube.com/watch?v={ref}" if len(ref) == 11 and " " not in ref else ref
+        item = await search_one(query)
+        if item and item["id"] not in card_urls:
+            items.append(item)
+    _schedule_cards(items)
+    jobs = [_card_tasks[it["id"]] for it in items if it["id"] in _card_tasks]
+    await asyncio.gather(*jobs, return_exceptions=True)
+    made = sum(1 for it in items if it["id"] in card_urls)
+    logger.info("inline cards prewarmed: %d/%d (%s)", made, len(items), card_urls.stats())
+    return made
 
 
 def _button(videoid: str) -> InlineKeyboardMarkup:
@@ -152,27 +185,17 @@ async def inline_handler(client: Client, query: InlineQuery):
             pass
         return
 
-    # For each item, generate small thumbnail and upload concurrently (but limit concurrency)
-    sem = asyncio.Semaphore(3)  # limit parallel generation/uploads to 3
-    async def gen_upload_task(item):
-        async with sem:
-            try:
-                # generate and upload; pass remote thumbnail (original) as album_art for nicer cards
-                public = await _generate_and_upload(item["title"], item.get("channel", ""), item.get("duration", ""), item.get("thumb_src"))
-                return item, public
-            except Exception:
-                logger.exception("gen_upload_task failed")
-                return item, None
-
-    tasks = [asyncio.create_task(gen_upload_task(it)) for it in items]
-    pairs = await asyncio.gather(*tasks)
-
-    for item, pub in pairs:
+    # phase 1: answer now with whatever cards we already have
+    missing = 0
+    for item in items:
         vid = item["id"]
         title = item["title"]
         duration = item.get("duration", "")
         channel = item.get("channel", "")
-        thumb = pub or item.get("thumb_src") or None
+        card = card_urls.get(vid)
+        if not card:
+            missing += 1
+        thumb = card or item.get("thumb_src") or None
 
         desc = f"{channel} • {duration}" if channel or duration else ""
         imc = InputTextMessageContent(f"/play {vid}", disable_web_page_preview=True)
@@ -188,9 +211,13 @@ async def inline_handler(client: Client, query: InlineQuery):
             )
         )
 
+    # phase 2: render the missing cards in the background; the short
+    # cache_time makes Telegram ask again soon and pick them up
+    _schedule_cards(items)
+
     # answer inline query
     try:
-        await query.answer(results, cache_time=30, is_personal=True)
+        await query.answer(results, cache_time=RAW_CACHE_TIME if missing else CARDS_CACHE_TIME, is_personal=True)
     except Exception:
         logger.exception("Failed to answer inline query")
         try:
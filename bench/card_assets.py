@@ -0,0 +1,52 @@
+"""
+Microbenchmark for Process/design/assets.py.
+
+Times the static layers of one card (fonts, masks, shadow) rebuilt vs
+served from the asset cache, and a warm generate_song_card. Run from the
+repository root:
+
+    python -m bench.card_assets
+"""
+
+import os
+import tempfile
+import time
+
+from Process.design import assets
+from Process.ImageFont.generator import generate_song_card
+
+
+def _static_layers(cached: bool) -> None:
+    """What one card render needs besides its own pixels: 5 fonts, 2 masks, a shadow."""
+    f = assets.font if cached else assets.font.__wrapped__
+    m = assets.rounded_mask if cached else assets.rounded_mask.__wrapped__
+    s = assets.ellipse_shadow if cached else assets.ellipse_shadow.__wrapped__
+    for size in (72, 40, 30, 28, 22):
+        f(assets.FONT_PRIMARY, size)
+    m((520, 520), 30)
+    m((1280, 720), 28)
+    s(560, 160, 18)
+
+
+def main(rounds: int = 50) -> None:
+    for cached in (False, True):
+        _static_layers(cached)  # warm the cache / the OS file cache
+        started = time.perf_counter()
+        for _ in range(rounds):
+            _static_layers(cached)
+        per = (time.perf_counter() - started) / rounds * 1000
+        print(f"static layers, {'cached' if cached else 'rebuilt'}: {per:.2f} ms/card")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "card.jpg")
+        title = "A Rather Long Song Title That Needs To Wrap Over More Than One Line"
+        generate_song_card(title, "Artist", "03:45", output_path=out)
+        started = time.perf_counter()
+        for _ in range(rounds // 5 or 1):
+            generate_song_card(title, "Artist", "03:45", output_path=out)
+        per = (time.perf_counter() - started) / (rounds // 5 or 1) * 1000
+        print(f"generate_song_card (warm assets): {per:.1f} ms/card")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Stress benchmark for Process/pipeline.py.
+
+Fires concurrent skip / stream-end events at many chats, once straight
+at the queue and once through ChatPipeline, and counts tracks that were
+skipped over or played twice. Run from the repository root:
+
+    python -m bench.pipeline_stress
+"""
+
+import asyncio
+import random
+import time
+from typing import Dict, Tuple
+
+from Process import queues
+from Process.pipeline import ChatPipeline
+
+
+class _FakeCall:
+    """Stands in for PyTgCalls: change_stream just takes a little time."""
+
+    def __init__(self):
+        self.playing: Dict[int, str] = {}
+        self.calls = 0
+
+    async def change_stream(self, chat_id: int, link: str) -> None:
+        self.calls += 1
+        await asyncio.sleep(0.001)
+        self.playing[chat_id] = link
+
+    async def leave_group_call(self, chat_id: int) -> None:
+        await asyncio.sleep(0)
+        self.playing.pop(chat_id, None)
+
+
+async def bench_round(serialized: bool, chats: int, tracks: int, events: int) -> Tuple[float, int, int]:
+    """
+    Fire `events` concurrent skip / stream-end events per chat and count
+    tracks that were skipped over or played twice.
+    """
+    queues.QUEUE.clear()
+    call = _FakeCall()
+    pipeline = ChatPipeline(idle_timeout=1.0)
+    played: Dict[int, list] = {c: [] for c in range(chats)}
+
+    for c in range(chats):
+        for t in range(tracks):
+            queues.add_to_queue(c, f"t{t}", f"{c}:{t}", None, "Audio", 0)
+        played[c].append(f"{c}:0")
+
+    async def skip(chat_id: int) -> int:
+        # same shape as Process.utils._skip_current_song
+        q = queues.get_queue(chat_id)
+        if not q:
+            return 0
+        if len(q) == 1:
+            await call.leave_group_call(chat_id)
+            queues.clear_queue(chat_id)
+            return 1
+        nxt = q[1]
+        await call.change_stream(chat_id, nxt.link)
+        played[chat_id].append(nxt.link)
+        queues.pop_an_item(chat_id)
+        return 2
+
+    async def event(chat_id: int) -> None:
+        await asyncio.sleep(random.random() * 0.002)
+        if serialized:
+            await pipeline.run(chat_id, skip, chat_id)
+        else:
+            await skip(chat_id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(event(c) for c in range(chats) for _ in range(events)))
+    elapsed = time.perf_counter() - started
+
+    anomalies = 0
+    for c, links in played.items():
+        expected = [f"{c}:{t}" for t in range(len(links))]
+        anomalies += sum(1 for a, b in zip(links, expected) if a != b)
+        anomalies += len(links) - len(set(links))
+    return elapsed, anomalies, call.calls
+
+
+async def main(chats: int = 200, tracks: int = 60, events: int = 40) -> None:
+    for serialized in (False, True):
+        elapsed, anomalies, calls = await bench_round(serialized, chats, tracks, events)
+        total = chats * events
+        print(
+            f"{'pipeline ' if serialized else 'unlocked '} "
+            f"events={total} change_stream={calls} "
+            f"time={elapsed:.3f}s rate={total / elapsed:,.0f}/s "
+            f"dropped_or_doubled={anomalies}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
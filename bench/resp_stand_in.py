@@ -0,0 +1,55 @@
+"""
+Tiny in-process RESP server (GET, SET with PX, DEL, MGET, SCAN) for
+trying Process.state.RedisStore without a Redis server. Used by
+bench/state_stores.py and the state store tests.
+"""
+
+import fnmatch
+import socketserver
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from Process.state import RespConnection
+
+
+def serve(port: int = 0) -> socketserver.ThreadingTCPServer:
+    """Start the server on a daemon thread; `server.server_address` is where it listens."""
+    data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            conn = RespConnection.__new__(RespConnection)
+            conn._file = self.rfile
+            while True:
+                try:
+                    args = conn._reply()
+                except ConnectionError:
+                    return
+                cmd = args[0].upper()
+                now = time.time()
+                live = lambda k: k in data and (data[k][1] is None or data[k][1] > now)
+                if cmd == b"SET":
+                    px = int(args[4]) / 1000 if len(args) > 4 else None
+                    data[args[1]] = (args[2], now + px if px else None)
+                    out = b"+OK\r\n"
+                elif cmd == b"GET":
+                    out = RespConnection._encode([data[args[1]][0]]).split(b"\r\n", 1)[1] if live(args[1]) else b"$-1\r\n"
+                elif cmd == b"DEL":
+                    out = b":%d\r\n" % (data.pop(args[1], None) is not None)
+                elif cmd == b"MGET":
+                    out = b"*%d\r\n" % (len(args) - 1) + b"".join(
+                        RespConnection._encode([data[k][0]]).split(b"\r\n", 1)[1] if live(k) else b"$-1\r\n"
+                        for k in args[1:]
+                    )
+                elif cmd == b"SCAN":
+                    keys = [k for k in data if live(k) and fnmatch.fnmatchcase(k.decode(), args[3].decode())]
+                    out = b"*2\r\n$1\r\n0\r\n" + RespConnection._encode(keys)
+                else:
+                    out = b"+OK\r\n"
+                self.wfile.write(out)
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,45 @@
+"""
+Benchmark for the state store backends (Process/state.py).
+
+Times StoreMap writes on the caller's side and until they are flushed,
+for the memory, SQLite and RESP (stand-in server) backends, then checks
+that a reload sees the same data. Run from the repository root:
+
+    python -m bench.state_stores
+"""
+
+import os
+import tempfile
+import time
+
+from bench.resp_stand_in import serve
+from Process.state import MemoryStore, RedisStore, SQLiteStore
+
+
+def main(writes: int = 20000) -> None:
+    server = serve()
+    host, port = server.server_address
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, st in (
+            ("memory", MemoryStore()),
+            ("sqlite", SQLiteStore(os.path.join(tmp, "state.sqlite3"))),
+            ("redis", RedisStore(host, port)),
+        ):
+            m = st.namespace("bench")
+            start = time.perf_counter()
+            for i in range(writes):
+                m[i % 500] = [i] * 20
+            enqueued = time.perf_counter() - start
+            st.flush()
+            total = time.perf_counter() - start
+            again = st.namespace("bench")
+            again.load()
+            ok = all(again[k] == m[k] for k in m)
+            print(f"{name:7} {writes} writes: {enqueued * 1e6 / writes:.1f} us/write on the caller, "
+                  f"{total:.3f}s until flushed, reload ok={ok}")
+            st.stop()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
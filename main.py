@@ -4,8 +4,11 @@ import traceback
 import os
 import inspect
 from aiohttp import web
-from pyrogram import idle
-from Process.main import call_py, bot
+
+# The bot itself (clients, PyTgCalls, caches, stores) is imported inside
+# main() / supervisor_main(), never at module level: the yt-dlp and
+# thumbnail pools spawn children that run this file again as __mp_main__,
+# and they must not build a second bot on the way.
 
 
 # ===================== SAFE START / STOP =====================
@@ -82,14 +85,69 @@ async def stop_health_server(runner):
 # ========================== MAIN BOT ==========================
 
 async def main():
+    from pyrogram import idle
+    from Process.main import call_py, bot
+    from Process.ytdl import resolver
+    from Process.downloads import downloads
+    from Process.Cache.fileids import file_index
+    from Process.design.thumbnail import render_pool
+    from Process.Cache.cardurls import card_urls
+    from Process.http import client as http_client
+    from Process.ffmpeg import scheduler as ffmpeg_jobs
+    from Process.Cache.journal import queue_journal
+    from Process.queues import QUEUE
+    from Process.state import store as state_store
+    from Process.utils import restore_queues, resume_calls
+    from RaiChu.inline import CARD_PREWARM, prewarm_cards
+    from RaiChu.converter import close_all as close_streams
+    from Process.workers import WORKER_COUNT, WORKER_INDEX, is_worker, receive_updates, shard_of
+
+    print("[INFO]: STARTING HTTP CLIENT")
+    await safe_start(http_client, name="http client")
+
     print("[INFO]: STARTING BOT CLIENT")
     await safe_start(bot, name="bot")
 
     print("[INFO]: STARTING PYTGCALLS CLIENT")
     await safe_start(call_py, name="pytgcalls")
 
-    # Start HTTP server for Render
-    health_runner = await start_health_server()
+    print("[INFO]: RESTORING QUEUES")
+    resume_task = None
+    saved = {}
+    if state_store.persistent:
+        # the state store already holds the queues; only this worker's chats
+        try:
+            QUEUE.load(lambda chat_id: shard_of(chat_id, WORKER_COUNT) == WORKER_INDEX)
+        except Exception:
+            print("[WARN]: Could not read queues from the state store:")
+            traceback.print_exc()
+        saved = dict.fromkeys(QUEUE)
+    else:
+        try:
+            saved = queue_journal.load()
+        except Exception:
+            print("[WARN]: Could not read the queue journal:")
+            traceback.print_exc()
+        restore_queues(saved)
+        # journal from here on, so dropped / failed restores are recorded too
+        await safe_start(queue_journal, name="queue journal")
+    if saved:
+        print(f"[INFO]: REJOINING {len(saved)} CALLS")
+        resume_task = asyncio.create_task(resume_calls(list(saved)))
+
+    # Start HTTP server for Render (the supervisor serves it in worker mode)
+    health_runner = None
+    updates_task = None
+    if is_worker():
+        print(f"[INFO]: WORKER {WORKER_INDEX} WAITING FOR UPDATES")
+        updates_task = asyncio.create_task(receive_updates(bot))
+    else:
+        health_runner = await start_health_server()
+
+    prewarm_task = None
+    if CARD_PREWARM:
+        print(f"[INFO]: PREWARMING {len(CARD_PREWARM)} INLINE CARDS")
+        prewarm_task = asyncio.create_task(prewarm_cards(CARD_PREWARM))
 
     print("[INFO]: BOT IS RUNNING...")
     try:
@@ -97,19 +155,77 @@ async def main():
     except (KeyboardInterrupt, SystemExit):
         print("[INFO]: Received stop signal")
     finally:
+        # before leaving the calls: their leave handlers clear the queues
+        print("[INFO]: CLOSING QUEUE JOURNAL / STATE STORE")
+        if resume_task:
+            resume_task.cancel()
+        await safe_stop(queue_journal, name="queue journal")
+        await safe_stop(state_store, name="state store")
+
         print("[INFO]: STOPPING PYTGCALLS")
         await safe_stop(call_py, name="pytgcalls")
 
+        print("[INFO]: STOPPING FFMPEG STREAMS")
+        await close_streams()
+        await safe_stop(ffmpeg_jobs, name="ffmpeg jobs")
+
         print("[INFO]: STOPPING BOT")
         await safe_stop(bot, name="bot")
 
-        print("[INFO]: STOPPING HEALTH SERVER")
+        print("[INFO]: STOPPING YT-DLP RESOLVER")
+        await safe_stop(resolver, name="ytdl resolver")
+
+        print("[INFO]: STOPPING DOWNLOADS")
+        await safe_stop(downloads, name="downloads")
+
+        print("[INFO]: STOPPING THUMBNAIL RENDERERS")
+        await safe_stop(render_pool, name="thumbnail render pool")
+
+        print("[INFO]: CLOSING CARD URL CACHE")
+        if prewarm_task:
+            prewarm_task.cancel()
+        await safe_stop(card_urls, name="card url cache")
+
+        print("[INFO]: CLOSING FILE ID INDEX")
+        await safe_stop(file_index, name="file id index")
+
+        if updates_task:
+            updates_task.cancel()
+        if health_runner:
+            print("[INFO]: STOPPING HEALTH SERVER")
+            await stop_health_server(health_runner)
+
+        print("[INFO]: CLOSING HTTP CLIENT")
+        await safe_stop(http_client, name="http client")
+
+
+# ======================== SUPERVISOR =========================
+
+async def supervisor_main(count: int):
+    from pyrogram import idle
+    from Process.workers import supervise
+
+    print(f"[INFO]: STARTING {count} WORKERS")
+    supervisor = await supervise(count)
+    health_runner = await start_health_server()
+    try:
+        await idle()
+    except (KeyboardInterrupt, SystemExit):
+        print("[INFO]: Received stop signal")
+    finally:
+        print("[INFO]: STOPPING WORKERS")
+        await supervisor.stop()
         await stop_health_server(health_runner)
 
 
 if __name__ == "__main__":
+    from Process.workers import WORKERS, is_worker
+
     try:
-        asyncio.run(main())
+        if WORKERS > 1 and not is_worker():
+            asyncio.run(supervisor_main(WORKERS))
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         print("[INFO]: BOT STOPPED")
     except Exception:
@@ -0,0 +1,21 @@
+"""
+Shared test setup.
+
+Tests import the bot's modules straight from the repository root. Caches
+and stores that are created at import time are pointed at a scratch
+directory, so a test run never touches ./cache.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+_scratch = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ.setdefault("STATE_URL", "memory://")
+os.environ.setdefault("MEDIA_CACHE_DIR", os.path.join(_scratch, "media"))
+os.environ.setdefault("THUMB_CACHE_DIR", os.path.join(_scratch, "cards"))
+os.environ.setdefault("QUEUE_JOURNAL_DB", os.path.join(_scratch, "queues.sqlite3"))
@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from Process.Cache import admins as admin_cache
+
+CHAT = -2002
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    admin_cache.reset_all()
+    yield
+    admin_cache.reset_all()
+
+
+def test_lists_expire():
+    admin_cache.set(CHAT, [3, 1, 3], ttl=0.05)
+    assert admin_cache.get(CHAT) == [1, 3]
+    assert admin_cache.is_admin(CHAT, 1) is True and admin_cache.is_admin(CHAT, 2) is False
+    asyncio.run(asyncio.sleep(0.06))
+    assert admin_cache.get(CHAT) is None and admin_cache.is_admin(CHAT, 1) is None
+
+
+def test_failed_refresh_serves_the_last_good_list():
+    assert admin_cache.set_failed(CHAT) is None
+    assert admin_cache.get(CHAT) is None  # nothing was cached for a chat never fetched
+    admin_cache.set(CHAT, [1, 2], ttl=0.01)
+    asyncio.run(asyncio.sleep(0.02))
+    assert admin_cache.set_failed(CHAT) == [1, 2]
+    assert admin_cache.get(CHAT) == [1, 2]
+
+
+def test_member_updates_change_the_cached_and_fallback_lists():
+    admin_cache.set(CHAT, [1])
+    admin_cache.update_member(CHAT, 2, True)
+    admin_cache.update_member(CHAT, 1, False)
+    assert admin_cache.get(CHAT) == [2]
+    # expired: the fallback list follows the change too
+    admin_cache.admins.pop(CHAT)
+    admin_cache.update_member(CHAT, 3, True)
+    assert admin_cache.get(CHAT) is None
+    assert admin_cache.set_failed(CHAT) == [2, 3]
+
+
+def test_clear_drops_the_fallback():
+    admin_cache.set(CHAT, [1])
+    admin_cache.clear_admins(CHAT)
+    assert admin_cache.get_admins(CHAT) == [] and admin_cache.set_failed(CHAT) is None
+
+
+# ---------- Process/admins.py (needs pyrogram) ----------
+
+
+def _member(user_id, status="administrator", can_manage=True):
+    return SimpleNamespace(
+        user=SimpleNamespace(id=user_id, is_deleted=False),
+        status=status,
+        can_manage_voice_chats=can_manage,
+    )
+
+
+class FakeClient:
+    def __init__(self, members=(), fail=False):
+        self.members = list(members)
+        self.fail = fail
+        self.calls = 0
+
+    async def get_chat_members(self, chat_id, filter=None):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise ConnectionError("telegram down")
+        return self.members
+
+
+@pytest.fixture
+def admins():
+    pytest.importorskip("pyrogram")
+    from Process import admins
+
+    return admins
+
+
+def test_voice_admins_are_fetched_once_and_filtered(admins):
+    client = FakeClient([
+        _member(1, "creator", can_manage=False),
+        _member(2),
+        _member(3, can_manage=False),
+    ])
+
+    async def main():
+        lists = await asyncio.gather(*(admins.voice_admins(client, CHAT) for _ in range(4)))
+        allowed = await admins.is_voice_admin(client, CHAT, 2)
+        return lists, allowed
+
+    lists, allowed = asyncio.run(main())
+    assert lists == [[1, 2]] * 4 and allowed
+    assert client.calls == 1
+
+
+def test_failed_fetch_falls_back_or_raises(admins):
+    async def main():
+        with pytest.raises(ConnectionError):
+            await admins.voice_admins(FakeClient(fail=True), CHAT)
+        admin_cache.set(CHAT, [5], ttl=0.01)
+        await asyncio.sleep(0.02)
+        return await admins.voice_admins(FakeClient(fail=True), CHAT)
+
+    assert asyncio.run(main()) == [5]
+
+
+def test_member_updates_invalidate_the_cache(admins):
+    admin_cache.set(CHAT, [1, 2])
+    admins.on_member_updated(CHAT, _member(2, status="administrator", can_manage=False))
+    admins.on_member_updated(CHAT, _member(7, status="creator"))
+    admins.on_member_updated(CHAT, _member(1, status="left"))
+    assert admin_cache.get(CHAT) == [7]
@@ -0,0 +1,46 @@
+import io
+
+import pytest
+from PIL import Image
+
+from Process.design import assets
+from Process.ImageFont.importer import load_image
+
+
+def test_fonts_are_built_once_per_path_and_size():
+    assets.clear()
+    a = assets.font(assets.FONT_PRIMARY, 30)
+    assert assets.font(assets.FONT_PRIMARY, 30) is a
+    assert assets.font(assets.FONT_PRIMARY, 31) is not a
+
+
+def test_missing_font_falls_back():
+    assert assets.font("/nonexistent/font.ttf", 20) is not None
+
+
+def test_rounded_mask_matches_size_and_is_shared():
+    mask = assets.rounded_mask((120, 80), 10)
+    assert mask.size == (120, 80)
+    assert mask.mode == "L"
+    assert assets.rounded_mask((120, 80), 10) is mask
+    # corners are cut, the middle is opaque
+    assert mask.getpixel((0, 0)) == 0
+    assert mask.getpixel((60, 40)) == 255
+
+
+def test_missing_overlay_is_none():
+    assert assets.overlay("/nonexistent/overlay.png", (10, 10)) is None
+
+
+def test_change_image_size_keeps_aspect_ratio():
+    out = assets.change_image_size(1280, 720, Image.new("RGB", (400, 400)))
+    assert out.size == (720, 720)
+
+
+def test_load_image_takes_bytes_but_not_urls():
+    buf = io.BytesIO()
+    Image.new("RGB", (40, 20), (255, 0, 0)).save(buf, "PNG")
+    img = load_image(buf.getvalue(), size=(16, 16))
+    assert img.size == (16, 16) and img.mode == "RGBA"
+    with pytest.raises(ValueError):
+        load_image("https://example.com/cover.jpg")
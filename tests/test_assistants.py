@@ -0,0 +1,126 @@
+import asyncio
+import math
+
+from Process.assistants import Assistant, AssistantPool, CallRouter
+
+
+class FakeClient:
+    def __init__(self):
+        self.is_connected = False
+
+    async def start(self):
+        self.is_connected = True
+
+    async def stop(self):
+        self.is_connected = False
+
+
+class FakeCalls:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.started = False
+        self.joined = []
+        self.handlers = {}
+
+    async def start(self):
+        if self.fail:
+            raise RuntimeError("no session")
+        self.started = True
+
+    async def join_group_call(self, chat_id, *args):
+        self.joined.append(chat_id)
+
+    async def leave_group_call(self, chat_id):
+        pass
+
+    def on_kicked(self):
+        def decorator(func):
+            self.handlers["on_kicked"] = func
+            return func
+        return decorator
+
+
+def _pool(n, **kwargs):
+    return AssistantPool([Assistant(i, FakeClient(), FakeCalls()) for i in range(n)], **kwargs)
+
+
+CHATS = range(-1000000, -1000000 + 2000)
+
+
+def test_placement_is_stable():
+    pool, other = _pool(4), _pool(4)
+    first = [pool.pick(chat, reserve=False).index for chat in CHATS]
+    again = [other.pick(chat, reserve=False).index for chat in CHATS]
+    assert first == again
+    # every assistant gets a share
+    assert set(first) == {0, 1, 2, 3}
+
+
+def test_reservation_holds_until_the_call_ends():
+    pool = _pool(3)
+    chosen = pool.pick(-100)
+    assert pool.stats()["loads"][chosen.index] == 1
+    pool.joined(-100, chosen)
+    assert pool.pick(-100) is chosen
+    pool.left(-100)
+    assert sum(pool.stats()["loads"]) == 0
+
+
+def test_pick_without_reserving_holds_nothing():
+    pool = _pool(3)
+    pool.pick(-100, reserve=False)
+    assert sum(pool.stats()["loads"]) == 0
+
+
+def test_load_stays_within_the_bound():
+    pool = _pool(4, load_factor=1.25)
+    for chat in CHATS[:400]:
+        pool.joined(chat, pool.pick(chat))
+    loads = pool.stats()["loads"]
+    assert sum(loads) == 400
+    assert max(loads) <= math.ceil(400 / 4 * 1.25)
+
+
+def test_removing_an_assistant_only_moves_its_chats():
+    four = _pool(4)
+    before = {chat: four.pick(chat, reserve=False).index for chat in CHATS}
+    pool = _pool(3)
+    after = {chat: pool.pick(chat, reserve=False).index for chat in CHATS}
+    moved = [chat for chat in CHATS if before[chat] != after[chat]]
+    assert all(before[chat] == 3 for chat in moved)
+
+
+def test_unhealthy_assistants_get_no_new_chats():
+    pool = _pool(3)
+    pool.assistants[1].healthy = False
+    assert {pool.pick(chat, reserve=False).index for chat in CHATS} == {0, 2}
+
+
+def test_router_starts_every_client_and_drops_broken_ones():
+    pool = AssistantPool([
+        Assistant(0, FakeClient(), FakeCalls()),
+        Assistant(1, FakeClient(), FakeCalls(fail=True)),
+        Assistant(2, FakeClient(), FakeCalls()),
+    ])
+    asyncio.run(CallRouter(pool).start())
+    assert [a.client.is_connected for a in pool.assistants] == [True, True, True]
+    assert [a.healthy for a in pool.assistants] == [True, False, True]
+
+
+def test_router_joins_on_the_picked_assistant_and_frees_it_on_leave_events():
+    pool = _pool(2)
+    router = CallRouter(pool)
+
+    @router.on_kicked()
+    async def kicked(client, chat_id):
+        pass
+
+    async def main():
+        await router.join_group_call(-42, "stream")
+        serving = pool.serving(-42)
+        assert serving.calls.joined == [-42]
+        await serving.calls.handlers["on_kicked"](None, -42)
+
+    asyncio.run(main())
+    assert pool.serving(-42) is None
+    assert sum(pool.stats()["loads"]) == 0
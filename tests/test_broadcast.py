@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("pyrogram")
+
+from pyrogram.errors import FloodWait  # noqa: E402
+
+from Process import broadcast  # noqa: E402
+from Process.broadcast import Broadcast, TokenBucket  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_chat_spacing(monkeypatch):
+    monkeypatch.setattr(broadcast, "PRIVATE_INTERVAL", 0.0)
+    monkeypatch.setattr(broadcast, "GROUP_INTERVAL", 0.0)
+
+
+def test_bucket_limits_the_rate():
+    async def main():
+        bucket = TokenBucket(rate=50, burst=1)
+        started = time.monotonic()
+        for _ in range(11):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # one token up front, then 10 more at 50/s
+    assert asyncio.run(main()) >= 0.18
+
+
+def test_penalize_pauses_and_halves_once_per_flood():
+    bucket = TokenBucket(rate=20)
+    bucket.penalize(1.0)
+    bucket.penalize(1.0)  # a second send that was in flight
+    assert bucket.rate == 10
+    assert 0.5 < bucket.paused_for <= 1.0
+
+
+def test_reward_brings_the_rate_back():
+    bucket = TokenBucket(rate=20)
+    bucket.penalize(0)
+    for _ in range(1000):
+        bucket.reward()
+    assert bucket.rate == 20
+
+
+def test_flood_wait_is_retried(monkeypatch):
+    # the bucket still pauses for the extra second it adds to every flood
+    monkeypatch.setattr(broadcast, "flood_wait_seconds", lambda e: 0.0)
+
+    async def main():
+        floods = {5}
+        sent = []
+
+        async def send(chat_id):
+            if chat_id in floods:
+                floods.discard(chat_id)
+                raise FloodWait(0)
+            sent.append(chat_id)
+
+        job = await Broadcast("test:flood", send, rate=1000).run(range(1, 11))
+        return job, sent
+
+    job, sent = asyncio.run(main())
+    assert sorted(sent) == list(range(1, 11))
+    assert job.flood_waits == 1 and job.failed == 0 and job.finished
+
+
+def test_resume_sends_only_the_rest_and_retries_failures():
+    async def main():
+        first = []
+
+        async def flaky(chat_id):
+            if chat_id % 10 == 0:
+                raise RuntimeError("blocked")
+            first.append(chat_id)
+
+        job = await Broadcast("test:resume", flaky, rate=1000).run(range(1, 51))
+        assert job.failed == 5
+
+        second = []
+
+        async def send(chat_id):
+            second.append(chat_id)
+
+        again = await Broadcast("test:resume", send, rate=1000).run(range(1, 51))
+        return first, second, again
+
+    first, second, again = asyncio.run(main())
+    assert sorted(second) == [10, 20, 30, 40, 50]
+    assert not set(first) & set(second)
+    assert again.resumed and again.skipped == 45 and again.sent == 50
+
+
+def test_dead_senders_stop_the_run(monkeypatch):
+    def broken_checkpoint(self):
+        raise OSError("store down")
+
+    monkeypatch.setattr(broadcast, "CHECKPOINT_EVERY", 1)
+    monkeypatch.setattr(Broadcast, "checkpoint", broken_checkpoint)
+
+    async def main():
+        async def send(chat_id):
+            pass
+
+        job = Broadcast("test:dead", send, concurrency=2, rate=1000)
+        await asyncio.wait_for(job.run(range(1, 1001)), 5)
+
+    with pytest.raises(OSError):
+        asyncio.run(main())
+    assert "test:dead" not in broadcast.running
+
+
+def test_checkpoint_io_stays_off_the_event_loop(monkeypatch):
+    import threading
+
+    from Process.state import MemoryStore
+
+    class Recording(MemoryStore):
+        def __init__(self):
+            super().__init__()
+            self.calls = []
+
+        def get(self, *args, **kwargs):
+            self.calls.append(("get", threading.current_thread() is threading.main_thread()))
+            return super().get(*args, **kwargs)
+
+        def set(self, *args, **kwargs):
+            self.calls.append(("set", None))
+            super().set(*args, **kwargs)
+
+        def set_later(self, *args, **kwargs):
+            self.calls.append(("set_later", None))
+            super().set(*args, **kwargs)
+
+    st = Recording()
+    monkeypatch.setattr(broadcast, "store", st)
+    monkeypatch.setattr(broadcast, "CHECKPOINT_EVERY", 2)
+
+    async def main():
+        async def fail_last(chat_id):
+            if chat_id == 5:
+                raise RuntimeError("blocked")
+
+        return await Broadcast("test:io", fail_last, rate=1000).run(range(1, 6))
+
+    job = asyncio.run(main())
+    assert job.failed == 1
+    assert st.calls[0] == ("get", False)
+    assert {name for name, _ in st.calls[1:]} == {"set_later"}
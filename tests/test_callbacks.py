@@ -0,0 +1,133 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pyrogram")
+
+from Process import callbacks  # noqa: E402
+from Process.callbacks import MAX_DATA_BYTES, CallbackRouter, decode, encode  # noqa: E402
+
+
+def test_round_trip_with_separators_and_backslashes():
+    args = ["a|b", "c\\d", "\\|", "", "plain", "trailing\\"]
+    data = encode("act", *args)
+    assert decode(data) == ("act", args)
+
+
+def test_numbers_come_back_as_strings():
+    assert decode(encode("song_download", "audio", 140, "dQw4w9WgXcQ")) == (
+        "song_download", ["audio", "140", "dQw4w9WgXcQ"],
+    )
+
+
+def test_legacy_space_form():
+    assert decode("gets audio|dQw4w9WgXcQ") == ("gets", ["audio", "dQw4w9WgXcQ"])
+    assert decode("cls") == ("cls", [])
+    assert decode("") == ("", [])
+
+
+def test_oversize_data_is_refused():
+    encode("x", "a" * (MAX_DATA_BYTES - 2))
+    with pytest.raises(ValueError):
+        encode("x", "a" * (MAX_DATA_BYTES - 1))
+    # escapes and multibyte characters count too
+    with pytest.raises(ValueError):
+        encode("x", "|" * 40)
+    with pytest.raises(ValueError):
+        encode("x", "é" * 40)
+
+
+class Query:
+    def __init__(self, data, user_id=1, chat_id=-100):
+        self.data = data
+        self.from_user = SimpleNamespace(id=user_id)
+        self.message = SimpleNamespace(chat=SimpleNamespace(id=chat_id))
+        self.answers = []
+
+    async def answer(self, text=None, show_alert=False):
+        self.answers.append(text)
+
+
+def _router(monkeypatch, admins=(1,)):
+    async def is_voice_admin(client, chat_id, user_id):
+        if admins is None:
+            raise RuntimeError("telegram down")
+        return user_id in admins
+
+    monkeypatch.setattr(callbacks, "is_voice_admin", is_voice_admin)
+    router = CallbackRouter(debounce=0.5)
+    calls = []
+
+    @router.action("with_args")
+    async def with_args(client, query, *args):
+        calls.append(("with_args", args))
+
+    @router.action("menu")
+    async def menu(client, query):
+        calls.append(("menu",))
+
+    @router.action("pause", admin=True, debounce=True)
+    async def pause(client, query):
+        calls.append(("pause",))
+
+    @router.action("skip", admin=True, debounce=True)
+    async def skip(client, query):
+        calls.append(("skip",))
+
+    return router, calls
+
+
+def test_router_passes_args_only_to_handlers_taking_them(monkeypatch):
+    router, calls = _router(monkeypatch)
+
+    async def main():
+        await router.dispatch(None, Query(encode("with_args", "a|b", 2)))
+        await router.dispatch(None, Query("menu|ignored"))
+        unknown = Query("nope|1")
+        await router.dispatch(None, unknown)
+        return unknown
+
+    unknown = asyncio.run(main())
+    assert calls == [("with_args", ("a|b", "2")), ("menu",)]
+    assert unknown.answers == [None]
+
+
+def test_debounce_is_per_user_and_action(monkeypatch):
+    router, calls = _router(monkeypatch, admins=(1, 2))
+
+    async def main():
+        await router.dispatch(None, Query("pause"))
+        again = Query("pause")
+        await router.dispatch(None, again)
+        await router.dispatch(None, Query("skip"))
+        await router.dispatch(None, Query("pause", user_id=2))
+        return again
+
+    again = asyncio.run(main())
+    assert calls == [("pause",), ("skip",), ("pause",)]
+    assert again.answers == ["⏳ Slow down…"]
+
+
+def test_admin_routes(monkeypatch):
+    router, calls = _router(monkeypatch, admins=(1,))
+    outsider = Query("pause", user_id=7)
+    asyncio.run(router.dispatch(None, outsider))
+    assert calls == [] and "admins" in outsider.answers[0]
+
+    router, calls = _router(monkeypatch, admins=None)
+    failing = Query("pause")
+    asyncio.run(router.dispatch(None, failing))
+    assert calls == [] and failing.answers == ["Could not verify permissions."]
+
+
+def test_routes_are_registered_once():
+    router = CallbackRouter()
+
+    @router.action("x")
+    async def x(client, query):
+        pass
+
+    with pytest.raises(ValueError):
+        router.action("x")(x)
+    assert router.actions() == ["x"]
@@ -0,0 +1,55 @@
+import asyncio
+import os
+
+import pytest
+
+from Process.errors import FFmpegReturnCodeError
+from RaiChu import converter
+
+SIGNED_URL = (
+    "https://rr3---sn-4g5lznes.googlevideo.com/videoplayback?expire=1700000000"
+    "&ei=" + "x" * 40 + "&ip=203.0.113.7&id=o-" + "A" * 44 + "&itag=251&source=youtube"
+    "&requiressl=yes&mime=audio%2Fwebm&gir=yes&clen=3456789&dur=212.341"
+    "&lmt=1690000000000000&keepalive=yes&c=ANDROID&sparams=expire%2Cei%2Cip%2Cid%2Citag"
+    "&sig=" + "B" * 90 + "&lsparams=mh%2Cmm%2Cmn%2Cms%2Cmv%2Cmvi%2Cpl&lsig=" + "C" * 70
+)
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(converter, "OUTPUT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_urls_get_short_names():
+    assert len(os.path.basename(SIGNED_URL)) > 255
+    stem = converter._stem(SIGNED_URL)
+    assert len(stem) == 16 and stem == converter._stem(SIGNED_URL)
+    assert converter._stem("downloads/abc.webm") == "abc"
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+def test_stream_of_a_signed_url_gets_a_pipe(output_dir, monkeypatch):
+    made = []
+
+    async def spawn(args, **kwargs):
+        made.append(args[-1])
+        assert os.path.exists(args[-1])
+        raise OSError("no ffmpeg here")
+
+    monkeypatch.setattr(converter.scheduler, "spawn", spawn)
+    with pytest.raises(FFmpegReturnCodeError):
+        asyncio.run(converter.open_stream(SIGNED_URL))
+    assert len(made) == 1 and len(os.path.basename(made[0])) < 64
+    assert os.listdir(output_dir) == []
+
+
+def test_mkfifo_errors_are_wrapped(output_dir, monkeypatch):
+    def mkfifo(path):
+        raise OSError(36, "File name too long")
+
+    monkeypatch.setattr(converter.os, "mkfifo", mkfifo, raising=False)
+    with pytest.raises(FFmpegReturnCodeError) as info:
+        asyncio.run(converter.open_stream("song.webm"))
+    assert "File name too long" in info.value.stderr
+    assert converter._streams == {}
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from Process import downloads as dl
+from Process.Cache.media import media_cache
+from Process.downloads import DownloadManager, cached_download, downloaded_path
+from Process.errors import DownloadCancelled, DownloadLimitError
+
+
+class FakeYdl:
+    """Stands in for _run_ydl: calls the hooks like yt-dlp would, writes <outtmpl stem>.m4a."""
+
+    def __init__(self, steps=5, delay=0.01):
+        self.steps = steps
+        self.delay = delay
+        self.release = threading.Event()
+        self.release.set()
+        self.runs = 0
+
+    def __call__(self, url, opts, download):
+        self.runs += 1
+        for i in range(1, self.steps + 1):
+            for hook in opts["progress_hooks"]:
+                hook({"status": "downloading", "downloaded_bytes": i, "total_bytes": self.steps})
+            time.sleep(self.delay)
+        self.release.wait(5)
+        info = {"id": url, "requested_downloads": [{}]}
+        if "outtmpl" in opts:
+            path = opts["outtmpl"].replace("%(ext)s", "m4a")
+            with open(path, "wb") as f:
+                f.write(url.encode())
+        for hook in opts["postprocessor_hooks"]:
+            hook({"status": "finished"})
+        return info
+
+
+@pytest.fixture
+def ydl(monkeypatch):
+    fake = FakeYdl()
+    monkeypatch.setattr(dl, "_run_ydl", fake)
+    monkeypatch.setattr(dl, "PROGRESS_INTERVAL", 0.0)
+    return fake
+
+
+def test_download_reports_progress(ydl):
+    async def main():
+        manager = DownloadManager(workers=2)
+        seen = []
+
+        async def progress(job):
+            seen.append(job.percent)
+
+        info = await manager.download("a", {}, user_id=1, on_progress=progress)
+        await asyncio.sleep(0)
+        return info, seen
+
+    info, seen = asyncio.run(main())
+    assert info["id"] == "a"
+    assert seen and max(seen) == 100.0
+
+
+def test_per_user_cap(ydl):
+    ydl.release.clear()
+
+    async def main():
+        manager = DownloadManager(workers=2, per_user=1)
+        first = asyncio.ensure_future(manager.download("a", {}, user_id=1))
+        await asyncio.sleep(0.02)
+        with pytest.raises(DownloadLimitError):
+            await manager.download("b", {}, user_id=1)
+        # other users are not affected
+        other = asyncio.ensure_future(manager.download("c", {}, user_id=2))
+        await asyncio.sleep(0.02)
+        ydl.release.set()
+        return await first, await other, manager.jobs
+
+    first, other, jobs = asyncio.run(main())
+    assert first["id"] == "a" and other["id"] == "c"
+    assert jobs == {}
+
+
+def test_shared_job_keeps_running_for_the_other_waiter(ydl):
+    ydl.release.clear()
+
+    async def main():
+        manager = DownloadManager()
+        job = manager.start("a", {}, key="a")
+        assert manager.shared("a") is job
+        first = asyncio.ensure_future(manager.wait(job, user_id=1))
+        second = asyncio.ensure_future(manager.wait(job, user_id=2))
+        await asyncio.sleep(0.02)
+        assert job.users() == [1, 2]
+        assert manager.cancel_user(1) == 1
+        with pytest.raises(DownloadCancelled):
+            await first
+        assert not job.cancelled
+        ydl.release.set()
+        return await second, manager.shared("a")
+
+    info, shared = asyncio.run(main())
+    assert info["id"] == "a" and shared is None
+
+
+def test_last_waiter_leaving_cancels_through_the_hooks(ydl):
+    ydl.steps, ydl.delay = 200, 0.01
+    cleaned = threading.Event()
+
+    async def main():
+        manager = DownloadManager()
+        job = manager.start("a", {}, cleanup=cleaned.set)
+        waiter = asyncio.ensure_future(manager.wait(job, user_id=1))
+        await asyncio.sleep(0.05)
+        manager.cancel_user(1)
+        with pytest.raises(DownloadCancelled):
+            await waiter
+        assert job.cancelled
+        with pytest.raises(DownloadCancelled):
+            await job.task
+
+    started = time.monotonic()
+    asyncio.run(main())
+    # the progress hook stopped the worker long before its 2s of steps
+    assert time.monotonic() - started < 1.0
+    assert cleaned.wait(1)
+
+
+def test_cached_download_shares_one_job_and_commits(ydl):
+    async def main():
+        return await asyncio.gather(
+            cached_download("digest-share", "song", {}, ".%(ext)s", user_id=1),
+            cached_download("digest-share", "song", {}, ".%(ext)s", user_id=2),
+        )
+
+    first, second = asyncio.run(main())
+    assert first == second == media_cache.get("digest-share")
+    assert first.endswith(".m4a")
+    assert ydl.runs == 1
+    assert os.listdir(media_cache.tmp_dir) == []
+
+
+def test_downloaded_path_finds_the_real_file(tmp_path):
+    tmpl = str(tmp_path / "abc.%(ext)s")
+    (tmp_path / "abc.webm.part").write_bytes(b"x")
+    with pytest.raises(FileNotFoundError):
+        downloaded_path({"requested_downloads": [{}]}, tmpl)
+    (tmp_path / "abc.mp3").write_bytes(b"x")
+    (tmp_path / "other.mp3").write_bytes(b"x")
+    assert downloaded_path({}, tmpl) == str(tmp_path / "abc.mp3")
+    explicit = tmp_path / "named.opus"
+    explicit.write_bytes(b"x")
+    assert downloaded_path({"requested_downloads": [{"filepath": str(explicit)}]}, tmpl) == str(explicit)
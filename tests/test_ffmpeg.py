@@ -0,0 +1,65 @@
+import asyncio
+import sys
+
+import pytest
+
+from Process.errors import FFmpegCancelled
+from Process.ffmpeg import BACKGROUND, NOW_PLAYING, PREFETCH, FFmpegScheduler
+
+
+def _cmd(code: str):
+    return [sys.executable, "-c", code]
+
+
+def test_run_returns_output_and_status():
+    async def main():
+        scheduler = FFmpegScheduler(workers=2)
+        job = await scheduler.run(_cmd("print('hi'); raise SystemExit(3)"))
+        return job, scheduler.stats()
+
+    job, stats = asyncio.run(main())
+    assert job.stdout.strip() == b"hi"
+    assert job.returncode == 3
+    assert stats["failed"] == 1 and stats["running"] == 0
+
+
+def test_waiting_jobs_start_by_priority():
+    async def main():
+        scheduler = FFmpegScheduler(workers=1)
+        started = []
+
+        async def run(name, priority):
+            job = await scheduler.run(_cmd("pass"), priority=priority)
+            started.append((job.started, name))
+
+        blocker = asyncio.ensure_future(scheduler.run(_cmd("import time; time.sleep(0.3)")))
+        await asyncio.sleep(0.05)
+        await asyncio.gather(
+            run("background", BACKGROUND),
+            run("prefetch", PREFETCH),
+            run("now", NOW_PLAYING),
+        )
+        await blocker
+        return [name for _, name in sorted(started)]
+
+    assert asyncio.run(main()) == ["now", "prefetch", "background"]
+
+
+def test_cancel_chat_kills_running_and_drops_queued():
+    async def main():
+        scheduler = FFmpegScheduler(workers=1)
+        sleep = _cmd("import time; time.sleep(10)")
+        running = asyncio.ensure_future(scheduler.run(sleep, chat_id=1))
+        queued = asyncio.ensure_future(scheduler.run(sleep, chat_id=1))
+        other = asyncio.ensure_future(scheduler.run(_cmd("pass"), chat_id=2))
+        await asyncio.sleep(0.2)
+        assert scheduler.cancel_chat(1) == 2
+        for task in (running, queued):
+            with pytest.raises(FFmpegCancelled):
+                await asyncio.wait_for(task, 5)
+        job = await asyncio.wait_for(other, 5)
+        return job, scheduler.stats()
+
+    job, stats = asyncio.run(main())
+    assert job.returncode == 0
+    assert stats["cancelled"] == 2 and stats["running"] == 0 and stats["queued"] == 0
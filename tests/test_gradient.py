@@ -0,0 +1,44 @@
+import pytest
+
+from Process.design import gradient
+
+
+def _close(a, b, tolerance=3):
+    return all(abs(x - y) <= tolerance for x, y in zip(a, b))
+
+
+def test_vertical_runs_top_to_bottom():
+    img = gradient.vertical((40, 100), (0, 0, 0), (200, 100, 50))
+    assert img.mode == "RGB" and img.size == (40, 100)
+    assert _close(img.getpixel((0, 0)), (0, 0, 0))
+    assert _close(img.getpixel((39, 99)), (200, 100, 50))
+    assert _close(img.getpixel((20, 50)), (100, 50, 25), tolerance=4)
+    # constant along a row
+    assert img.getpixel((0, 50)) == img.getpixel((39, 50))
+
+
+def test_angle_90_runs_left_to_right():
+    img = gradient.linear((100, 30), ((255, 0, 0), (0, 0, 255)), angle=90)
+    assert _close(img.getpixel((0, 15)), (255, 0, 0))
+    assert _close(img.getpixel((99, 15)), (0, 0, 255))
+    assert img.getpixel((50, 0)) == img.getpixel((50, 29))
+
+
+def test_stops_with_offsets_and_alpha():
+    img = gradient.linear((10, 101), ((0.0, (0, 0, 0, 0)), (0.5, (255, 255, 255, 255)), (1.0, (0, 0, 0, 255))))
+    assert img.mode == "RGBA"
+    assert _close(img.getpixel((5, 0)), (0, 0, 0, 0))
+    assert _close(img.getpixel((5, 50)), (255, 255, 255, 255))
+    assert _close(img.getpixel((5, 100)), (0, 0, 0, 255), tolerance=6)
+
+
+def test_results_are_memoized():
+    gradient.clear()
+    a = gradient.vertical((64, 64), (1, 2, 3), (4, 5, 6))
+    assert gradient.linear([64, 64], [(1, 2, 3), (4, 5, 6)], 360) is a
+    assert gradient.vertical((64, 65), (1, 2, 3), (4, 5, 6)) is not a
+
+
+def test_one_stop_is_not_a_gradient():
+    with pytest.raises(ValueError):
+        gradient.linear((10, 10), [(0, 0, 0)])
@@ -0,0 +1,140 @@
+import asyncio
+import socket
+
+import pytest
+from aiohttp import web
+
+from Process import http
+from Process.errors import HttpError
+from Process.http import HttpClient
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(http, "HTTP_BACKOFF", 0.001)
+
+
+def _serve(routes):
+    """Run `coro(base_url, hits)` against an app serving `routes` ({path: handler})."""
+
+    def run(coro):
+        async def main():
+            hits = {}
+            app = web.Application()
+            for path, handler in routes.items():
+                async def counted(request, handler=handler, path=path):
+                    hits[path] = hits.get(path, 0) + 1
+                    return await handler(request, hits[path])
+
+                app.router.add_route("*", path, counted)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            client = HttpClient()
+            try:
+                return await coro(client, f"http://127.0.0.1:{port}", hits)
+            finally:
+                await client.stop()
+                await runner.cleanup()
+
+        return asyncio.run(main())
+
+    return run
+
+
+async def _flaky(request, hit):
+    if hit < 3:
+        return web.Response(status=503)
+    return web.json_response({"hit": hit, "body": await request.text()})
+
+
+async def _busy(request, hit):
+    return web.Response(status=429, headers={"Retry-After": "3600"})
+
+
+async def _missing(request, hit):
+    return web.Response(status=404)
+
+
+async def _slow(request, hit):
+    await asyncio.sleep(0.3)
+    return web.Response(text="late")
+
+
+run = _serve({"/flaky": _flaky, "/busy": _busy, "/missing": _missing, "/slow": _slow})
+
+
+def test_gets_are_retried_on_5xx():
+    async def main(client, base, hits):
+        body = await client.get_json(base + "/flaky", retries=2)
+        return body, hits, client.stats()
+
+    body, hits, stats = run(main)
+    assert body["hit"] == 3 and hits["/flaky"] == 3
+    assert stats == {"requests": 1, "retries": 2, "failures": 0}
+
+
+def test_posts_are_not_resent_after_a_5xx():
+    async def main(client, base, hits):
+        with pytest.raises(HttpError) as info:
+            await client.post_json(base + "/flaky", data=b"x", retries=3)
+        return info.value, hits
+
+    error, hits = run(main)
+    assert hits["/flaky"] == 1 and error.status == 503
+
+
+def test_posts_are_not_resent_after_a_timeout():
+    async def main(client, base, hits):
+        with pytest.raises(HttpError):
+            await client.request("POST", base + "/slow", timeout=0.1, retries=3)
+        return hits
+
+    assert run(main)["/slow"] == 1
+
+
+def test_long_retry_after_ends_the_retries():
+    async def main(client, base, hits):
+        with pytest.raises(HttpError) as info:
+            await client.get_bytes(base + "/busy", retries=3)
+        return info.value, hits
+
+    error, hits = run(main)
+    assert hits["/busy"] == 1 and error.status == 429
+
+
+def test_other_errors_are_not_retried():
+    async def main(client, base, hits):
+        with pytest.raises(HttpError):
+            await client.get_bytes(base + "/missing", retries=3)
+        return hits
+
+    assert run(main)["/missing"] == 1
+
+
+def test_connection_refused_is_retried_for_any_method():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    built = []
+
+    def body():
+        built.append(1)
+        return b"form"
+
+    async def main():
+        client = HttpClient()
+        try:
+            with pytest.raises(HttpError) as info:
+                await client.request("POST", f"http://127.0.0.1:{port}/", data=body, retries=2)
+            return info.value, client.stats()
+        finally:
+            await client.stop()
+
+    error, stats = asyncio.run(main())
+    assert error.status is None
+    assert stats["retries"] == 2 and stats["failures"] == 1
+    # a fresh body for every attempt
+    assert len(built) == 3
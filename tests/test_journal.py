@@ -0,0 +1,67 @@
+from Process import queues
+from Process.Cache.journal import QueueJournal
+from Process.queues import Track
+
+
+def _track(n: int) -> Track:
+    return Track(f"t{n}", f"https://example.com/{n}", None, "Audio", 0)
+
+
+def _titles(saved, chat_id):
+    return [t["title"] for t in saved.get(chat_id, [])]
+
+
+def test_restart_replays_every_mutation(tmp_path):
+    path = str(tmp_path / "queues.sqlite3")
+    journal = QueueJournal(path)
+    journal.load()
+    journal.start()
+    try:
+        for n in range(4):
+            queues.add_to_queue(-100, f"t{n}", f"https://example.com/{n}", None, "Audio", 0)
+        queues.extend_queue(-200, [_track(10), _track(11)])
+        queues.pop_an_item(-100)          # t0 played
+        queues.remove_index(-100, 1)      # t2 removed
+        queues.add_to_queue(-300, "gone", "x", None, "Audio", 0)
+        queues.clear_queue(-300)
+    finally:
+        journal.stop()
+        queues.QUEUE.clear()
+
+    saved = QueueJournal(path).load()
+    assert _titles(saved, -100) == ["t1", "t3"]
+    assert _titles(saved, -200) == ["t10", "t11"]
+    assert -300 not in saved
+    assert saved[-100][0] == _track(1).as_dict()
+
+
+def test_compaction_keeps_the_queues(tmp_path):
+    path = str(tmp_path / "queues.sqlite3")
+    journal = QueueJournal(path, compact_every=3)
+    journal.load()
+    journal.start()
+    try:
+        for n in range(10):
+            queues.add_to_queue(-400, f"t{n}", "x", None, "Audio", 0)
+        for _ in range(4):
+            queues.pop_an_item(-400)
+    finally:
+        journal.stop()
+        queues.QUEUE.clear()
+
+    assert journal.compactions >= 1
+    assert _titles(QueueJournal(path).load(), -400) == [f"t{n}" for n in range(4, 10)]
+
+
+def test_nothing_is_journaled_after_stop(tmp_path):
+    path = str(tmp_path / "queues.sqlite3")
+    journal = QueueJournal(path)
+    journal.load()
+    journal.start()
+    queues.add_to_queue(-500, "kept", "x", None, "Audio", 0)
+    journal.stop()
+    # e.g. leave handlers clearing queues during shutdown
+    queues.clear_queue(-500)
+    queues.QUEUE.clear()
+
+    assert _titles(QueueJournal(path).load(), -500) == ["kept"]
@@ -0,0 +1,67 @@
+import os
+import time
+
+from Process.Cache import media
+from Process.Cache.media import DiskCache
+
+
+def _put(cache: DiskCache, digest: str, size: int) -> str:
+    tmp = cache.tmp_path(".bin")
+    with open(tmp, "wb") as f:
+        f.write(b"x" * size)
+    return cache.commit(digest, tmp)
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=300)
+    _put(cache, "a", 100)
+    _put(cache, "b", 100)
+    _put(cache, "c", 100)
+    assert cache.get("a")  # a is now the most recent
+    _put(cache, "d", 100)
+    assert cache.get("b") is None
+    assert all(cache.get(d) for d in ("a", "c", "d"))
+    assert cache.total == 300
+    assert not os.path.exists(os.path.join(str(tmp_path), "b.bin"))
+
+
+def test_pinned_entry_survives_eviction(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=150)
+    _put(cache, "a", 100)
+    with cache.pinned("a"):
+        # over budget, but a is pinned and b was just written: keep both
+        assert os.path.exists(_put(cache, "b", 100))
+        assert cache.get("a")
+    # unpinned: b was used less recently than a, so b goes
+    assert cache.get("b") is None
+    assert cache.get("a")
+    assert cache.total == 100
+
+
+def test_index_is_rebuilt_from_disk(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    path = _put(cache, "a", 10)
+    again = DiskCache(str(tmp_path), max_bytes=1000)
+    assert again.get("a") == path
+    assert again.total == 10
+
+
+def test_discard_removes_partial_files(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    tmp = cache.tmp_path(".mp4")
+    for suffix in ("", ".part", ".f140.m4a"):
+        open(tmp + suffix, "wb").close()
+    cache.discard(tmp)
+    assert os.listdir(cache.tmp_dir) == []
+
+
+def test_only_stale_temp_files_are_swept(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    old, fresh = cache.tmp_path(), cache.tmp_path()
+    for path in (old, fresh):
+        open(path, "wb").close()
+    stale = time.time() - media.TMP_MAX_AGE - 60
+    os.utime(old, (stale, stale))
+    DiskCache(str(tmp_path), max_bytes=1000)
+    assert not os.path.exists(old)
+    assert os.path.exists(fresh)
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from Process.pipeline import ChatPipeline
+
+
+def test_commands_of_one_chat_run_in_order():
+    async def main():
+        pipeline = ChatPipeline()
+        done = []
+
+        async def step(n):
+            # later commands sleep less; only the pipeline keeps them in order
+            await asyncio.sleep((5 - n) * 0.002)
+            done.append(n)
+            return n
+
+        results = await asyncio.gather(*(pipeline.run(1, step, n) for n in range(5)))
+        return results, done
+
+    results, done = asyncio.run(main())
+    assert results == [0, 1, 2, 3, 4]
+    assert done == [0, 1, 2, 3, 4]
+
+
+def test_chats_run_in_parallel():
+    async def main():
+        pipeline = ChatPipeline()
+        running = set()
+        overlap = []
+
+        async def step(chat_id):
+            running.add(chat_id)
+            await asyncio.sleep(0.01)
+            overlap.append(len(running))
+            running.discard(chat_id)
+
+        await asyncio.gather(*(pipeline.run(c, step, c) for c in range(3)))
+        return overlap
+
+    assert max(asyncio.run(main())) == 3
+
+
+def test_exception_reaches_caller_and_queue_goes_on():
+    async def main():
+        pipeline = ChatPipeline()
+
+        async def boom():
+            raise ValueError("bad")
+
+        async def ok():
+            return "ok"
+
+        first = asyncio.ensure_future(pipeline.run(1, boom))
+        second = asyncio.ensure_future(pipeline.run(1, ok))
+        with pytest.raises(ValueError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "ok"
+
+
+def test_cancelled_caller_skips_its_command():
+    async def main():
+        pipeline = ChatPipeline()
+        ran = []
+        gate = asyncio.Event()
+
+        async def slow():
+            await gate.wait()
+            ran.append("slow")
+
+        async def mark(name):
+            ran.append(name)
+
+        first = asyncio.ensure_future(pipeline.run(1, slow))
+        second = asyncio.ensure_future(pipeline.run(1, mark, "cancelled"))
+        third = asyncio.ensure_future(pipeline.run(1, mark, "after"))
+        await asyncio.sleep(0)
+        second.cancel()
+        gate.set()
+        await asyncio.gather(first, third)
+        return ran
+
+    assert asyncio.run(main()) == ["slow", "after"]
+
+
+def test_idle_worker_exits():
+    async def main():
+        pipeline = ChatPipeline(idle_timeout=0.01)
+
+        async def noop():
+            pass
+
+        await pipeline.run(1, noop)
+        assert pipeline.active_chats() == 1
+        await asyncio.sleep(0.05)
+        return pipeline.active_chats()
+
+    assert asyncio.run(main()) == 0
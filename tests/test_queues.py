@@ -0,0 +1,89 @@
+import pytest
+
+from Process import queues
+from Process.queues import (
+    ChatQueue, Track, add_to_queue, clear_queue, extend_queue, get_next, get_queue,
+    pop_an_item, queue_length, remove_index,
+)
+
+CHAT = -1001
+
+
+@pytest.fixture(autouse=True)
+def empty_queue():
+    clear_queue(CHAT)
+    yield
+    clear_queue(CHAT)
+
+
+def _tracks(*titles):
+    return [Track(t, f"https://youtu.be/{t}", None, "Audio", 0) for t in titles]
+
+
+def test_pop_matches_list_pop():
+    items = list(range(8))
+    q = ChatQueue(items)
+    for index in (None, 0, 2, -1, -2, 1):
+        expected = items.pop() if index is None else items.pop(index)
+        assert (q.pop() if index is None else q.pop(index)) == expected
+        assert list(q) == items
+    with pytest.raises(IndexError):
+        ChatQueue([1]).pop(3)
+
+
+def test_track_reads_like_the_old_dicts():
+    track = Track("song", "link", 7, "Audio", 0)
+    assert track["title"] == "song" and track.get("link") == "link"
+    assert track.get("missing", "d") == "d"
+    with pytest.raises(KeyError):
+        track["missing"]
+    assert track.as_dict() == {"title": "song", "link": "link", "ref": 7, "type": "Audio", "quality": 0}
+
+
+def test_add_returns_the_new_index_and_pop_takes_the_head():
+    assert add_to_queue(CHAT, "a", "la", None, "Audio", 0) == 0
+    assert add_to_queue(CHAT, "b", "lb", None, "Audio", 0) == 1
+    assert queue_length(CHAT) == 2 and get_next(CHAT)["title"] == "a"
+    assert pop_an_item(CHAT)["title"] == "a"
+    assert pop_an_item(CHAT)["title"] == "b"
+    assert pop_an_item(CHAT) is None and get_next(CHAT) is None
+
+
+def test_extend_keeps_order_and_returns_the_length():
+    add_to_queue(CHAT, "now", "l", None, "Audio", 0)
+    assert extend_queue(CHAT, _tracks("x", "y")) == 3
+    assert [t.title for t in get_queue(CHAT)] == ["now", "x", "y"]
+
+
+def test_remove_index_bounds():
+    extend_queue(CHAT, _tracks("a", "b", "c"))
+    assert remove_index(CHAT, 1).title == "b"
+    assert remove_index(CHAT, 5) is None
+    assert remove_index(CHAT, -1) is None  # negative indices never removed anything
+    assert [t.title for t in get_queue(CHAT)] == ["a", "c"]
+
+
+def test_clear_and_missing_chats():
+    assert clear_queue(CHAT) is False
+    assert len(get_queue(CHAT)) == 0 and queue_length(CHAT) == 0
+    extend_queue(CHAT, _tracks("a"))
+    assert clear_queue(CHAT) is True
+    assert CHAT not in queues.QUEUE
+
+
+def test_listeners_see_every_mutation():
+    seen = []
+
+    def listener(op, chat_id, *args):
+        seen.append(op)
+
+    queues.add_listener(listener)
+    try:
+        add_to_queue(CHAT, "a", "l", None, "Audio", 0)
+        extend_queue(CHAT, _tracks("b", "c"))
+        remove_index(CHAT, 2)
+        pop_an_item(CHAT)
+        clear_queue(CHAT)
+    finally:
+        queues.remove_listener(listener)
+    assert seen == ["add", "extend", "remove", "pop", "clear"]
@@ -0,0 +1,116 @@
+import asyncio
+import sys
+import types
+
+import pytest
+
+from Process import search
+
+
+class FakeVideosSearch:
+    calls = []
+    active = 0
+    peak = 0
+    results = {}
+
+    def __init__(self, query, limit):
+        self.query = query
+        FakeVideosSearch.calls.append(query)
+
+    async def next(self):
+        cls = FakeVideosSearch
+        cls.active += 1
+        cls.peak = max(cls.peak, cls.active)
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            cls.active -= 1
+        if self.query == "explode":
+            raise RuntimeError("youtube down")
+        items = cls.results.get(self.query)
+        if items is None:
+            items = [{"id": f"{self.query[:5]:_<5}{n:06d}", "title": f"{self.query} #{n}"} for n in range(3)]
+        return {"result": items}
+
+
+@pytest.fixture(autouse=True)
+def backend(monkeypatch):
+    module = types.ModuleType("youtubesearchpython.__future__")
+    module.VideosSearch = FakeVideosSearch
+    monkeypatch.setitem(sys.modules, "youtubesearchpython", types.ModuleType("youtubesearchpython"))
+    monkeypatch.setitem(sys.modules, "youtubesearchpython.__future__", module)
+    monkeypatch.setattr(search, "_sem", None)
+    monkeypatch.setattr(search, "SEARCH_CONCURRENCY", 2)
+    FakeVideosSearch.calls, FakeVideosSearch.peak, FakeVideosSearch.results = [], 0, {}
+    search._cache.clear()
+    yield FakeVideosSearch
+    search._cache.clear()
+
+
+def test_normalize_query():
+    assert search.normalize_query("  Never  Gonna\tGIVE ") == "never gonna give"
+    # ids and urls keep their case
+    assert search.normalize_query("dQw4w9WgXcQ") == "dQw4w9WgXcQ"
+    assert search.normalize_query("Play https://youtu.be/dQw4w9WgXcQ NOW") == "play https://youtu.be/dQw4w9WgXcQ now"
+    assert search.normalize_query("WWW.Example.com/Song") == "WWW.Example.com/Song"
+    # an 11-letter word among others is text
+    assert search.normalize_query("Beautifully Sung") == "beautifully sung"
+    assert search.normalize_query("   ") == ""
+
+
+def test_results_are_normalized_and_copied(backend):
+    async def main():
+        first = await search.search("song", limit=2)
+        first[0]["title"] = "changed"
+        return first, await search.search_one("SONG")
+
+    first, again = asyncio.run(main())
+    assert len(first) == 2
+    assert first[1]["link"] == f"https://www.youtube.com/watch?v={first[1]['id']}"
+    assert first[1]["channel"] == "Unknown" and first[1]["views"] == "Unknown Views"
+    assert again["title"] == "song #0"
+    assert backend.calls == ["song"]
+
+
+def test_queries_differing_in_case_of_a_video_id_are_not_merged(backend):
+    async def main():
+        await search.search("dQw4w9WgXcQ")
+        await search.search("DQW4W9WGXCQ")
+
+    asyncio.run(main())
+    assert backend.calls == ["dQw4w9WgXcQ", "DQW4W9WGXCQ"]
+
+
+def test_identical_searches_share_one_request(backend):
+    async def main():
+        return await asyncio.gather(*(search.search("same song") for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert backend.calls == ["same song"]
+    assert all(r == results[0] for r in results)
+
+
+def test_concurrency_is_bounded(backend):
+    async def main():
+        await asyncio.gather(*(search.search(f"song {n}") for n in range(6)))
+
+    asyncio.run(main())
+    assert len(backend.calls) == 6 and backend.peak == 2
+
+
+def test_failures_return_nothing_and_are_not_cached(backend):
+    async def main():
+        return await search.search("explode"), await search.search("explode")
+
+    assert asyncio.run(main()) == ([], [])
+    assert backend.calls == ["explode", "explode"]
+
+
+def test_empty_results_are_cached_briefly(backend):
+    backend.results["nothing"] = []
+
+    async def main():
+        return await search.search("nothing"), await search.search("nothing")
+
+    assert asyncio.run(main()) == ([], [])
+    assert backend.calls == ["nothing"]
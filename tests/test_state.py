@@ -0,0 +1,149 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from bench.resp_stand_in import serve
+from Process.state import MemoryStore, RedisStore, SQLiteStore, open_store
+
+
+@pytest.fixture
+def resp_server():
+    server = serve()
+    yield server
+    server.shutdown()
+
+
+def _stores(tmp_path, resp_server):
+    host, port = resp_server.server_address
+    return [
+        MemoryStore(),
+        SQLiteStore(str(tmp_path / "state.sqlite3"), flush_interval=0.01),
+        RedisStore(host, port, flush_interval=0.01),
+    ]
+
+
+def test_set_get_delete_scan(tmp_path, resp_server):
+    for st in _stores(tmp_path, resp_server):
+        st.set("ns", 1, {"a": [1, 2]})
+        st.set("ns", "two", "x")
+        st.set("other", 1, "elsewhere")
+        st.flush()
+        assert st.get("ns", 1) == {"a": [1, 2]}
+        assert dict(st.scan("ns")) == {1: {"a": [1, 2]}, "two": "x"}
+        st.delete("ns", 1)
+        st.flush()
+        assert st.get("ns", 1, "gone") == "gone"
+        st.clear("ns")
+        st.flush()
+        assert list(st.scan("ns")) == []
+        assert st.get("other", 1) == "elsewhere"
+        st.stop()
+
+
+def test_ttl_expires(tmp_path, resp_server):
+    for st in _stores(tmp_path, resp_server):
+        st.set("ns", "k", 1, ttl=0.05)
+        st.flush()
+        assert st.get("ns", "k") == 1
+        time.sleep(0.1)
+        assert st.get("ns", "k") is None
+        assert list(st.scan("ns")) == []
+        st.stop()
+
+
+def test_store_map_reload_sees_in_place_mutations(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    st = SQLiteStore(path, flush_interval=0.01)
+    m = st.namespace("queues")
+    m[5] = [1]
+    m[5].append(2)
+    m.save(5)
+    # the store got a copy: later mutations need another save
+    m[5].append(3)
+    st.stop()
+
+    again = SQLiteStore(path).namespace("queues")
+    assert again.load() == 1
+    assert again[5] == [1, 2]
+    again.store.stop()
+
+
+def test_store_map_load_filter():
+    st = MemoryStore()
+    m = st.namespace("q")
+    for key in range(6):
+        m[key] = key
+    mine = st.namespace("q")
+    mine.load(lambda key: key % 2 == 0)
+    assert sorted(mine) == [0, 2, 4]
+
+
+def test_writes_after_stop_are_dropped(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    st = SQLiteStore(path, flush_interval=0.01)
+    st.set("ns", 1, "kept")
+    st.stop()
+    st.set("ns", 1, "dropped")
+    again = SQLiteStore(path)
+    assert again.get("ns", 1) == "kept"
+    again.stop()
+
+
+def test_open_store_urls(tmp_path):
+    assert isinstance(open_store("memory://"), MemoryStore)
+    path = os.path.join(str(tmp_path), "abs.sqlite3")
+    st = open_store("sqlite:///" + path)
+    assert isinstance(st, SQLiteStore)
+    assert st.path == path
+    st.stop()
+    with pytest.raises(ValueError):
+        open_store("mongo://localhost")
+
+
+def _pop_cost(m, size):
+    from Process.queues import ChatQueue
+
+    m[1] = ChatQueue(range(size))
+    best = float("inf")
+    for _ in range(200):
+        start = time.perf_counter()
+        m[1].popleft()
+        m.save(1)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def test_saving_a_queue_does_not_copy_it_on_memory():
+    m = MemoryStore().namespace("queues")
+    small, big = _pop_cost(m, 1_000), _pop_cost(m, 200_000)
+    # a copy of 200k items takes milliseconds; a pop and a save take microseconds
+    assert big < small * 5 + 20e-6
+
+
+def test_saves_within_a_flush_interval_share_one_snapshot(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    st = SQLiteStore(path, flush_interval=0.05)
+    m = st.namespace("queues")
+    copies = []
+    snapshot = m._snapshot
+    m._snapshot = lambda key: (copies.append(key), snapshot(key))
+
+    async def main():
+        m[1] = [0]
+        for i in range(1, 100):
+            m[1].append(i)
+            m.save(1)
+        assert copies == []
+        await asyncio.sleep(0.1)
+        m[1].append(100)
+        m.save(1)
+
+    asyncio.run(main())
+    assert copies == [1]
+    # the save still waiting for its interval is written on stop
+    st.stop()
+    again = SQLiteStore(path)
+    assert again.get("queues", 1) == list(range(101))
+    again.stop()
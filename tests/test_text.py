@@ -0,0 +1,43 @@
+from Process.design import assets, text
+
+FONT = assets.font(assets.FONT_PRIMARY, 40)
+
+
+def test_short_text_is_one_line():
+    assert text.wrap("Hello world", FONT, 1000) == ["Hello world"]
+
+
+def test_lines_fit_and_keep_every_word():
+    title = "A Rather Long Song Title That Needs To Wrap Over More Than One Line"
+    lines = text.wrap(title, FONT, 400)
+    assert len(lines) > 1
+    assert all(text.measure(FONT, line) <= 400 for line in lines)
+    assert " ".join(lines).split() == title.split()
+
+
+def test_overflow_is_cut_with_an_ellipsis():
+    lines = text.wrap("word " * 50, FONT, 300, max_lines=2)
+    assert len(lines) == 2
+    assert lines[-1].endswith(text.ELLIPSIS)
+    assert text.measure(FONT, lines[-1]) <= 300
+
+
+def test_over_long_word_is_broken_by_characters():
+    word = "x" * 200
+    lines = text.wrap(word, FONT, 200)
+    assert len(lines) > 1
+    assert "".join(lines) == word
+    assert all(text.measure(FONT, line) <= 200 for line in lines)
+
+
+def test_empty_text():
+    assert text.wrap("", FONT, 100) == []
+    assert text.wrap(None, FONT, 100) == []
+
+
+def test_layout_positions_lines():
+    runs = text.layout("one two three four five six", FONT, 150, origin=(10, 20), line_step=50)
+    assert [r.y for r in runs] == [20 + 50 * i for i in range(len(runs))]
+    assert all(r.x == 10 for r in runs)
+    right = text.layout("one", FONT, 150, origin=(10, 0), align="right")[0]
+    assert right.x + right.width == 160
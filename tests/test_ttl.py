@@ -0,0 +1,131 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from Process import ytdl
+from Process.Cache import ttl as ttl_module
+from Process.Cache.ttl import SingleFlight, TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_entries_expire(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+    clock[0] += 11
+    assert cache.get("a") is None and "a" not in cache
+    assert cache.get("b") == 2
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+
+def test_min_ttl_treats_nearly_expired_entries_as_missing(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+    clock[0] += 8
+    assert cache.get("a", min_ttl=5) is None
+    # still there for callers that can live with 2s
+    assert cache.get("a") == 1
+
+
+def test_size_bound_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "b" not in cache and cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_zero_ttl_drops_the_entry():
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("a", 2, ttl=0)
+    assert "a" not in cache and cache.pop("a", "gone") == "gone"
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    async def main():
+        flights = SingleFlight()
+        calls = []
+
+        async def fetch(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key * 2
+
+        results = await asyncio.gather(*(flights.do("k", fetch, 21) for _ in range(5)))
+        assert flights.in_flight() == 0
+        # a later call runs again
+        await flights.do("k", fetch, 1)
+        return results, calls
+
+    results, calls = asyncio.run(main())
+    assert results == [42] * 5
+    assert calls == [21, 1]
+
+
+def test_single_flight_error_reaches_every_waiter():
+    async def main():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise LookupError("boom")
+
+        return await asyncio.gather(*(flights.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(results) == 3 and all(isinstance(r, LookupError) for r in results)
+
+
+def test_single_flight_survives_an_impatient_waiter():
+    async def main():
+        flights = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        impatient = asyncio.ensure_future(flights.do("k", slow))
+        patient = asyncio.ensure_future(flights.do("k", slow))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_stream_urls_are_cached_until_they_expire(monkeypatch):
+    ytdl.stream_cache.clear()
+    resolved = []
+    expires = int(time.time()) + 3600
+
+    async def resolve(url, fmt, timeout=25):
+        resolved.append(url)
+        await asyncio.sleep(0.01)
+        return f"https://rr1.googlevideo.com/videoplayback?expire={expires}&n={len(resolved)}"
+
+    monkeypatch.setattr(ytdl.resolver, "resolve", resolve)
+    watch = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+    async def main():
+        first = await asyncio.gather(*(ytdl.get_stream_url(watch) for _ in range(3)))
+        # same video through another url form: same cache entry
+        cached = await ytdl.get_stream_url("https://youtu.be/dQw4w9WgXcQ")
+        # less than the asked lifetime left: resolved again
+        fresh = await ytdl.get_stream_url(watch, min_ttl=7200)
+        return first, cached, fresh
+
+    first, cached, fresh = asyncio.run(main())
+    assert len(set(first)) == 1 and cached == first[0]
+    assert fresh != cached and len(resolved) == 2
+    ytdl.stream_cache.clear()